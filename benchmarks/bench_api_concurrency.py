@@ -0,0 +1,162 @@
+"""
+Benchmark: sequential and 200 parallel GET /api/devices calls through the API server.
+
+Starts the real `FastAPIProcessManager` (uvicorn in a child process, IPC
+over the multiprocessing queues) with a `fibaro_callback` standing in for
+the Lua hook: it sleeps `HOOK_MS` and returns a small device list. The
+first round makes `SEQUENTIAL` calls one at a time with an instant hook,
+i.e. pure per-request overhead. Then all requests are fired at once from
+one `aiohttp.ClientSession` running in its own process, so the client
+does not compete for the GIL with the IPC handler thread; the report
+shows wall time, latency percentiles and how many calls did not come
+back with a 200 (lost or mismatched IPC replies end up as timeouts).
+A last round puts one slow call (`SLOW_MS`, e.g. a proxied HC3
+request) in front of the same 200 calls to show head-of-line blocking.
+
+Run from the repository root:
+
+    python benchmarks/bench_api_concurrency.py [queue|socket|inprocess]
+
+The optional argument selects the IPC transport (`--api-transport`), or
+`--api-inprocess`, where uvicorn runs on this process' event loop and the
+hook is a coroutine awaited on it.
+"""
+
+import asyncio
+import multiprocessing
+import socket
+import sys
+import time
+
+import aiohttp
+
+from plua.fastapi_process import FastAPIProcessManager
+
+CONCURRENCY = 200
+TRANSPORT = sys.argv[1] if len(sys.argv) > 1 else "queue"
+HOOK_MS = 1.0
+SLOW_MS = 1000.0
+SEQUENTIAL = 500
+TIMEOUT = 35.0
+
+DEVICES = [{"id": i, "name": f"Device {i}", "type": "com.fibaro.binarySwitch"} for i in range(20)]
+
+
+def fibaro_hook(method: str, path: str, data: str | None):
+    if path != "/api/instant":
+        time.sleep((SLOW_MS if path == "/api/slow" else HOOK_MS) / 1000)
+    return DEVICES, 200
+
+
+async def fibaro_hook_async(method: str, path: str, data: str | None):
+    if path != "/api/instant":
+        await asyncio.sleep((SLOW_MS if path == "/api/slow" else HOOK_MS) / 1000)
+    return DEVICES, 200
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_ready(client: aiohttp.ClientSession, base: str):
+    for _ in range(200):
+        try:
+            async with client.get(f"{base}/health") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientConnectionError:
+            pass
+        await asyncio.sleep(0.05)
+    raise RuntimeError("FastAPI process did not come up")
+
+
+async def one_call(client: aiohttp.ClientSession, url: str) -> tuple[float, bool]:
+    start = time.perf_counter()
+    try:
+        async with client.get(url) as response:
+            ok = response.status == 200 and await response.json() == DEVICES
+    except (aiohttp.ClientError, TimeoutError):
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+async def burst(client: aiohttp.ClientSession, base: str, slow: bool):
+    if slow:
+        slow_call = asyncio.create_task(one_call(client, f"{base}/api/slow"))
+        await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one_call(client, f"{base}/api/devices") for _ in range(CONCURRENCY)))
+    wall = time.perf_counter() - start
+    if slow:
+        await slow_call
+    latencies = sorted(t for t, _ in results)
+    failed = sum(1 for _, ok in results if not ok)
+
+    def pct(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+    label = f"behind one {SLOW_MS:.0f} ms call" if slow else f"hook {HOOK_MS} ms"
+    print(f"{CONCURRENCY} parallel calls, {label:23s}: wall {wall * 1000:8.1f} ms  "
+          f"p50 {pct(0.5):8.1f} ms  p99 {pct(0.99):8.1f} ms  failed {failed}")
+
+
+async def sequential(client: aiohttp.ClientSession, base: str):
+    latencies = []
+    for _ in range(SEQUENTIAL):
+        elapsed, ok = await one_call(client, f"{base}/api/instant")
+        assert ok
+        latencies.append(elapsed)
+    latencies.sort()
+    print(f"{SEQUENTIAL} sequential calls, instant hook : mean {sum(latencies) / len(latencies) * 1e6:8.0f} us  "
+          f"p50 {latencies[len(latencies) // 2] * 1e6:8.0f} us")
+
+
+async def run(port: int):
+    base = f"http://127.0.0.1:{port}"
+    connector = aiohttp.TCPConnector(limit=CONCURRENCY + 1)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=TIMEOUT)) as client:
+        await wait_ready(client, base)
+        await one_call(client, f"{base}/api/devices")  # warm up
+        await sequential(client, base)
+        await burst(client, base, slow=False)
+        await burst(client, base, slow=True)
+
+
+def client(port: int):
+    asyncio.run(run(port))
+
+
+async def serve_inprocess(port: int):
+    manager = FastAPIProcessManager("127.0.0.1", port, {"loglevel": "ERROR", "api_inprocess": True})
+    manager.set_fibaro_callback(fibaro_hook)
+    manager.set_fibaro_callback_async(fibaro_hook_async)
+    manager.start()
+    try:
+        process = multiprocessing.Process(target=client, args=(port,))
+        process.start()
+        await asyncio.get_running_loop().run_in_executor(None, process.join)
+    finally:
+        manager.stop()
+        await manager.wait_closed()
+
+
+def main():
+    port = free_port()
+    if TRANSPORT == "inprocess":
+        asyncio.run(serve_inprocess(port))
+        return
+    manager = FastAPIProcessManager("127.0.0.1", port, {"loglevel": "ERROR", "api_transport": TRANSPORT})
+    manager.set_fibaro_callback(fibaro_hook)
+    manager.start()
+    try:
+        process = multiprocessing.Process(target=client, args=(port,))
+        process.start()
+        process.join()
+    finally:
+        manager.stop()
+
+
+if __name__ == "__main__":
+    main()
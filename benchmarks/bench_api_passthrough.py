@@ -0,0 +1,79 @@
+"""
+Benchmark: the per-request body/response work of a POST /api/* call.
+
+Runs the main-process side of the pipeline directly (no HTTP, no IPC) with
+a Lua hook that decodes the request body and returns a device list:
+
+  old  request.json() -> json.dumps for IPC -> json.loads validation ->
+       Lua json.decode -> hook table -> lua_to_python_table ->
+       jsonable_encoder + json.dumps (FastAPI's JSONResponse)
+  new  raw body text -> Lua json.decode -> hook table -> Lua json.encode,
+       returned by FastAPI as-is
+
+Run from the repository root:
+
+    python benchmarks/bench_api_passthrough.py
+"""
+
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+from plua import LuaEngine
+from plua.lua_bindings import lua_to_python_table
+
+ROUNDS = 2000
+
+
+def device(i: int) -> dict:
+    return {"id": i, "name": f"Device {i}", "type": "com.fibaro.binarySwitch", "roomID": 219,
+            "properties": {"value": False, "power": 1.5, "dead": False, "categories": ["lights"]},
+            "interfaces": ["energy", "light", "power"]}
+
+
+def main():
+    engine = LuaEngine()
+    hook = engine.execute_lua("""
+    return function(body, n)
+      local data = json.decode(body)
+      local res = {}
+      for i = 1, n do
+        res[i] = {id = i, name = "Device "..i, type = "com.fibaro.binarySwitch", roomID = 219,
+                  properties = {value = false, power = 1.5, dead = false, categories = {"lights"}},
+                  interfaces = {"energy", "light", "power"}}
+      end
+      res[1].properties.value = data.args[1]
+      return res
+    end
+    """)
+    encode = engine.execute_lua("return json.encode")
+
+    def old(raw: bytes, n: int) -> bytes:
+        body = json.loads(raw)                           # request.json()
+        text = json.dumps(body)                          # IPC message for the hook
+        json.loads(text)                                 # fibaro_callback validation
+        result = lua_to_python_table(hook(text, n))
+        return json.dumps(jsonable_encoder(result), ensure_ascii=False, allow_nan=False,
+                          indent=None, separators=(",", ":")).encode()
+
+    def new(raw: bytes, n: int) -> bytes:
+        return encode(hook(raw.decode("utf-8", "replace"), n)).encode()
+
+    for label, body, n in (("small body, 1 device", {"args": [True]}, 1),
+                           ("small body, 100 devices", {"args": [True]}, 100),
+                           ("~20 KB body, 100 devices", {"args": [True], "pad": [device(i) for i in range(100)]}, 100)):
+        raw = json.dumps(body).encode()
+        times = {}
+        for name, fn in (("old", old), ("new", new)):
+            fn(raw, n)
+            start = time.perf_counter()
+            for _ in range(ROUNDS):
+                fn(raw, n)
+            times[name] = (time.perf_counter() - start) / ROUNDS
+        print(f"{label:26s} old {times['old'] * 1e6:8.1f} us   new {times['new'] * 1e6:8.1f} us   "
+              f"speedup {times['old'] / times['new']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark: single vs batched callback delivery into Lua.
+
+Compares the old per-callback path (one `_PY.timerExpired(id, err, res)`
+crossing per result) with `CrossThreadDispatch`'s batched path (one
+`_PY.timerExpiredBatch(batch, n)` crossing per tick) at a sustained
+10k callbacks/s, i.e. 100 callbacks per 10 ms tick. Both variants go
+through the same producer queue, so the difference is the bridge cost.
+Table payloads are dominated by `python_to_lua_table`, which batching
+does not remove.
+
+Run from the repository root:
+
+    python benchmarks/bench_callback_delivery.py
+"""
+
+import time
+
+from plua import LuaEngine
+from plua.lua_bindings import python_to_lua_table
+
+RATE = 10_000          # callbacks per second
+TICK = 0.01            # seconds per dispatcher tick
+SECONDS = 5            # simulated seconds of traffic
+PER_TICK = int(RATE * TICK)
+
+
+def _register(engine: LuaEngine, n: int) -> list[int]:
+    engine.execute_lua(f"""
+    _G.bench_ids = {{}}
+    local function cb(err, res) end
+    for i = 1, {n} do bench_ids[i] = _PY.registerCallback(cb) end
+    """)
+    ids = engine.get_lua_global("bench_ids")
+    return [ids[i] for i in range(1, n + 1)]
+
+
+def _scalar(i: int) -> str:
+    # UDP/TCP style result: a plain string
+    return "21.5"
+
+
+def _message(i: int) -> dict:
+    # Shape of a typical MQTT message event posted by pylib.mqtt_client
+    return {"type": "message", "topic": f"home/sensor/{i % 50}", "payload": "21.5", "qos": 0}
+
+
+def bench_single(engine: LuaEngine, payload) -> float:
+    """Pre-batching consumer: one queue item, one conversion, one crossing."""
+    ids = _register(engine, RATE * SECONDS)
+    dispatch = engine._dispatch
+    q = dispatch._callback_queue
+    lua = engine._lua
+    start = time.perf_counter()
+    for i in range(0, len(ids), PER_TICK):
+        for cb_id in ids[i:i + PER_TICK]:
+            dispatch.post_callback(cb_id, None, payload(cb_id))
+        while len(q):
+            callback_id, error, result = q.get_nowait()
+            if isinstance(result, (dict, list)):
+                result = python_to_lua_table(result)
+            lua.globals()["_PY"]["timerExpired"](callback_id, error, result)
+    return time.perf_counter() - start
+
+
+def bench_batched(engine: LuaEngine, payload) -> float:
+    """Current consumer: one _PY.timerExpiredBatch crossing per tick."""
+    ids = _register(engine, RATE * SECONDS)
+    dispatch = engine._dispatch
+    start = time.perf_counter()
+    for i in range(0, len(ids), PER_TICK):
+        for cb_id in ids[i:i + PER_TICK]:
+            dispatch.post_callback(cb_id, None, payload(cb_id))
+        dispatch.process_pending(engine._lua, python_to_lua_table)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    engine = LuaEngine()
+    total = RATE * SECONDS
+    print(f"{total} callbacks at {RATE}/s ({PER_TICK} per {TICK * 1000:.0f} ms tick)")
+    for label, payload in (("string result", _scalar), ("MQTT message table", _message)):
+        print(f"{label}:")
+        for name, fn in (("single", bench_single), ("batched", bench_batched)):
+            elapsed = fn(engine, payload)
+            per_cb = elapsed / total * 1e6
+            cpu = elapsed / SECONDS * 100
+            print(f"  {name:8s} {elapsed:6.3f} s  {per_cb:6.2f} us/callback  {cpu:5.1f}% of one core")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+--%%name:CronBench
+--%%type:com.fibaro.genericDevice
+--%%offline:true
+--%%file:$fibaro.lib.eventlib,eventlib
+
+--[[
+Benchmark: 1,000 EventLib cron rules over one simulated day.
+
+Compares the scheduling work of the old cron loop (wake every minute and
+run every rule's date test) with the current one (each rule computes its
+next occurrence and arms one timer for it), using the same parsed rules
+(fibaro.parseCron). The rule mix is typical for home automation: mostly
+daily and weekday times, some sunrise/sunset offsets, some hourly rules.
+Then the rules are registered with Event{type='cron'} and run end to end
+on the virtual clock (_PY.simulate) to check that every occurrence fires.
+
+Run from the repository root:
+
+    plua --fibaro --nodebugger --no-api benchmarks/bench_cron.lua
+]]
+
+local N, HOURS = 1000, 24
+
+local function rules()
+  local r = {}
+  for i = 1, N do
+    local k = i % 10
+    if k < 6 then r[i] = string.format("%d %d * * *", i % 60, (i * 7) % 24)          -- daily
+    elseif k < 8 then r[i] = string.format("%d %d * * mon-fri", i % 60, i % 24)      -- weekdays
+    elseif k == 8 then r[i] = string.format("%s %+d * * *", i % 20 < 10 and "sunrise" or "sunset", i % 60 - 30)
+    else r[i] = string.format("%d * * * *", i % 60) end                               -- hourly
+  end
+  return r
+end
+
+local function oldScheduler(specs, start)
+  local tests = {}
+  for i, s in ipairs(specs) do tests[i] = fibaro.parseCron(s) end
+  local t0, fired = os.clock(), 0
+  for minute = 0, HOURS * 60 - 1 do
+    local date = os.date("*t", start + minute * 60)
+    for i = 1, #tests do if tests[i](date) then fired = fired + 1 end end
+  end
+  return os.clock() - t0, HOURS * 60, HOURS * 60 * #tests, fired
+end
+
+local function nextFireScheduler(specs, start)
+  local stop = start + HOURS * 3600
+  local nexts = {}
+  for i, s in ipairs(specs) do nexts[i] = select(2, fibaro.parseCron(s)) end
+  local t0, fired, evals, minutes = os.clock(), 0, 0, {}
+  for _, nextTime in ipairs(nexts) do
+    local t = nextTime(start - 1)
+    evals = evals + 1
+    while t and t < stop do
+      fired, minutes[t] = fired + 1, true
+      t = nextTime(t)
+      evals = evals + 1
+    end
+  end
+  local wakeups = 0
+  for _ in pairs(minutes) do wakeups = wakeups + 1 end
+  return os.clock() - t0, wakeups, evals, fired
+end
+
+local function report(name, cpu, wakeups, evals, fired)
+  print(string.format("%-17s cpu %6.3f s  wakeups %5d  rule evaluations %8d  fired %d",
+    name, cpu, wakeups, evals, fired))
+end
+
+function QuickApp:onInit()
+  local specs = rules()
+  local start = (os.time() // 60 + 1) * 60
+  local _, _, _, expected = oldScheduler(specs, start)
+  report("per-minute scan", oldScheduler(specs, start))
+  report("next-fire timers", nextFireScheduler(specs, start))
+
+  Event = Event_std
+  local count = 0
+  for i, s in ipairs(specs) do
+    Event.id = "cron" .. i
+    Event{type='cron', time=s}
+    function Event:handler() count = count + 1 end
+  end
+  local t0 = os.clock()
+  _PY.simulate(HOURS, nil, function()
+    print(string.format("end to end (Event{type='cron'}, %dh virtual): cpu %.3f s, fired %d of %d",
+      HOURS, os.clock() - t0, count, expected))
+    os.exit(0)
+  end)
+end
@@ -0,0 +1,102 @@
+"""
+Benchmark: IPC transports between the main process and the FastAPI subprocess.
+
+An echo process stands in for the main process' IPC handler: it reads
+`fibaro_api` requests from the request channel and answers each with a
+response carrying a device list (~2 KB, or ~100 KB for the large case).
+Variants:
+
+  queue+pydantic  multiprocessing.Queue, building/validating IPCMessage on
+                  both ends (the previous hot path)
+  queue           multiprocessing.Queue with plain dicts (--api-transport queue)
+  socket          FramedChannel, length-prefixed marshal frames over a Unix socket
+                  (--api-transport socket)
+
+"latency" is one request/response round trip at a time; "throughput"
+keeps WINDOW requests in flight.
+
+Run from the repository root:
+
+    python benchmarks/bench_ipc_transport.py
+"""
+
+import multiprocessing
+import queue
+import time
+import uuid
+
+from plua.fastapi_process import IPCMessage
+from plua.ipc_channel import FramedChannel
+
+ROUND_TRIPS = 2000
+WINDOW = 32
+
+
+def devices(n: int) -> list:
+    return [{"id": i, "name": f"Device {i}", "type": "com.fibaro.binarySwitch",
+             "properties": {"value": False, "power": 1.5}} for i in range(n)]
+
+
+def echo(request_queue, response_queue, pydantic: bool, n_devices: int):
+    data = devices(n_devices)
+    while True:
+        message = request_queue.get()
+        if message is None:
+            return
+        if pydantic:
+            message = IPCMessage(**message).model_dump()
+        response_queue.put({"id": message["id"], "type": "response",
+                            "data": {"success": True, "data": data, "status_code": 200},
+                            "timestamp": time.time()})
+
+
+def request(pydantic: bool) -> dict:
+    data = {"method": "GET", "path": "/api/devices", "data": None}
+    if pydantic:
+        return IPCMessage(id=str(uuid.uuid4()), type="fibaro_api", data=data, timestamp=time.time()).model_dump()
+    return {"id": str(uuid.uuid4()), "type": "fibaro_api", "data": data, "timestamp": time.time()}
+
+
+def run(variant: str, n_devices: int) -> tuple[float, float]:
+    pydantic = variant == "queue+pydantic"
+    make = FramedChannel if variant == "socket" else multiprocessing.Queue
+    request_queue, response_queue = make(), make()
+    process = multiprocessing.Process(target=echo, args=(request_queue, response_queue, pydantic, n_devices))
+    process.start()
+    try:
+        for _ in range(50):  # warm up
+            request_queue.put(request(pydantic))
+            response_queue.get(timeout=5)
+
+        start = time.perf_counter()
+        for _ in range(ROUND_TRIPS):
+            request_queue.put(request(pydantic))
+            response_queue.get(timeout=5)
+        latency = (time.perf_counter() - start) / ROUND_TRIPS
+
+        start = time.perf_counter()
+        for _ in range(WINDOW):
+            request_queue.put(request(pydantic))
+        for i in range(ROUND_TRIPS):
+            response_queue.get(timeout=5)
+            if i < ROUND_TRIPS - WINDOW:
+                request_queue.put(request(pydantic))
+        throughput = ROUND_TRIPS / (time.perf_counter() - start)
+    except queue.Empty:
+        return float("nan"), float("nan")
+    finally:
+        request_queue.put(None)
+        process.join(timeout=5)
+    return latency, throughput
+
+
+def main():
+    for label, n_devices in (("~2 KB replies", 20), ("~100 KB replies", 1000)):
+        print(label)
+        for variant in ("queue+pydantic", "queue", "socket"):
+            latency, throughput = run(variant, n_devices)
+            print(f"  {variant:15s} latency {latency * 1e6:8.1f} us   throughput {throughput:8.0f} msg/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark: Lua-side JSON encode/decode on HC3-style payloads of 1 KB, 100 KB and 5 MB.
+
+The payloads are the `/api/devices`-like device lists from
+bench_table_conversion.py, decoded into Lua tables first. "old encode" is
+the previous `prettyJsonFlat` (a `tostring`/key-map table and a Lua
+comparator sort for every object, `gsub` on every string), "encode" is
+the current `json.encode` and "_PY.to_json" is the Python route
+(`lua_to_python_table` + `json.dumps`). "decode" is `json.decode`, i.e.
+`json.loads` followed by Lupa's C `table_from`.
+
+Times are per call, averaged over a batch that starts with a full GC, so
+the garbage each encoder leaves behind is part of its cost.
+
+Run from the repository root:
+
+    python benchmarks/bench_json.py
+"""
+
+import json
+
+from bench_table_conversion import SIZES, payload
+
+from plua import LuaEngine
+
+OLD_ENCODE = r'''
+local escTab = {["\\"]="\\\\",['"']='\\"',["\n"]="\\n",["\r"]="\\r",["\t"]="\\t",["\b"]="\\b",["\f"]="\\f"}
+local sortKeys = {"type","device","deviceID","id","name","properties","value","oldValue","val","key","arg","event","events","msg","res"}
+local sortOrder={}
+for i,s in ipairs(sortKeys) do sortOrder[s]="\n"..string.char(i+64).." "..s end
+local function keyCompare(a,b)
+  local av,bv = sortOrder[a] or a, sortOrder[b] or b
+  return av < bv
+end
+return function(e0)
+  local res,seen = {},{}
+  local function pretty(e)
+    local t = type(e)
+    if t == 'string' then
+      res[#res+1] = '"' res[#res+1] = e:gsub("[\\\"\n\r\t\b\f]",escTab) res[#res+1] = '"'
+    elseif t == 'number' then res[#res+1] = e
+    elseif t == 'boolean' or t == 'function' or t=='thread' or t=='userdata' then
+      res[#res+1] = tostring(e)
+    elseif t == 'table' then
+      if seen[e] then res[#res+1]="..rec.."
+      elseif next(e)==nil then
+        local mt = getmetatable(e)
+        res[#res+1] = mt and mt.__isArray and '[]' or '{}'
+      elseif e[1] or #e>0 then
+        seen[e]=true
+        res[#res+1] = "[" pretty(e[1])
+        for i=2,#e do res[#res+1] = "," pretty(e[i]) end
+        res[#res+1] = "]"
+        seen[e]=nil
+      else
+        seen[e]=true
+        local k,kmap = {},{} for key,_ in pairs(e) do local ks = tostring(key) k[#k+1] = ks; kmap[ks]=key end
+        table.sort(k,keyCompare)
+        res[#res+1] = '{'; res[#res+1] = '"' t = k[1] res[#res+1] = t; res[#res+1] = '":' pretty(e[kmap[t]])
+        for i=2,#k do
+          res[#res+1] = ',"' t = k[i] res[#res+1] = t; res[#res+1] = '":' pretty(e[kmap[t]])
+        end
+        res[#res+1] = '}'
+        seen[e]=nil
+      end
+    elseif e == nil then res[#res+1]='null'
+    end
+  end
+  pretty(e0)
+  return table.concat(res)
+end
+'''
+
+TIMER = '''
+return function(f, arg, n)
+  collectgarbage()
+  local t = os.clock()
+  for i = 1, n do f(arg) end
+  return (os.clock() - t) / n
+end
+'''
+
+
+def main():
+    engine = LuaEngine()
+    old_encode = engine.execute_lua(OLD_ENCODE)
+    timer = engine.execute_lua(TIMER)
+    encode, decode, to_json = engine.execute_lua("return json.encode, json.decode, _PY.to_json")
+    for label, size in SIZES:
+        text = json.dumps(payload(size), ensure_ascii=False)
+        table, _ = decode(text)
+        assert old_encode(table) == encode(table)
+        runs = max(3, 2_000_000 // size)
+        results = [
+            ("old encode", timer(old_encode, table, runs)),
+            ("encode", timer(encode, table, runs)),
+            ("_PY.to_json", timer(to_json, table, runs)),
+            ("decode", timer(decode, text, runs)),
+        ]
+        base = results[0][1]
+        line = "  ".join(f"{name} {s * 1000:8.3f} ms ({base / s:4.2f}x)" for name, s in results)
+        print(f"{label:>6}  {line}")
+
+
+if __name__ == "__main__":
+    main()
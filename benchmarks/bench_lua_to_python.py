@@ -0,0 +1,96 @@
+"""
+Benchmark: lua_to_python_table on 10k-element Lua tables.
+
+"old" reproduces the previous converter (a class-name string test per key
+and value, a temporary dict for every table, then sorting the integer keys
+and comparing them with range() to detect arrays). "new" is the current
+`lua_to_python_table`: `lupa.lua_type` checks only for non-scalars, and
+arrays are collected as a list while keys 1, 2, 3... arrive in order.
+
+Run from the repository root:
+
+    python benchmarks/bench_lua_to_python.py
+"""
+
+import time
+from typing import Any
+
+from plua import LuaEngine
+from plua.lua_bindings import _decode_bytes, lua_to_python_table
+
+N = 10_000
+
+CASES = {
+    "array of numbers": f"local t = {{}} for i = 1, {N} do t[i] = i * 0.5 end return t",
+    "array of strings": f"local t = {{}} for i = 1, {N} do t[i] = 'item' .. i end return t",
+    "string-keyed map": f"local t = {{}} for i = 1, {N} do t['k' .. i] = i end return t",
+    "array of records": f"""
+        local t = {{}}
+        for i = 1, {N // 10} do
+          t[i] = {{id = i, name = 'Device ' .. i, value = i % 2 == 0,
+                   properties = {{power = i * 1.5, tags = {{'a', 'b', 'c'}}}}}}
+        end
+        return t""",
+}
+
+
+def _is_lua_table(obj: Any) -> bool:
+    return hasattr(obj, '__class__') and 'lua' in str(obj.__class__).lower()
+
+
+def old_lua_to_python(lua_table: Any, seen: set[int], depth: int) -> Any:
+    if isinstance(lua_table, bytes):
+        return _decode_bytes(lua_table)
+    if not _is_lua_table(lua_table):
+        return lua_table
+    oid = id(lua_table)
+    if oid in seen:
+        return "<cycle>"
+    seen.add(oid)
+    try:
+        temp_dict: dict[Any, Any] = {}
+        for key, value in lua_table.items():
+            if isinstance(key, bytes):
+                python_key = _decode_bytes(key)
+            elif _is_lua_table(key):
+                python_key = old_lua_to_python(key, seen, depth + 1)
+            else:
+                python_key = key
+            if isinstance(value, bytes):
+                python_value = _decode_bytes(value)
+            elif _is_lua_table(value):
+                python_value = old_lua_to_python(value, seen, depth + 1)
+            else:
+                python_value = value
+            temp_dict[python_key] = python_value
+        if temp_dict and all(isinstance(k, (int, float)) and k > 0 for k in temp_dict.keys()):
+            keys = sorted([int(k) for k in temp_dict.keys()])
+            if keys == list(range(1, len(keys) + 1)):
+                return [temp_dict[k] for k in keys]
+        return temp_dict
+    finally:
+        seen.discard(oid)
+
+
+def measure(func, table) -> float:
+    """Best-of-N wall time in ms."""
+    best = float("inf")
+    for _ in range(20):
+        start = time.perf_counter()
+        func(table)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    engine = LuaEngine()
+    for name, script in CASES.items():
+        table = engine.execute_lua(script)
+        assert old_lua_to_python(table, set(), 0) == lua_to_python_table(table)
+        old = measure(lambda t: old_lua_to_python(t, set(), 0), table)
+        new = measure(lua_to_python_table, table)
+        print(f"{name:18s} old {old:7.2f} ms  new {new:6.2f} ms  ({old / new:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
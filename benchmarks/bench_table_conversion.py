@@ -0,0 +1,106 @@
+"""
+Benchmark: python_to_lua_table on HC3-style payloads of 1 KB, 100 KB and 5 MB.
+
+The payloads are `/api/devices`-like lists of device dicts, sized by their
+JSON encoding and decoded with `json.loads` as the HC3 client does. The
+"two-pass" variant reproduces the previous converter (a recursive Python
+walk for cycles and depth, then `table_from(recursive=True)` walking the
+data again); "single-pass" is the current `python_to_lua_table`; "json"
+is Lupa's recursive `table_from` alone, which `_PY.parse_json` (Lua's
+`json.decode`) now uses since `json.loads` output needs no checks.
+
+Run from the repository root:
+
+    python benchmarks/bench_table_conversion.py
+"""
+
+import json
+import time
+
+from plua import LuaEngine
+from plua.lua_bindings import _MAX_TABLE_DEPTH, python_to_lua_table
+
+SIZES = [("1 KB", 1_000), ("100 KB", 100_000), ("5 MB", 5_000_000)]
+
+
+def device(i: int) -> dict:
+    return {
+        "id": i,
+        "name": f"Device {i}",
+        "roomID": 219,
+        "type": "com.fibaro.binarySwitch",
+        "baseType": "com.fibaro.actor",
+        "enabled": True,
+        "visible": True,
+        "interfaces": ["energy", "light", "power"],
+        "properties": {
+            "value": False,
+            "dead": False,
+            "energy": 1.25,
+            "power": 0.0,
+            "categories": ["lights"],
+            "parameters": [{"id": k, "size": 1, "value": k} for k in range(4)],
+            "quickAppVariables": [{"name": "interval", "value": 60}],
+        },
+        "actions": {"turnOn": 0, "turnOff": 0, "toggle": 0},
+        "created": 1700000000,
+        "modified": 1700000000,
+    }
+
+
+def payload(size: int) -> list:
+    per_device = len(json.dumps(device(0)))
+    return json.loads(json.dumps([device(i) for i in range(max(1, size // per_device))]))
+
+
+def two_pass(lua, data):
+    def _check(obj, seen, depth):
+        if depth > _MAX_TABLE_DEPTH:
+            raise ValueError("depth")
+        if isinstance(obj, (dict, list)):
+            oid = id(obj)
+            if oid in seen:
+                raise ValueError("cycle")
+            seen.add(oid)
+            try:
+                values = obj.values() if isinstance(obj, dict) else obj
+                for v in values:
+                    _check(v, seen, depth + 1)
+            finally:
+                seen.discard(oid)
+
+    _check(data, set(), 0)
+    return lua.table_from(data, recursive=True)
+
+
+def measure(func, data) -> float:
+    """Best-of-N wall time in ms, N scaled so each case runs for ~0.5 s."""
+    start = time.perf_counter()
+    func(data)
+    once = time.perf_counter() - start
+    best = once
+    for _ in range(max(3, min(2000, int(0.5 / max(once, 1e-6))))):
+        start = time.perf_counter()
+        func(data)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    engine = LuaEngine()
+    lua = engine._lua
+    variants = [
+        ("two-pass", lambda d: two_pass(lua, d)),
+        ("single-pass", python_to_lua_table),
+        ("json", lambda d: lua.table_from(d, recursive=True)),
+    ]
+    for label, size in SIZES:
+        data = payload(size)
+        results = [(name, measure(func, data)) for name, func in variants]
+        base = results[0][1]
+        line = "  ".join(f"{name} {ms:9.3f} ms ({base / ms:4.2f}x)" for name, ms in results)
+        print(f"{label:>6} ({len(data):5d} devices)  {line}")
+
+
+if __name__ == "__main__":
+    main()
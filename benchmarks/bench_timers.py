@@ -0,0 +1,108 @@
+"""
+Benchmark: 100k concurrent timers, heap scheduler vs one asyncio Task per timer.
+
+The task-per-timer variant reproduces the previous `AsyncTimerManager`
+(uuid4 string id, a record per timer, `asyncio.create_task()` sleeping in
+`asyncio.sleep`). The heap variant is the current `AsyncTimerManager`,
+driven by a single `loop.call_at()` handle. For each we arm N timers, then
+cancel half and let the other half fire, reporting wall time per phase,
+and separately the traced memory held while N timers are pending.
+
+Run from the repository root:
+
+    python benchmarks/bench_timers.py
+"""
+
+import asyncio
+import time
+import tracemalloc
+import uuid
+
+from plua.timers import AsyncTimerManager
+
+N = 100_000
+DELAY_MS = 200
+
+
+class TaskPerTimer:
+    """Pre-heap design: one Task + one asyncio.sleep per timer."""
+
+    def __init__(self):
+        self._timers = {}
+
+    def set_timeout(self, delay_ms, callback, *args):
+        timer_id = str(uuid.uuid4())
+
+        async def timer_task():
+            try:
+                await asyncio.sleep(delay_ms / 1000.0)
+                if timer_id in self._timers:
+                    callback(*args)
+                    self._timers.pop(timer_id, None)
+            except asyncio.CancelledError:
+                pass
+
+        self._timers[timer_id] = {"id": timer_id, "delay": delay_ms, "task": asyncio.create_task(timer_task())}
+        return timer_id
+
+    def clear_timer(self, timer_id):
+        info = self._timers.pop(timer_id, None)
+        if info:
+            info["task"].cancel()
+        return info is not None
+
+    def get_timer_count(self):
+        return len(self._timers)
+
+
+async def measure_memory(manager) -> float:
+    """Traced bytes per pending timer (tracemalloc slows arming, so it is a separate pass)."""
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    ids = [manager.set_timeout(60_000, print) for _ in range(N)]
+    await asyncio.sleep(0)  # let task-based timers reach their sleep
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    for timer_id in ids:
+        manager.clear_timer(timer_id)
+    await asyncio.sleep(0)
+    return used / N
+
+
+async def run(name, manager):
+    fired = 0
+
+    def callback():
+        nonlocal fired
+        fired += 1
+
+    t0 = time.perf_counter()
+    ids = [manager.set_timeout(DELAY_MS, callback) for _ in range(N)]
+    await asyncio.sleep(0)
+    t1 = time.perf_counter()
+    for timer_id in ids[::2]:
+        manager.clear_timer(timer_id)
+    t2 = time.perf_counter()
+    while manager.get_timer_count():
+        await asyncio.sleep(0.01)
+    t3 = time.perf_counter()
+    per_timer = await measure_memory(manager)
+
+    print(
+        f"{name:15s} arm {(t1 - t0) * 1e6 / N:6.2f} us/timer  "
+        f"cancel {(t2 - t1) * 1e6 / (N // 2):5.2f} us/timer  "
+        f"fire+drain {max(0.0, t3 - t1 - DELAY_MS / 1000) * 1e3:7.1f} ms  "
+        f"memory {per_timer:5.0f} B/timer ({per_timer * N / 2**20:5.1f} MiB)  fired={fired}"
+    )
+
+
+async def main():
+    manager = AsyncTimerManager()
+    await manager.start()
+    await run("heap scheduler", manager)
+    await manager.stop()
+    await run("task per timer", TaskPerTimer())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -41,10 +41,11 @@ _PY.fibaroApiHook = function(method, path, data)
     --print("✅ fibaro.lua fibaroApiHook called with:", method, path, data)
     if Emu then 
         path = path:gsub("^/api", "")  -- Remove /api prefix for compatibility
-        if data and type(data) == 'string' then
-            local _,ndata = pcall(json.decode, data)
-            data = ndata or {}      
+        if type(data) == 'string' then -- raw request body, decoded only here
+            local ok,ndata = pcall(json.decode, data)
+            data = ok and ndata
         end
+        data = data or {}
         return Emu:API_CALL(method, path, data)
     else
         print("Emulator not initialized. Please call _PY.main_file_hook first.")
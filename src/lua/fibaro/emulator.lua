@@ -18,7 +18,8 @@ end
 ---@diagnostic disable-next-line: lowercase-global
 _print = print
 local pluaConf = {}
-local DEVICEID = 5555-1
+-- Each shard assigns ids from its own range so ids stay unique across shards
+local DEVICEID = 5555-1 + (_PY.config.shard_index or 0)*10000
 local lfs = require("lfs")
 
 local function loadLuaFile(filename)
@@ -134,6 +135,7 @@ function Emulator:__init()
   
   loadLib("utils",self)
   loadLib("fibaro_api",self)
+  loadLib("shard",self)
   loadLib("tools",self)
   self.lib.ui = loadLib("ui",self)
   
@@ -169,6 +171,10 @@ function Emulator:registerDevice(info)
   self:DEBUG("Device registered. Total devices in DIR: " .. table.maxn(self.DIR))
 end
 
+function Emulator:unregisterDevice(id)
+  self.DIR[id] = nil
+end
+
 local gbgcolor = os.getenv("PLUA_QA_COLOR") or "lightgrey"
 
 local tileX, tileY = 20, 20
@@ -549,7 +555,22 @@ local stdLua = {
   "print",
 }
 
+-- Run f(...) with `owner` (a QA id) as the current callback owner, so the
+-- timers and network callbacks it registers are scheduled under that QA.
+function Emulator:withOwner(owner,f,...)
+  local prev = _PY.setCurrentOwner(owner)
+  local res = table.pack(pcall(f,...))
+  _PY.setCurrentOwner(prev)
+  if not res[1] then error(res[2],0) end
+  return table.unpack(res,2,res.n)
+end
+
+local loadQA
 function Emulator:loadQA(info,envAdds)
+  return self:withOwner(info.device.id,loadQA,self,info,envAdds)
+end
+
+function loadQA(self,info,envAdds)
   -- Load and execute included files + main file
   envAdds = envAdds or {}
   local env = { 
@@ -631,8 +652,8 @@ function Emulator:startQA(id)
   
   --env.setTimeout(function()
   coroutine.wraptest = coroutine.wraptest
-  if coroutine.wraptest then return coroutine.wraptest(func,info) end
-  coroutine.wrapdebug(func, function(err,tb)
+  if coroutine.wraptest then return self:withOwner(id,coroutine.wraptest,func,info) end
+  self:withOwner(id,coroutine.wrapdebug(func, function(err,tb)
     local file = err:match('(%b"")')
     if file then 
       file = file:sub(2,-2) 
@@ -641,7 +662,7 @@ function Emulator:startQA(id)
     err = tostring(err):match(":(%d+: .*)") or err
     print(string.format("Error in QA %s, %s:%s", id, (file or ""), tostring(err)))
     print(tb)
-  end)() 
+  end))
   --end, 0)
 end
 
@@ -819,9 +840,9 @@ function Emulator:getRefreshStates(last) return _PY.getEvents(last) end
 
 function Emulator:refreshEvent(typ,data) 
   local created = os.time()
-  setTimeout(function() 
+  _PY.nextTick(function() 
     _PY.addEventFromLua(json.encode({type=typ,created=created,data=data})) 
-  end, 0)
+  end)
 end
 
 local headerKeys = {}
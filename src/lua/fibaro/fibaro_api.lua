@@ -236,7 +236,7 @@ router:add("POST", "/devices/<id>/action/<name>", function(path, data, vars, que
       Emu:ERROR("No env for device",id,dev.device.name)
       return nil,HTTP.INTERNAL_SERVER_ERROR
     end
-    dev.env.onAction(id,{ deviceId = id, actionName = vars.name, args = data.args })
+    Emu:withOwner(dev.device.id,dev.env.onAction,id,{ deviceId = id, actionName = vars.name, args = data.args })
     return nil,HTTP.OK
   end
 end)
@@ -465,10 +465,10 @@ router:add("POST", "/plugins/callUIEvent", function(path, data, vars, query)
     }
     if dev.device.isChild then dev = Emu.DIR[dev.device.parentId] end
     local env = Emu.DIR[dev.device.id].env
-    return env.onAction(dev.device.id,args)
+    return Emu:withOwner(dev.device.id,env.onAction,dev.device.id,args)
   else
     -- Call onUIEvent directly instead of using setTimeout to avoid event loop issues
-    dev.env.onUIEvent(data.deviceID,data)
+    Emu:withOwner(dev.device.isChild and dev.device.parentId or dev.device.id,dev.env.onUIEvent,data.deviceID,data)
   end
   return nil,HTTP.OK
 end)
@@ -510,7 +510,7 @@ router:add("DELETE", "/plugins/removeChildDevice/<id>", function(path, data, var
   if not dev then 
     if Emu.offline then return nil,HTTP.NOT_FOUND else return hc3api.delete(path) end
   elseif dev.device.isChild then
-    Emu.DIR[id] = nil
+    Emu:unregisterDevice(id)
     if dev.device.isProxy then
       hc3api.delete("/plugins/removeChildDevice/"..id)
     end
@@ -203,7 +203,24 @@ local function sunCalc(time)
   return sunrise, sunset, sunrise_t, sunset_t
 end
 
+-- Sunrise/sunset per date, shared by all cron rules
+local sunDays,sunDayCount = {},0
+local function sunTimes(date,t)
+  local st = sunDays[date]
+  if not st then
+    if sunDayCount > 400 then sunDays,sunDayCount = {},0 end
+    local sunrise,sunset = sunCalc(t)
+    st = {sunrise=sunrise,sunset=sunset}
+    sunDays[date],sunDayCount = st,sunDayCount+1
+  end
+  return st
+end
+
 ----------------- Cron ------------------
+-- Parses a cron string "min hour day month wday [year]" (or "sunset -10 * * *",
+-- "sunrise+10 * * *") and returns two functions:
+--   test(date)   -> true if the date table (os.date("*t")) matches
+--   nextTime(t)  -> epoch time of the first matching minute after t, or nil
 local function dateTest(dateStr0)
   local days = {sun=1,mon=2,tue=3,wed=4,thu=5,fri=6,sat=7}
   local months = {jan=1,feb=2,mar=3,apr=4,may=5,jun=6,jul=7,aug=8,sep=9,oct=10,nov=11,dec=12}
@@ -249,32 +266,49 @@ local function dateTest(dateStr0)
     return res
   end
 
-  local function parseDateStr(dateStr) --,last)
+  local function parseDateStr(dateStr,month0) --,last)
     local seq = string.split(dateStr," ")   -- min,hour,day,month,wday
     assert(seq,"Bad date string '%s'",dateStr)
     local lim = {{min=0,max=59},{min=0,max=23},{min=1,max=31},{min=1,max=12},{min=1,max=7},{min=2000,max=3000}}
-    for i=1,6 do if seq[i]=='*' or seq[i]==nil then seq[i]=tostring(lim[i].min).."-"..lim[i].max end end
+    for i=1,6 do
+      if seq[i]=='*' or seq[i]==nil then seq[i]=tostring(lim[i].min).."-"..lim[i].max
+      else seq[i]=seq[i]:gsub("^%*/",lim[i].min.."-"..lim[i].max.."/") end -- */15
+    end
     seq = map(function(w) return string.split(w,",") end, seq)   -- split sequences "3,4"
-    local month0 = os.date("*t",os.time()).month
     seq = map(function(t) local m = table.remove(lim,1);
         return flatten(map(function (g) return expandDate({g,m},month0) end, t))
       end, seq) -- expand intervalls "3-5"
     return map(seq2map,seq)
   end
-  local sun,offs,day,sunPatch = dateStr0:match("^(sun%a+) ([%+%-]?%d+)")
+  local sun,offs,rest = dateStr0:match("^(sun%a+)%s*([%+%-]?%d*)(.*)$")
+  local day,sunPatch
   if sun then
-    sun = sun.."Hour"
-    dateStr0=dateStr0:gsub("sun%a+ [%+%-]?%d+","0 0")
-    sunPatch=function(dateSeq)
-      local h,m = (fibaro.getValue(1,sun)):match("(%d%d):(%d%d)")
-      dateSeq[1]={[(tonumber(h)*60+tonumber(m)+tonumber(offs))%60]=true}
-      dateSeq[2]={[math.floor((tonumber(h)*60+tonumber(m)+tonumber(offs))/60)]=true}
+    offs = tonumber(offs) or 0
+    dateStr0 = "0 0 "..rest:match("^%s*(.-)%s*$")
+  end
+  -- Minute and hour of the sun event (+offset) on the day of time t. Today's
+  -- value comes from the HC3 (device 1), other days are calculated.
+  local function sunMinute(t)
+    local hm
+    local date = os.date("%Y-%m-%d",t)
+    if date == os.date("%Y-%m-%d") then hm = fibaro.getValue(1,sun.."Hour")
+    else hm = sunTimes(date,t)[sun] end
+    local h,m = hm:match("(%d%d):(%d%d)")
+    local mins = tonumber(h)*60+tonumber(m)+offs
+    return mins%60, math.floor(mins/60)
+  end
+  if sun then
+    sunPatch=function(dateSeq,t)
+      local m,h = sunMinute(t or os.time())
+      dateSeq[1]={[m]=true}
+      dateSeq[2]={[h]=true}
     end
   end
-  local dateSeq = parseDateStr(dateStr0)
-  return function(currDate) -- Pretty efficient way of testing dates...
+  local dateSeq = parseDateStr(dateStr0,os.date("*t",os.time()).month)
+
+  local function test(currDate) -- Pretty efficient way of testing dates...
     local t = currDate or os.date("*t",os.time())
-    if month and month~=t.month then dateSeq=parseDateStr(dateStr0) end -- Recalculate 'last' every month
+    if month and month~=t.month then dateSeq=parseDateStr(dateStr0,t.month) end -- Recalculate 'last' every month
     if sunPatch and (month and month~=t.month or day~=t.day) then sunPatch(dateSeq) day=t.day end -- Recalculate sunset/sunrise
     return
     dateSeq[1][t.min] and    -- min     0-59
@@ -283,25 +317,62 @@ local function dateTest(dateStr0)
     dateSeq[4][t.month] and  -- month   1-12
     dateSeq[5][t.wday] or false      -- weekday 1-7, 1=sun, 7=sat
   end
-end
 
-local cronItems = {}
-local cronRef,nxt = nil,0
-local function addCronItem(event) -- {type='cron',id=k, time='* * * * *'}
-  local dateTest = dateTest(event.time)
-  cronItems[dateTest] = event
-  local function loop()
-    local date = os.date("*t",os.time())
-    for dateTest,event in pairs(cronItems) do
-      if dateTest(date) then post(event) end
+  -- Walk forward day by day (at most 8 years, enough for '29 2'), and on the
+  -- first matching day pick the first matching hour:minute.
+  local function sorted(set,lo,hi) local r = {} for v=lo,hi do if set[v] then r[#r+1]=v end end return r end
+  local monthSeqs,lists = {},{}
+  local function nextTime(after)
+    local d = os.date("*t",(after//60+1)*60)
+    local hour,min = d.hour,d.min
+    for _=1,8*366 do
+      local seq = dateSeq
+      if month then -- 'last'/'lastw' depend on the month
+        seq = monthSeqs[d.month] or parseDateStr(dateStr0,d.month)
+        monthSeqs[d.month] = seq
+      end
+      if seq[6][d.year] and seq[4][d.month] and seq[3][d.day] and seq[5][d.wday] then
+        local hours,mins
+        if sun then
+          local m,h = sunMinute(os.time({year=d.year,month=d.month,day=d.day,hour=12}))
+          hours,mins = {h},{m}
+        else
+          local l = lists[seq] or { sorted(seq[2],0,23), sorted(seq[1],0,59) }
+          lists[seq] = l
+          hours,mins = l[1],l[2]
+        end
+        for _,h in ipairs(hours) do
+          if h >= hour then
+            for _,m in ipairs(mins) do
+              if h > hour or m >= min then
+                return os.time({year=d.year,month=d.month,day=d.day,hour=h,min=m,sec=0})
+              end
+            end
+          end
+        end
+      end
+      d = os.date("*t",os.time({year=d.year,month=d.month,day=d.day+1,hour=12}))
+      hour,min = 0,0
     end
-    nxt = nxt + 60
-    cronRef = setTimeout(loop,1000*(nxt-os.time()))
   end
-  if cronRef == nil then
-    nxt = (os.time() // 60 + 1) *60
-    cronRef = setTimeout(loop,1000*(nxt-os.time())) 
+  return test,nextTime
+end
+fibaro.parseCron = dateTest -- test,nextTime = fibaro.parseCron("0 8 * * mon-fri")
+
+-- Each cron rule has its own timer, armed for its next occurrence and
+-- re-armed from that occurrence after posting, so nothing scans all rules
+-- every minute.
+local function addCronItem(event) -- {type='cron',id=k, time='* * * * *'}
+  local _,nextTime = dateTest(event.time)
+  local function arm(after)
+    local t = nextTime(after)
+    if not t then return end
+    setTimeout(function()
+      post(event)
+      arm(t)
+    end,1000*math.max(0,t-os.time()))
   end
+  arm(os.time())
 end 
 
 ------------------ Time ---------------------------------
@@ -36,20 +36,29 @@ local mobdebug = require("mobdebug")
 fibaro.plua = fibaro.plua or {}
 
 local oldSetTimeout = setTimeout
-function setTimeout(func,ms)
+function setTimeout(func,ms,options)
   local ref
   ref = oldSetTimeout(function() 
     _PY.mobdebug.on()
     qaTimers[ref]= nil 
     --fibaro.plua.lib.prettyCall(func,timerErr(ref)) 
     coroutine.wrapdebug(func, timerErr(ref))()  -- was: prettyCall(func, timerErr(ref))
-  end,ms)
+  end,ms,options)
   qaTimers[ref]= 'timer'
   return ref
 end
 
+-- Run func as soon as the current callback returns (see _PY.nextTick),
+-- in a coroutine like timer callbacks
+local function nextTick(func)
+  _PY.nextTick(function()
+    _PY.mobdebug.on()
+    coroutine.wrapdebug(func, printErr)()
+  end)
+end
+
 local oldSetInterval = setInterval
-function setInterval(func, ms)
+function setInterval(func, ms, options)
   local ref
   ref = oldSetInterval(function()
     _PY.mobdebug.on()
@@ -59,7 +68,7 @@ function setInterval(func, ms)
       timerErr(ref)(err)
       clearInterval(ref)
     end
-  end, ms)
+  end, ms, options)
   qaTimers[ref] = 'interv'
   return ref
 end
@@ -396,7 +405,7 @@ end
 -- @param event - Event object containing action details
 function onAction(id,event) -- { deviceID = 1234, actionName = "test", args = {1,2,3} }
   --if Emu:DBGFLAG('onAction') then print("onAction: ", json.encode(event)) end
-  setTimeout(function()
+  nextTick(function()
   local self = plugin.mainQA
   ---@diagnostic disable-next-line: undefined-field
   if self.actionHandler then return self:actionHandler(event) end
@@ -406,7 +415,7 @@ function onAction(id,event) -- { deviceID = 1234, actionName = "test", args = {1
     return self.childDevices[event.deviceId]:callAction(event.actionName, table.unpack(event.args or {}))
   end
   self:error(fmt("Child with id:%s not found",id))
-end,0)
+end)
 end
 
 -- Global handler for UI events
@@ -425,7 +434,7 @@ function onUIEvent(id, event)
       fibaro.warning(__TAG,fmt("UI callback for %s %s not found.", event.elementName, event.eventType))
       return
     end
-    setTimeout(function() quickApp:callAction(action, event) end,0)
+    nextTick(function() quickApp:callAction(action, event) end)
   else
     fibaro.warning(__TAG,fmt("UI callback for element %s not found.", event.elementName))
   end
@@ -0,0 +1,54 @@
+local Emu = ...
+
+-- Shard mode (plua --shards N, see src/plua/shards.py). Emu.DIR only holds this
+-- shard's devices; the coordinator knows which shard owns the others.
+-- api.* calls naming a device of another shard are run on that shard,
+-- GET /devices lists the devices of all shards, and the ids in Emu.DIR and
+-- refreshStates events raised here are published to the coordinator.
+if not _PY.config.shard_coordinator then return end
+
+local function publishDevices()
+  local ids = {}
+  for id in pairs(Emu.DIR) do ids[#ids+1] = id end
+  _PY.shard_publish_devices(ids)
+end
+
+local registerDevice = Emu.registerDevice
+function Emu:registerDevice(info)
+  registerDevice(self, info)
+  publishDevices()
+end
+
+local unregisterDevice = Emu.unregisterDevice
+function Emu:unregisterDevice(id)
+  unregisterDevice(self, id)
+  publishDevices()
+end
+
+local function isDeviceList(path)
+  return path:match("^/devices/?$") or path:match("^/devices/?%?")
+end
+
+local api = Emu.api
+for _,method in ipairs({"get","post","put","delete"}) do
+  local call, verb = api[method], method:upper()
+  api[method] = function(path, data)
+    local remote, res, status = _PY.shard_call(verb, path, data)
+    if remote then return res, status end
+    res, status = call(path, data)
+    if verb == "GET" and type(res) == 'table' and isDeviceList(path) then
+      local seen = {}
+      for _,dev in ipairs(res) do seen[dev.id] = true end
+      for _,dev in ipairs(_PY.shard_remote_devices(path)) do
+        if not seen[dev.id] then seen[dev.id] = true; res[#res+1] = dev end
+      end
+    end
+    return res, status
+  end
+end
+
+local addEventFromLua = _PY.addEventFromLua
+function _PY.addEventFromLua(event)
+  _PY.shard_publish_event(event)
+  return addEventFromLua(event)
+end
@@ -161,6 +161,17 @@ error = safe_error
 json = require('json')
 local callbacks = {}
 local callbackID = 0
+-- Owner (QuickApp id) of the code currently running. Callbacks and timers
+-- inherit it when registered, and it is restored while they run, so Python
+-- can schedule each QA's callbacks fairly (see cross_thread.FairLane).
+local currentOwner = nil
+
+function _PY.setCurrentOwner(owner)
+  local prev = currentOwner
+  currentOwner = owner
+  return prev
+end
+function _PY.getCurrentOwner() return currentOwner end
 local userFuns = {}
 
 local environment = _PY.get_system_info().environment
@@ -181,121 +192,380 @@ if f then
   end
 end
 
+-- Live counts of non-system callbacks and running intervals, kept up to date
+-- on every add/remove so keep-alive checks never scan the tables. Python is
+-- told only when the process goes from idle to active or back.
+local pendingCount, intervalCount = 0, 0
+
+local function updateActivity(dPending, dIntervals)
+  local wasActive = pendingCount + intervalCount > 0
+  pendingCount = pendingCount + dPending
+  intervalCount = intervalCount + dIntervals
+  local active = pendingCount + intervalCount > 0
+  if active ~= wasActive then _PY.set_activity(active) end
+end
+
+local function activityDelta(entry, d)
+  if entry.system then return end
+  if entry.type == "interval" then updateActivity(0, d) else updateActivity(d, 0) end
+end
+
+-- Registry bookkeeping (see _PY.getRegistry): every entry records when it
+-- was registered (os.time, so ages have 1s resolution and no Python call).
+-- Where it was registered costs a stack walk, so sites (and tracebacks for
+-- persistent entries) are only captured with config.callback_sites, and for
+-- a QA once it has been reported as leaking. Live persistent callbacks are
+-- counted per QA, and a QA that keeps adding them without clearing any is
+-- reported each time its count doubles past config.callback_leak_warn
+-- (default 100; 0 disables the check). Intervals are persistent too, but a
+-- script legitimately runs many of them, so they are not counted.
+local thisFile = debug.getinfo(1, "S").short_src
+local clock = os.time
+local leakWarn = tonumber(config.callback_leak_warn) or 100
+local captureSites = config.callback_sites == true
+local persistentCount, persistentWarnAt, siteOwners = {}, {}, {}
+
+local function leakTracked(entry)
+  return entry.persistent and not entry.system and entry.type ~= "interval"
+end
+
+local function ownerKey(o) if o == nil then return "system" end return o end
+
+-- First frame in user code, i.e. outside src/lua (QA timers go through the
+-- fibaro wrappers), else the first frame outside this file. Snippets run by
+-- the engine ("<python>") only count when no runtime frame was seen.
+local libSource = debug.getinfo(1, "S").source:match("^(@.*)[/\\]") or ("@" .. luaLibPath)
+local function registrationSite()
+  local fallback
+  for level = 3, 20 do
+    local info = debug.getinfo(level, "Sl")
+    if not info then break end
+    if info.currentline > 0 then
+      local site = info.short_src .. ":" .. info.currentline
+      if info.source:sub(1, #libSource) ~= libSource then
+        if info.source ~= "<python>" or not fallback then return site end
+      elseif not fallback and info.short_src ~= thisFile then
+        fallback = site
+      end
+    end
+  end
+  return fallback
+end
+
+local function checkGrowth(owner, n)
+  local warnAt = persistentWarnAt[owner] or leakWarn
+  if leakWarn <= 0 or n < warnAt then return end
+  persistentWarnAt[owner] = warnAt * 2
+  siteOwners[owner] = true
+  local sites = {}
+  for _, entry in pairs(callbacks) do
+    if leakTracked(entry) and ownerKey(entry.owner) == owner and entry.site then
+      sites[entry.site] = (sites[entry.site] or 0) + 1
+    end
+  end
+  local top, topN = nil, 0
+  for site, c in pairs(sites) do if c > topN then top, topN = site, c end end
+  local where = top and string.format(" (%d registered at %s)", topN, top)
+    or " (registration sites are recorded from now on)"
+  print(string.format(
+    "Registry: QA %s holds %d persistent callbacks that were never cleared%s",
+    tostring(owner), n, where))
+end
+
+local function addCallback(id, entry)
+  callbacks[id] = entry
+  activityDelta(entry, 1)
+  entry.created = clock()
+  if captureSites or siteOwners[ownerKey(entry.owner)] then
+    entry.site = registrationSite()
+    if entry.persistent and not entry.system then entry.traceback = debug.traceback("", 3) end
+  end
+  if leakTracked(entry) then
+    local owner = ownerKey(entry.owner)
+    local n = (persistentCount[owner] or 0) + 1
+    persistentCount[owner] = n
+    checkGrowth(owner, n)
+  end
+end
+
+-- Returns the removed entry, or nil if it was already gone
+local function removeCallback(id)
+  local entry = callbacks[id]
+  if entry then
+    callbacks[id] = nil
+    activityDelta(entry, -1)
+    if leakTracked(entry) then
+      local owner = ownerKey(entry.owner)
+      persistentCount[owner] = persistentCount[owner] - 1
+    end
+  end
+  return entry
+end
+
 -- Register a callback and return its ID
 function _PY.registerCallback(callback, persistent, system)
   callbackID = callbackID + 1
   persistent = persistent or false
   system = system or false
   --print("REG CB", tostring(callbackID), tostring(callback), persistent, system)
-  callbacks[callbackID] = { 
+  addCallback(callbackID, { 
     type = "callback", 
     callback = callback,
     system = system,
+    owner = currentOwner,
     persistent = persistent -- Default to non-persistent
-  }
+  })
+  if currentOwner ~= nil then _PY.set_callback_owner(callbackID, currentOwner) end
   return callbackID
 end
 
 function _PY.setTimeout(callback, ms, options)
   options = options or {}
   callbackID = callbackID + 1
-  callbacks[callbackID] = { 
+  addCallback(callbackID, { 
     type = "timeout", 
     callback = callback, 
     system = options.system or false,
-    ref = _PY.set_timeout(callbackID, ms) 
-  }
+    owner = options.owner or currentOwner,
+    ref = _PY.set_timeout(callbackID, ms, options.slack, options.realtime)
+  })
   return callbackID
 end
 
 function _PY.clearTimeout(id)
-  if callbacks[id] then
-    _PY.clear_timeout(callbacks[id].ref)
-    callbacks[id] = nil
-  end
+  local entry = removeCallback(id)
+  if entry then _PY.clear_timeout(entry.ref) end
 end
 
 -- Clear a registered callback manually (for persistent callbacks)
 function _PY.clearRegisteredCallback(id)
-  if callbacks[id] then
-    callbacks[id] = nil
-  end
+  local entry = removeCallback(id)
+  if entry and entry.owner ~= nil then _PY.clear_callback_owner(id) end
 end
 
-local intervals = {}
-local intervalID = 0
-
-function _PY.setInterval(callback, ms)
-  intervalID = intervalID + 1
-  local id = intervalID
-  
-  -- Initialize the interval entry
-  intervals[id] = true
-  
-  local function loop()
-    if not intervals[id] then return end  -- Check if interval was cleared
-    xpcall(callback,function(err)
+-- Intervals run natively in Python on a fixed-rate schedule anchored to
+-- their start time (see timers.AsyncTimerManager.set_interval). Each one is a
+-- persistent callback entry of type "interval"; options.policy picks what
+-- happens to missed ticks: "skip" (default), "burst" or "delay".
+-- setTimeout/setInterval accept options.slack (ms): the timer may run that
+-- much late, so timers due close together share one wakeup and are
+-- delivered together through _PY.timerExpiredBatch.
+function _PY.setInterval(callback, ms, options)
+  options = options or {}
+  callbackID = callbackID + 1
+  local id = callbackID
+  local entry = {
+    type = "interval",
+    callback = callback,
+    persistent = true,
+    system = options.system or false,
+    owner = options.owner or currentOwner,
+    -- An error stops the interval, as it always has
+    onError = function(err)
       print("Error in interval callback: " .. tostring(err))
       print(debug.traceback())
-      intervals[id] = nil
-    end)
-    if intervals[id] then
-      -- If the interval is still active, schedule the next execution
-      -- Store the new timeout reference in the intervals table
-      intervals[id] = _PY.setTimeout(loop, ms)
-    end
-  end
-  
-  -- Start the first execution
-  intervals[id] = _PY.setTimeout(loop, ms) 
+      _PY.clearInterval(id)
+    end,
+  }
+  addCallback(id, entry)
+  entry.ref = _PY.set_interval(id, ms, options.policy, options.slack)
   return id
 end
 
 function _PY.clearInterval(id)
-  local ref = intervals[id]
-  if ref then 
-    _PY.clearTimeout(ref) 
-    intervals[id] = nil
+  local entry = callbacks[id]
+  if entry and entry.type == "interval" then
+    removeCallback(id)
+    _PY.clear_timeout(entry.ref)
+  end
+end
+
+-- Tick count, skipped ticks and drift/jitter in ms of a running interval
+function _PY.getIntervalStats(id)
+  local entry = callbacks[id]
+  if entry and entry.type == "interval" then return _PY.get_interval_stats(entry.ref) end
+end
+
+-- Simulated time: _PY.simulate(hours, start, onEnd) runs all timers on a
+-- virtual clock (timers.AsyncTimerManager.simulate) starting at epoch
+-- `start` (default now) until `hours` of simulated time have passed, then
+-- returns to real time and calls onEnd. os.time/os.date, _PY.milli_time and
+-- the emulator's userTime (QA os.time and log timestamps) follow the clock.
+local realTime, realDate = os.time, os.date
+local function virtualTime(t)
+  if t == nil then return math.floor(_PY.milli_time()) end
+  return realTime(t)
+end
+local function virtualDate(f, t) return realDate(f, t or virtualTime()) end
+
+function _PY.simulate(hours, start, onEnd)
+  local cb = _PY.registerCallback(function()
+    os.time, os.date = realTime, realDate
+    if onEnd then onEnd() end
+  end, false, true)
+  os.time, os.date = virtualTime, virtualDate
+  _PY.start_simulation(hours * 3600, start, cb)
+end
+
+local function callbackError(err)
+  print("Error in timer callback: " .. tostring(err))
+  print(debug.traceback())
+end
+
+-- Runs a callback under xpcall; replaced by watchdog.lua when enabled.
+local function runCallback(owner, callback, handler, ...)
+  return xpcall(callback, handler, ...)
+end
+function _PY.setCallbackRunner(runner) runCallback = runner end
+
+-- Microtasks: _PY.nextTick(fn) queues fn to run right after the Lua entry
+-- that is running now (timer, callback, API request) returns, in FIFO order
+-- and under the queuing code's owner, each with its own xpcall. Unlike
+-- setTimeout(fn, 0) nothing goes through the Python timer manager. Tasks
+-- queued outside any entry (e.g. by the main script), or by microtasks
+-- themselves, are drained on the next loop turn (_PY.schedule_microtasks),
+-- so a task that keeps requeueing itself cannot starve the loop.
+local microtasks, mtHead, mtTail = {}, 1, 0
+local entryDepth = 0
+local drainRequested = false
+
+local function requestDrain()
+  if not drainRequested then
+    drainRequested = true
+    _PY.schedule_microtasks()
+  end
+end
+
+local function runMicrotasks()
+  drainRequested = false
+  local last = mtTail
+  entryDepth = entryDepth + 1
+  while mtHead <= last do
+    local task = microtasks[mtHead]
+    microtasks[mtHead] = nil
+    mtHead = mtHead + 1
+    updateActivity(-1, 0)
+    local prevOwner = currentOwner
+    currentOwner = task[2]
+    runCallback(task[2], task[1], callbackError)
+    currentOwner = prevOwner
+  end
+  entryDepth = entryDepth - 1
+  if mtHead <= mtTail then requestDrain() end
+end
+_PY.runMicrotasks = runMicrotasks
+
+function _PY.nextTick(fn)
+  mtTail = mtTail + 1
+  microtasks[mtTail] = { fn, currentOwner }
+  updateActivity(1, 0)
+  if entryDepth == 0 then requestDrain() end
+end
+
+local function leaveEntry()
+  entryDepth = entryDepth - 1
+  if entryDepth == 0 and mtHead <= mtTail then runMicrotasks() end
+end
+
+-- Wrap a Lua entry called from Python so microtasks run when it returns
+local function withMicrotasks(f)
+  return function(...)
+    entryDepth = entryDepth + 1
+    local ok, err = pcall(f, ...)
+    leaveEntry()
+    if not ok then error(err, 0) end
   end
 end
 
-function _PY.timerExpired(id,...)
-  if callbacks[id] then 
-    local is_persistent = callbacks[id].persistent
+local function timerExpired(id,...)
+  local cb = callbacks[id]
+  if cb then 
+    entryDepth = entryDepth + 1
+    local is_persistent = cb.persistent
+    local prevOwner = currentOwner
+    currentOwner = cb.owner
     
     -- Execute the callback with error handling
-    xpcall(callbacks[id].callback,function(err)
-      print("Error in timer callback: " .. tostring(err))
-      print(debug.traceback())
-    end,...)
+    runCallback(cb.owner, cb.callback, cb.onError or callbackError, ...)
+    currentOwner = prevOwner
     
     -- Clean up non-persistent callbacks AFTER execution
-    if not is_persistent then
-      callbacks[id] = nil
+    if not is_persistent and removeCallback(id) then
+      if cb.owner ~= nil and cb.type == "callback" then
+        _PY.clear_callback_owner(id)
+      end
     end
+    leaveEntry()
   end
 end
-
--- Get the count of pending callbacks (for CLI keep-alive logic)
-function _PY.getPendingCallbackCount()
-  local count = 0
-  for _,v in pairs(callbacks) do
-    count = count + (v.system and 0 or 1)
+_PY.timerExpired = timerExpired
+
+-- Deliver a batch of callback results in one Python->Lua crossing.
+-- batch is a flat array of n (id, err, res) triples; err/res may be nil,
+-- so we walk by n rather than #batch. Each callback keeps its own xpcall.
+function _PY.timerExpiredBatch(batch, n)
+  for i=1,3*n,3 do
+    timerExpired(batch[i], batch[i+1], batch[i+2])
   end
-  return count
 end
 
+-- Get the count of pending callbacks (for CLI keep-alive logic)
+function _PY.getPendingCallbackCount() return pendingCount end
+
 -- Get the count of running callbacks (for CLI keep-alive logic)
-function _PY.getRunningIntervalsCount()
-  local count = 0
-  for _ in pairs(intervals) do
-    count = count + 1
-  end
-  return count
-end
+function _PY.getRunningIntervalsCount() return intervalCount end
 
 function _PY.get_callbacks_count() return _PY.getPendingCallbackCount(),_PY.getRunningIntervalsCount() end
 
+-- Snapshot of live callbacks and timers: one entry per callback with its
+-- type, owning QA ("system" when none), age in seconds, registration site
+-- and, for timers, when the Python timer is next due. `owners` counts the
+-- entries per QA and type; `python_timers` counts timers not created from Lua.
+-- Sites and tracebacks are only known for entries registered while capture
+-- was on (config.callback_sites, or the QA was reported as leaking).
+-- Tracebacks are included for persistent entries when withTraceback is true.
+function _PY.getRegistry(withTraceback)
+  local now = clock()
+  local timers = _PY.get_timer_registry()
+  local entries, owners = {}, {}
+  local luaTimers = 0
+  for id, entry in pairs(callbacks) do
+    local owner = ownerKey(entry.owner)
+    local item = {
+      id = id,
+      type = entry.type,
+      owner = owner,
+      persistent = entry.persistent or false,
+      system = entry.system or false,
+      age_s = now - entry.created,
+      site = entry.site,
+      traceback = withTraceback and entry.traceback or nil,
+    }
+    local timer = entry.ref and timers[entry.ref]
+    if timer then
+      luaTimers = luaTimers + 1
+      item.due_in_ms = timer.due_in_ms
+      item.delay_ms = timer.delay_ms
+    end
+    entries[#entries + 1] = item
+    local key = tostring(owner)
+    local counts = owners[key] or { total = 0, persistent = 0 }
+    owners[key] = counts
+    counts.total = counts.total + 1
+    counts[entry.type] = (counts[entry.type] or 0) + 1
+    if entry.persistent and not entry.system then counts.persistent = counts.persistent + 1 end
+  end
+  table.sort(entries, function(a, b) return a.id < b.id end)
+  local pythonTimers = 0
+  for _ in pairs(timers) do pythonTimers = pythonTimers + 1 end
+  return {
+    callbacks = entries,
+    owners = owners,
+    microtasks = mtTail - mtHead + 1,
+    python_timers = pythonTimers - luaTimers,
+  }
+end
+
 local function Error(str)
   return setmetatable({}, {
     __tostring = function() return "Error: " .. tostring(str) end,
@@ -519,6 +789,49 @@ function _PY.threadRequest(id, script, isJson)
   end
 end
 
+-- Report the outcome of a pcall made for a dispatched request
+local function requestResult(id, start_time, errPrefix, success, result)
+  local execution_time = _PY.get_time() - start_time
+  if success then
+    if result == nil then result = "nil" end -- Convert nil to a string representation
+    _PY.threadRequestResult(id, { success = true, error = nil, result = result, execution_time = execution_time })
+  else
+    _PY.threadRequestResult(id, {
+      success = false,
+      error = errPrefix .. tostring(result),
+      result = nil,
+      execution_time = execution_time
+    })
+  end
+end
+
+-- Run a script compiled (and cached) by the Python dispatcher.
+-- func is nil if the script failed to load; err then holds the message.
+function _PY.threadRequestChunk(id, func, err)
+  local start_time = _PY.get_time()
+  if not func then return requestResult(id, start_time, "Load error: ", false, err) end
+  requestResult(id, start_time, "Execution error: ", pcall(func))
+end
+
+-- Pre-compiled functions Python can call by name with native arguments
+-- (CrossThreadDispatch.submit_call), so hot request paths build no source.
+local entryPoints = {}
+function _PY.registerEntryPoint(name, func) entryPoints[name] = func end
+
+function _PY.callEntryPoint(id, name, ...)
+  local start_time = _PY.get_time()
+  local func = entryPoints[name]
+  if not func then
+    return requestResult(id, start_time, "", false, "Entry point not found: " .. tostring(name))
+  end
+  requestResult(id, start_time, "Function execution error: ", pcall(func, ...))
+end
+
+-- Microtasks queued while serving a request run after its result is posted
+_PY.threadRequest = withMicrotasks(_PY.threadRequest)
+_PY.threadRequestChunk = withMicrotasks(_PY.threadRequestChunk)
+_PY.callEntryPoint = withMicrotasks(_PY.callEntryPoint)
+
 function coroutine.wrapdebug(func,error_handler)
   local co = coroutine.create(func)
   return function(...)
@@ -567,22 +880,52 @@ function _PY.fibaroApiHook(method, path, data)
   return nil, 503
 end
 
+-- /api/* requests from the FastAPI process (looked up per call, fibaro.lua replaces the hook).
+-- data is the raw request body (or nil). Table results (incl. json.raw) are
+-- encoded here and sent back as JSON text that the API server returns as-is.
+_PY.registerEntryPoint("fibaroApiHook", function(method, path, data)
+  local hook_data, hook_status = _PY.fibaroApiHook(method, path, data)
+  if type(hook_data) == 'table' then
+    local ok, body = pcall(json.encode, hook_data)
+    if ok then return { data = body, status = hook_status or 200, encoded = true } end
+  end
+  return { data = hook_data, status = hook_status or 200 }
+end)
+
+local function quickAppSource()
+  if fibaro and fibaro.plua and fibaro.plua.getQuickApp then return fibaro.plua end
+  if Emu and Emu.getQuickApp then return Emu end
+end
+
+_PY.registerEntryPoint("getQuickApp", function(qa_id)
+  local src = quickAppSource()
+  local qa_info = src and src:getQuickApp(qa_id)
+  return qa_info and json.encode(qa_info) or "null"
+end)
+
+_PY.registerEntryPoint("getQuickApps", function()
+  local src = quickAppSource()
+  return src and json.encode(src:getQuickApps()) or "[]"
+end)
+
+_PY.registerEntryPoint("getRegistry", function(withTraceback)
+  return json.encode(_PY.getRegistry(withTraceback))
+end)
+
 local runFor = tonumber(_PY.config.runFor)
 if runFor then
   if runFor > 0 then
     _PY.setTimeout(function() 
       print("Exit.")
-      setTimeout(function()
-        os.exit(0) -- Give some time for any final prints to complete
-      end,1000)
-    end, runFor * 1000, {system = true}) -- Kill after runFor seconds, if still running
+      os.exit(0) -- print is synchronous, nothing left to wait for
+    end, runFor * 1000, {system = true, realtime = true}) -- Kill after runFor seconds, if still running
   elseif runFor == 0 then
     _PY.setTimeout(function() end, math.huge) -- Keep running indefinitely...
   elseif runFor < 0 then
     _PY.setTimeout(function() 
       print("Exit")
-      setTimeout(function() os.exit(0) end, 100) -- Give some time for any final prints to complete
-    end, (-runFor) * 1000) -- Kill exactly runFor seconds
+      os.exit(0)
+    end, (-runFor) * 1000, {realtime = true}) -- Kill exactly runFor seconds
   end
 end
 
@@ -597,6 +940,18 @@ end
 ----------------- Import standard libraries ----------------
 net = require("net")
 require("timers")
+if config.simulate_hours then
+  _PY.simulate(tonumber(config.simulate_hours), tonumber(config.simulate_start), function()
+    print("Simulation ended.")
+    os.exit(0)
+  end)
+end
+if config.watchdog_ms or config.watchdog_instructions then
+  require("watchdog").enable({
+    ms = config.watchdog_ms, instructions = config.watchdog_instructions, abort = config.watchdog_abort,
+    step = config.watchdog_step, sample = config.watchdog_sample,
+  })
+end
 os.getenv = _PY.dotgetenv
 
 if _PY.config.diagnostic then require("diagnostic") os.exit() end
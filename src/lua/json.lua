@@ -9,14 +9,28 @@ local escTab = {
   ["\n"]="\\n",["\r"]="\\r",["\t"]="\\t",  -- ✅ Added
   ["\b"]="\\b",["\f"]="\\f"                -- ✅ Added
 }
+local jsonEscTab = {} -- escTab plus \u00XX for the remaining control chars
+for i=0,31 do jsonEscTab[string.char(i)] = fmt("\\u%04x",i) end
+jsonEscTab["\127"] = "\\u007f"
+for c,e in pairs(escTab) do jsonEscTab[c] = e end
 local sortKeys = {"type","device","deviceID","id","name","properties","value","oldValue","val","key","arg","event","events","msg","res"}
 local sortOrder={}
 for i,s in ipairs(sortKeys) do sortOrder[s]="\n"..string.char(i+64).." "..s end
+local sortName={} -- sortOrder string -> key
+for s,o in pairs(sortOrder) do sortName[o]=s end
 local function keyCompare(a,b)
   local av,bv = sortOrder[a] or a, sortOrder[b] or b
   return av < bv
 end
 
+-- Sentinel for an explicit JSON null (e.g. in arrays or when a key must be present)
+json.null = setmetatable({},{__tostring=function() return "null" end})
+
+-- Already encoded JSON text, spliced into json.encode output as-is
+local rawKey = {}
+function json.raw(s) return {[rawKey]=s} end
+function json.isRaw(e) return type(e)=='table' and e[rawKey]~=nil end
+
 --gsub("[\\\"]",{["\\"]="\\\\",['"']='\\"'})
 -- our own json encode, as we don't have 'pure' json structs, and sorts keys in order (i.e. "stable" output)
 
@@ -26,51 +40,82 @@ local function quote(s)
   return "["..tostring(s).."]"
 end
 
-local function prettyJsonFlat(e0) 
-  local res,seen = {},{}
+local find,gsub,sort,concat = string.find,string.gsub,table.sort,table.concat
+local type,next,pairs,tostring,getmetatable = type,next,pairs,tostring,getmetatable
+
+-- Keys and enum-like values repeat across objects, so escaped short strings
+-- are memoized; the cache is simply dropped when it grows too big.
+local escCache,escCount = {},0
+local function jsonString(s)
+  local r = escCache[s]
+  if r then return r end
+  r = find(s,'[%c"\\]') and gsub(s,'[%c"\\]',jsonEscTab) or s
+  if #s <= 64 then
+    if escCount >= 4096 then escCache,escCount = {},0 end
+    escCache[s] = r escCount = escCount+1
+  end
+  return r
+end
+
+-- Single pass straight from the Lua table into a string buffer. Keys are
+-- sorted by their sortOrder/tostring() strings with the built-in comparator
+-- (same order as keyCompare), and single-key objects skip the sort.
+local function prettyJsonFlat(e0)
+  local res,n,seen,null = {},0,{},json.null
   local function pretty(e)
     local t = type(e)
-    if t == 'string' then 
-      res[#res+1] = '"' 
-      res[#res+1] = e:gsub("[\\\"\n\r\t\b\f]",escTab)  -- ✅ Matches all control chars
-      res[#res+1] = '"'
-    elseif t == 'number' then res[#res+1] = e
-    elseif t == 'boolean' or t == 'function' or t=='thread' or t=='userdata' then
-      if e == json.null then res[#res+1]='null'
-      else res[#res+1] = tostring(e) end
+    if t == 'string' then
+      res[n+1] = '"' res[n+2] = jsonString(e) res[n+3] = '"' n = n+3
+    elseif t == 'number' then n = n+1 res[n] = e
     elseif t == 'table' then
-      if seen[e] then res[#res+1]="..rec.."
+      if e == null then n = n+1 res[n] = 'null'
+      elseif seen[e] then n = n+1 res[n] = "..rec.."
       elseif next(e)==nil then
         local mt = getmetatable(e)
-        if mt and mt.__isArray then
-          res[#res+1]='[]'
-        else
-          res[#res+1]='{}'
-        end
-      elseif e[1] or #e>0 then
+        n = n+1 res[n] = mt and mt.__isArray and '[]' or '{}'
+      elseif e[1] ~= nil or #e>0 then
         seen[e]=true
-        res[#res+1] = "[" pretty(e[1])
-        for i=2,#e do res[#res+1] = "," pretty(e[i]) end
-        res[#res+1] = "]"
+        n = n+1 res[n] = "[" pretty(e[1])
+        for i=2,#e do n = n+1 res[n] = "," pretty(e[i]) end
+        n = n+1 res[n] = "]"
         seen[e]=nil
+      elseif e._var_ then n = n+1 res[n] = fmt('"%s"',e._str)
+      elseif e[rawKey] then n = n+1 res[n] = e[rawKey]
       else
         seen[e]=true
-        if e._var_  then res[#res+1] = fmt('"%s"',e._str) return end
-        local k,kmap = {},{} for key,_ in pairs(e) do local ks = tostring(key) k[#k+1] = ks; kmap[ks]=key end
-        table.sort(k,keyCompare)
-        if #k == 0 then res[#res+1] = "[]" return end
-        res[#res+1] = '{'; res[#res+1] = '"' t = k[1] res[#res+1] = t; res[#res+1] = '":' pretty(e[kmap[t]])
-        for i=2,#k do
-          res[#res+1] = ',"' t = k[i] res[#res+1] = t; res[#res+1] = '":' pretty(e[kmap[t]])
+        local k1,v1 = next(e)
+        if next(e,k1) == nil then
+          res[n+1] = '{"' res[n+2] = jsonString(tostring(k1)) res[n+3] = '":' n = n+3
+          pretty(v1)
+        else
+          local k,kmap,m = {},nil,0 -- kmap only needed for non-string keys
+          for key in pairs(e) do
+            local sk
+            if type(key) == 'string' then sk = sortOrder[key] or key
+            else sk = tostring(key) kmap = kmap or {} kmap[sk] = key end
+            m = m+1 k[m] = sk
+          end
+          sort(k)
+          local sep = '{"'
+          for i=1,m do
+            local sk = k[i]
+            local key = sortName[sk] or kmap and kmap[sk] or sk
+            res[n+1] = sep res[n+2] = jsonString(tostring(key)) res[n+3] = '":' n = n+3
+            pretty(e[key])
+            sep = ',"'
+          end
         end
-        res[#res+1] = '}'
+        n = n+1 res[n] = '}'
         seen[e]=nil
       end
-    elseif e == nil then res[#res+1]='null'
+    elseif e == nil then n = n+1 res[n] = 'null'
+    elseif t == 'boolean' then n = n+1 res[n] = tostring(e)
+    elseif t == 'function' or t=='thread' or t=='userdata' then
+      res[n+1] = '"' res[n+2] = jsonString(tostring(e)) res[n+3] = '"' n = n+3
     else error("bad json expr:"..tostring(e)) end
   end
   pretty(e0)
-  return table.concat(res)
+  return concat(res)
 end
 
 local function prettyLuaFlat(e0) 
@@ -83,7 +128,8 @@ local function prettyLuaFlat(e0)
       if e == json.null then res[#res+1]='null'
       else res[#res+1] = tostring(e) end
     elseif t == 'table' then
-      if next(e)==nil then 
+      if e == json.null then res[#res+1]='nil'
+      elseif next(e)==nil then 
         res[#res+1]='{}'
       elseif seen[e] then res[#res+1]="..rec.."
       elseif e[1] or #e>0 then
@@ -95,6 +141,7 @@ local function prettyLuaFlat(e0)
       else
         seen[e]=true
         if e._var_  then res[#res+1] = fmt('"%s"',e._str) return end
+        if e[rawKey] then res[#res+1] = e[rawKey] return end
         local k,kmap = {},{} for key,_ in pairs(e) do 
           local ks = tostring(key)
           k[#k+1] = ks kmap[ks] = key
@@ -0,0 +1,141 @@
+-- Opt-in watchdog for runaway callbacks.
+-- Lua runs synchronously on the asyncio loop, so a callback stuck in a tight
+-- loop (or a blocking _PY.sleep) freezes timers, network I/O and the API for
+-- the whole process. When enabled (--watchdog-ms / config.watchdog_ms or
+-- config.watchdog_instructions) a count hook enforces a per-callback
+-- elapsed-time/instruction budget: on overrun it logs the owning QA and the
+-- stack, and with --watchdog-abort raises an error that aborts the callback.
+-- Elapsed time is read from a monotonic wall clock (_PY.monotonic) every
+-- `sample` hook calls, i.e. every step * sample instructions, so a callback
+-- is caught at most that many instructions after its budget ran out. Every
+-- callback's run time is also recorded in a per-QA histogram, see
+-- _PY.getCallbackStats().
+--
+-- Coverage: only callbacks started through the callback runner (timers,
+-- registered callbacks, posted callbacks) are budgeted and recorded. Entry
+-- points (API requests, _PY.callEntryPoint) and calls posted with
+-- post_lua_call run outside it and are neither limited nor counted. Hooks are
+-- per coroutine, so enable() replaces the global coroutine.create and
+-- coroutine.wrap with versions that install the hook on each new coroutine;
+-- coroutines created before that run unwatched.
+
+local watchdog = {}
+
+-- Histogram bucket upper bounds in ms; the last bucket counts everything slower.
+local BOUNDS = {1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000}
+
+local limitMs, limitInstr, abort
+local step = 1000   -- instructions between hook calls
+local sample = 10   -- hook calls between clock reads
+local stats = {}    -- owner -> {count, total_ms, max_ms, overruns, buckets}
+local running = false
+local clock = _PY.monotonic
+local owner, start, instr, calls, reported, overrun
+
+local function ownerKey(o) if o == nil then return "system" end return o end
+
+local function record(key, ms, overrun)
+  local s = stats[key]
+  if not s then
+    s = { count = 0, total_ms = 0, max_ms = 0, overruns = 0, buckets = {} }
+    for i = 1, #BOUNDS + 1 do s.buckets[i] = 0 end
+    stats[key] = s
+  end
+  s.count = s.count + 1
+  s.total_ms = s.total_ms + ms
+  if ms > s.max_ms then s.max_ms = ms end
+  if overrun then s.overruns = s.overruns + 1 end
+  local i = 1
+  while i <= #BOUNDS and ms > BOUNDS[i] do i = i + 1 end
+  s.buckets[i] = s.buckets[i] + 1
+end
+
+local function report(reason, tb)
+  reported = true
+  print(string.format("Watchdog: callback of QA %s %s", tostring(ownerKey(owner)), reason))
+  if tb then print(tb) end
+end
+
+local function hook()
+  if not running then return end
+  if not overrun then
+    instr = instr + step
+    calls = calls + 1
+    if limitInstr and instr > limitInstr then
+      overrun = string.format("exceeded %s instructions", limitInstr)
+    elseif limitMs and calls >= sample then
+      calls = 0
+      if (clock() - start) * 1000 > limitMs then
+        overrun = string.format("exceeded %s ms", limitMs)
+      end
+    end
+    if not overrun then return end
+    report(overrun, debug.traceback("", 2))
+  end
+  -- Keep raising on every check so a pcall inside the callback can't swallow it.
+  if abort then error("watchdog: callback aborted, " .. overrun, 2) end
+end
+
+-- Callback runner installed into timerExpired (see _PY.setCallbackRunner).
+-- `running` is cleared inside the protected call, both on return and in the
+-- error handler, so the hook can never raise outside the callback's xpcall.
+local function run(o, f, handler, ...)
+  if running then return xpcall(f, handler, ...) end
+  start, owner, instr, calls, reported, overrun = clock(), o, 0, 0, false, nil
+  running = true
+  xpcall(function(...)
+    local res = table.pack(f(...))
+    running = false
+    return table.unpack(res, 1, res.n)
+  end, function(err)
+    running = false
+    return handler(err)
+  end, ...)
+  running = false
+  local ms = (clock() - start) * 1000
+  if limitMs and ms > limitMs and not reported then
+    -- No instructions ran for most of this time: blocked inside a Python call.
+    report(string.format("ran for %d ms (blocked outside Lua)", math.floor(ms)))
+  end
+  record(ownerKey(o), ms, reported)
+end
+
+-- Install the hook on the main thread and on every coroutine created from
+-- now on (hooks are per-coroutine in Lua, and QA code runs inside them).
+function watchdog.enable(opts)
+  if _PY.mobdebug._VERSION then
+    print("Watchdog: disabled while the debugger is attached")
+    return false
+  end
+  limitMs = tonumber(opts.ms)
+  limitInstr = tonumber(opts.instructions)
+  abort = opts.abort and true or false
+  step = tonumber(opts.step) or step
+  sample = tonumber(opts.sample) or sample
+
+  debug.sethook(hook, "", step)
+  local create = coroutine.create
+  function coroutine.create(f)
+    local co = create(f)
+    debug.sethook(co, hook, "", step)
+    return co
+  end
+  function coroutine.wrap(f)
+    local co = coroutine.create(f)
+    return function(...)
+      local res = table.pack(coroutine.resume(co, ...))
+      if not res[1] then error(res[2], 0) end
+      return table.unpack(res, 2, res.n)
+    end
+  end
+  _PY.setCallbackRunner(run)
+  return true
+end
+
+function _PY.getCallbackStats()
+  return { bounds = BOUNDS, qas = stats }
+end
+
+function _PY.resetCallbackStats() stats = {} end
+
+return watchdog
@@ -8,6 +8,7 @@ import os
 import socket
 import sys
 import time
+from datetime import datetime
 from pathlib import Path
 from typing import Any
 
@@ -298,52 +299,36 @@ def run_engine(
                         api_manager.set_lua_executor(lua_executor)
                         
                         # Always set up Fibaro callback - hook will determine availability
+                        def fibaro_hook_result(result: dict):
+                            """Map a fibaroApiHook entry point result to (data, status[, encoded])"""
+                            logger.debug(f"Thread execution result: {result}")
+                            
+                            if result.get("success", False):
+                                lua_result = result.get("result", {})
+                                if isinstance(lua_result, dict):
+                                    hook_data = lua_result.get("data")
+                                    hook_status = lua_result.get("status", 200)
+                                    logger.debug(f"Hook returned: {hook_data}, {hook_status}")
+                                    if lua_result.get("encoded"):
+                                        return hook_data, hook_status, True
+                                    return hook_data, hook_status
+                                else:
+                                    logger.debug(f"Fallback return: {lua_result}, 200")
+                                    return lua_result, 200
+                            else:
+                                logger.error(f"Thread execution failed: {result.get('error')}")
+                                return f"Thread execution error: {result.get('error')}", 500
+                        
                         def fibaro_callback(method: str, path: str, data: str | None = None):
-                            """Thread-safe Fibaro API callback - receives JSON string, passes to Lua"""
+                            """Thread-safe Fibaro API callback - receives the raw body, passes it to Lua"""
                             try:
                                 logger.debug(f"Fibaro callback: {method} {path}")
                                 
-                                # Parse JSON data if provided
-                                if data:
-                                    try:
-                                        import json
-                                        json.loads(data)
-                                    except json.JSONDecodeError:
-                                        logger.warning(f"Invalid JSON data: {data}")
-                                
-                                # Use the existing thread-safe IPC mechanism correctly
                                 try:
-                                    # The key insight: pass data as JSON string to Lua and let Lua parse it
-                                    # This avoids all the syntax issues with embedding data in Lua code
-                                    
-                                    data_str = data if data else "nil"
-                                    
-                                    # Simple Lua script that calls the hook with string data
-                                    lua_script = f'''
-                                        local method = "{method}"
-                                        local path = "{path}"
-                                        local data_str = {repr(data_str)}
-                                        
-                                        local hook_data, hook_status = _PY.fibaroApiHook(method, path, data_str)
-                                        return {{data = hook_data, status = hook_status or 200}}
-                                    '''
-                                    
-                                    result = engine.execute_script_from_thread(lua_script, 30.0, is_json=False)
-                                    logger.debug(f"Thread execution result: {result}")
-                                    
-                                    if result.get("success", False):
-                                        lua_result = result.get("result", {})
-                                        if isinstance(lua_result, dict):
-                                            hook_data = lua_result.get("data")
-                                            hook_status = lua_result.get("status", 200)
-                                            logger.debug(f"Hook returned: {hook_data}, {hook_status}")
-                                            return hook_data, hook_status
-                                        else:
-                                            logger.debug(f"Fallback return: {lua_result}, 200")
-                                            return lua_result, 200
-                                    else:
-                                        logger.error(f"Thread execution failed: {result.get('error')}")
-                                        return f"Thread execution error: {result.get('error')}", 500
+                                    # Pre-compiled entry point, the body is decoded by the Lua hook
+                                    return fibaro_hook_result(engine.call_entry_point_from_thread(
+                                        "fibaroApiHook", method, path, data, timeout_seconds=30.0
+                                    ))
                                     
                                 except Exception as e:
                                     logger.error(f"Thread execution exception: {str(e)}")
@@ -352,8 +337,20 @@ def run_engine(
                             except Exception as e:
                                 logger.error(f"Callback exception: {str(e)}")
                                 return f"Callback error: {str(e)}", 500
+                        
+                        async def fibaro_callback_async(method: str, path: str, data: str | None = None):
+                            """Fibaro API callback for --api-inprocess, awaited on the engine loop"""
+                            try:
+                                logger.debug(f"Fibaro callback: {method} {path}")
+                                return fibaro_hook_result(await engine.call_entry_point_async(
+                                    "fibaroApiHook", method, path, data, timeout_seconds=30.0
+                                ))
+                            except Exception as e:
+                                logger.error(f"Callback exception: {str(e)}")
+                                return f"Callback error: {str(e)}", 500
                                 
                         api_manager.set_fibaro_callback(fibaro_callback)
+                        api_manager.set_fibaro_callback_async(fibaro_callback_async)
                         
                         # QuickApp data callback
                         def quickapp_callback(action: str, qa_id: int | None = None):
@@ -369,28 +366,7 @@ def run_engine(
                             import json
                             try:
                                 if action == "get_quickapp" and qa_id is not None:
-                                    lua_script = f'''
-                                        local qa_id = {qa_id}
-                                        
-                                        -- Try fibaro.plua first (this is the working path)
-                                        if fibaro and fibaro.plua and fibaro.plua.getQuickApp then
-                                            local qa_info = fibaro.plua:getQuickApp(qa_id)
-                                            if qa_info then
-                                                return json.encode(qa_info)
-                                            end
-                                        end
-                                        
-                                        -- Fallback to Emu if available
-                                        if Emu and Emu.getQuickApp then
-                                            local qa_info = Emu:getQuickApp(qa_id)
-                                            if qa_info then
-                                                return json.encode(qa_info)
-                                            end
-                                        end
-                                        
-                                        return "null"
-                                    '''
-                                    result = engine.execute_script_from_thread(lua_script, 30.0, is_json=False)
+                                    result = engine.call_entry_point_from_thread("getQuickApp", qa_id, timeout_seconds=30.0)
                                     if not result.get("success"):
                                         err = result.get("error", "")
                                         if "timeout" in err.lower():
@@ -404,22 +380,7 @@ def run_engine(
                                     return {"success": True, "data": json.loads(result.get("result", "null"))}
 
                                 elif action == "get_all_quickapps":
-                                    lua_script = '''
-                                        -- Try fibaro.plua first (this is the working path)
-                                        if fibaro and fibaro.plua and fibaro.plua.getQuickApps then
-                                            local all_qas = fibaro.plua:getQuickApps()
-                                            return json.encode(all_qas)
-                                        end
-                                        
-                                        -- Fallback to Emu if available
-                                        if Emu and Emu.getQuickApps then
-                                            local all_qas = Emu:getQuickApps()
-                                            return json.encode(all_qas)
-                                        end
-                                        
-                                        return "[]"
-                                    '''
-                                    result = engine.execute_script_from_thread(lua_script, 30.0, is_json=False)
+                                    result = engine.call_entry_point_from_thread("getQuickApps", timeout_seconds=30.0)
                                     if not result.get("success"):
                                         err = result.get("error", "")
                                         if "timeout" in err.lower():
@@ -433,6 +394,18 @@ def run_engine(
                                 return {"success": False, "error": str(e), "reason": "exception"}
                                 
                         api_manager.set_quickapp_callback(quickapp_callback)
+
+                        def registry_callback(with_traceback: bool = False):
+                            """Registry snapshot for GET /plua/registry"""
+                            import json
+                            result = engine.call_entry_point_from_thread(
+                                "getRegistry", with_traceback, timeout_seconds=10.0
+                            )
+                            if not result.get("success"):
+                                return {"success": False, "error": result.get("error", "")}
+                            return {"success": True, "data": json.loads(result["result"])}
+
+                        api_manager.set_registry_callback(registry_callback)
                         
                         # Store reference to api_manager for WebSocket broadcasting
                         engine._api_manager = api_manager  # pyright: ignore[reportAttributeAccessIssue]
@@ -481,8 +454,7 @@ def run_engine(
                 # Keep the engine running if there are active operations (timers, callbacks, etc.)
                 if engine.has_active_operations():
                     logger.info("Keeping engine alive due to active operations")
-                    while engine.has_active_operations():
-                        await asyncio.sleep(1)
+                    await engine.wait_until_idle()
                     logger.info("All operations completed, shutting down")
                 elif not script_paths and not fragments and not interactive and not telnet_mode:
                     # No scripts, no fragments, no interactive, no telnet - keep running indefinitely
@@ -495,16 +467,13 @@ def run_engine(
                     while True:
                         await asyncio.sleep(1)
                 else:
-                    # Scripts completed - check for active operations with timeout
+                    # Scripts completed - wait for the last timer/callback, if any
                     logger.debug("Scripts completed, checking for active operations")
-                    await asyncio.sleep(0.5)  # Brief grace period for cleanup
-                    
                     if not engine.has_active_operations():
                         logger.info("No active operations detected - shutting down")
                     else:
                         logger.info("Active operations detected, will keep running")
-                        while engine.has_active_operations():
-                            await asyncio.sleep(1)
+                        await engine.wait_until_idle()
                         logger.info("All operations completed - shutting down")
 
             except KeyboardInterrupt:
@@ -515,8 +484,14 @@ def run_engine(
             finally:
                 # Clean up FastAPI server process
                 try:
-                    from plua.fastapi_process import stop_fastapi_process
+                    from plua.fastapi_process import (
+                        get_process_manager,
+                        stop_fastapi_process,
+                    )
+                    manager = get_process_manager()
                     stop_fastapi_process()
+                    if manager:
+                        await manager.wait_closed()
                 except Exception:
                     pass
 
@@ -580,26 +555,8 @@ def run_async_repl(engine):
         logger.error(f"REPL error: {e}")
 
 
-def main():
-    """Main CLI entry point"""
-    startTime = time.time()
-    # On Windows, the default ProactorEventLoop does not support add_reader/add_writer,
-    # which are required by aiomqtt (paho-mqtt). Switch to SelectorEventLoop.
-    if sys.platform == 'win32':
-        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-    # Suppress multiprocessing resource tracker warnings
-    import os
-    os.environ["PYTHONWARNINGS"] = "ignore::UserWarning:multiprocessing.resource_tracker"
-    
-    # Ensure ~/.plua directory exists early
-    ensure_plua_directory()
-    
-    # Set up basic logging first (will be updated with user preference later)
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-
+def build_parser() -> argparse.ArgumentParser:
+    """Command line parser for `plua` (also used to build shard command lines)."""
     parser = argparse.ArgumentParser(
         description="PLua - Python Lua Engine with Web UI"
     )
@@ -702,7 +659,96 @@ def main():
         type=int,
         help="Run script for specified seconds then terminate",
     )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=0,
+        help="Run the QuickApp files in N worker processes behind one API server (one engine per shard)",
+    )
+    # Set by the shard coordinator on its worker command lines
+    parser.add_argument("--shard-index", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--shard-coordinator", help=argparse.SUPPRESS)
+    parser.add_argument(
+        "--watchdog-ms",
+        type=int,
+        help="Warn when a Lua callback runs longer than this many ms (enables per-QA run-time histogram)",
+    )
+    parser.add_argument(
+        "--watchdog-abort",
+        action="store_true",
+        help="Abort Lua callbacks that exceed the --watchdog-ms budget",
+    )
+    parser.add_argument(
+        "--simulate",
+        type=float,
+        metavar="HOURS",
+        help="Run timers on a virtual clock for HOURS simulated hours as fast as possible, then exit",
+    )
+    parser.add_argument(
+        "--simulate-start",
+        metavar="DATETIME",
+        help="Start time of the virtual clock, e.g. '2026-11-30 12:00:00' (default: now)",
+    )
+    parser.add_argument(
+        "--timer-slack-ms",
+        type=float,
+        default=0,
+        help="Let timers run up to this many ms late so timers due close together share one wakeup",
+    )
+    parser.add_argument(
+        "--callback-leak-warn",
+        type=int,
+        default=100,
+        metavar="N",
+        help="Warn when a QA holds N (then 2N, 4N, ...) persistent callbacks it never cleared (0: off)",
+    )
+    parser.add_argument(
+        "--callback-sites",
+        action="store_true",
+        help="Record where every callback and timer was registered, for /plua/registry (costs a stack walk each)",
+    )
+    parser.add_argument(
+        "--api-max-inflight",
+        type=int,
+        default=32,
+        metavar="N",
+        help="Max API/UI requests handled concurrently by the Lua engine (default: 32)",
+    )
+    parser.add_argument(
+        "--api-transport",
+        choices=["queue", "socket"],
+        default="queue",
+        help="IPC to the API server process: multiprocessing queues or framed Unix socket (default: queue)",
+    )
+    parser.add_argument(
+        "--api-inprocess",
+        action="store_true",
+        help="Serve the API from the engine's own event loop instead of a separate process (no IPC)",
+    )
+    return parser
+
 
+def main():
+    """Main CLI entry point"""
+    startTime = time.time()
+    # On Windows, the default ProactorEventLoop does not support add_reader/add_writer,
+    # which are required by aiomqtt (paho-mqtt). Switch to SelectorEventLoop.
+    if sys.platform == 'win32':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    # Suppress multiprocessing resource tracker warnings
+    import os
+    os.environ["PYTHONWARNINGS"] = "ignore::UserWarning:multiprocessing.resource_tracker"
+    
+    # Ensure ~/.plua directory exists early
+    ensure_plua_directory()
+    
+    # Set up basic logging first (will be updated with user preference later)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    parser = build_parser()
     args = parser.parse_args()
 
     # Handle version command
@@ -717,6 +763,10 @@ def main():
         init_quickapp_project()
         return
 
+    if args.shards > 1 and len(args.scripts) > 1:
+        from plua.shards import run_sharded
+        sys.exit(run_sharded(parser, args))
+
     # Prepare config
     config = get_config()
     config["loglevel"] = args.loglevel
@@ -756,6 +806,23 @@ def main():
     config["telnet"] = args.telnet
     config["telnet_port"] = args.telnet_port
     config["runFor"] = args.run_for
+    config["watchdog_ms"] = args.watchdog_ms
+    config["watchdog_abort"] = args.watchdog_abort
+    config["timer_slack_ms"] = args.timer_slack_ms
+    config["callback_leak_warn"] = args.callback_leak_warn
+    config["callback_sites"] = args.callback_sites
+    config["api_max_inflight"] = args.api_max_inflight
+    config["api_transport"] = args.api_transport
+    config["shard_index"] = args.shard_index
+    config["shard_coordinator"] = args.shard_coordinator
+    config["api_inprocess"] = args.api_inprocess
+    if args.simulate is not None:
+        config["simulate_hours"] = args.simulate
+        if args.simulate_start:
+            try:
+                config["simulate_start"] = datetime.fromisoformat(args.simulate_start).timestamp()
+            except ValueError:
+                parser.error(f"--simulate-start: invalid date/time {args.simulate_start!r}")
     config["scripts"] = args.scripts or []
     config["tool"] = args.tool
     config["startTime"] = startTime
@@ -764,6 +831,10 @@ def main():
     # Store the full CLI command line as a string
     config["argv"] = " ".join([repr(arg) if " " in arg else arg for arg in sys.argv])
 
+    if args.shard_coordinator:
+        from plua.shard_worker import start_shard_worker
+        start_shard_worker(args.shard_index or 0, args.shard_coordinator)
+
     # Configure Rich console based on detected environment
     try:
         from .console import configure_console_for_environment
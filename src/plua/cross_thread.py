@@ -7,63 +7,563 @@ runtime lives:
 
 1. **Callback results** — the result of a previously-registered Lua callback
    (timer, network reply, ...). Delivered via `post_callback_from_thread()`,
-   drained by calling `_PY.timerExpired(callback_id, error, result)`.
+   drained in batches by calling `_PY.timerExpiredBatch(batch, n)`, which
+   runs each `(callback_id, error, result)` triple in Lua.
 
 2. **Fire-and-forget Lua calls** — a Python thread wants the main loop to
    invoke a `_PY.<name>(*args)` function with no return value. Delivered via
    `post_lua_call()`.
 
-3. **Synchronous script execution** — a Python thread wants to run a Lua
-   snippet (or JSON-encoded function call) and block until the result is
-   available. Delivered via `execute_script_and_wait()` and resolved by Lua
-   calling back into `handle_thread_request_result()`.
+3. **Script execution** — a Python thread or coroutine wants to run a Lua
+   snippet (or JSON-encoded function call) and get its result. Each request
+   is backed by a `concurrent.futures.Future` created by `submit_script()`;
+   `execute_script_and_wait()` blocks a thread on it and
+   `execute_script_async()` awaits it. The future is resolved by Lua calling
+   back into `handle_thread_request_result()`. Hot paths (the `/api/*` hook,
+   QuickApp lookups) skip source templating entirely: `submit_call()` invokes
+   a Lua function registered with `_PY.registerEntryPoint(name, fn)` with
+   native arguments. Ad-hoc scripts are compiled once and kept in a bounded
+   LRU keyed by their source, so repeated scripts are not re-parsed.
 
 This module wraps the three queues + result map behind a single
-`CrossThreadDispatch` object and exposes a `process_once(...)` step that the
-engine's loop coroutine drains on each tick. Keeping the queue plumbing here
-lets `engine.py` focus on lifecycle and the Lua/Lupa boundary.
+`CrossThreadDispatch` object. Each queue is a bounded `DispatchLane` with its
+own overflow policy (block, drop-oldest, drop-newest or coalesce-by-key), and
+lanes are drained in priority order: execution requests (API calls, UI clicks)
+first, then fire-and-forget Lua calls, then bulk network callbacks. The
+callback lane is a `FairLane`: one sub-lane per owning QuickApp, drained with
+weighted deficit round-robin so one busy QA cannot delay the others. Producers wake the engine's loop coroutine
+directly (via `call_soon_threadsafe`), which then drains everything pending
+with `process_pending(...)`, bounded by a per-tick item/time budget so a burst
+cannot starve the rest of the asyncio loop. When nothing is queued the
+consumer sleeps on an `asyncio.Event` and costs no CPU. Keeping the queue
+plumbing here lets `engine.py` focus on lifecycle and the Lua/Lupa boundary.
 """
 
 from __future__ import annotations
 
+import asyncio
+import concurrent.futures
 import logging
-import queue
+import threading
 import time
 import uuid
-from collections.abc import Callable
+from collections import OrderedDict, deque
+from collections.abc import Callable, Hashable
 from typing import Any
 
 logger = logging.getLogger(__name__)
 
+# Default per-tick drain budget. Large enough that a burst of a few hundred
+# network callbacks is delivered in one tick, small enough that timers and
+# socket I/O on the same loop still get a turn within ~50 ms.
+DEFAULT_MAX_ITEMS_PER_TICK = 1000
+DEFAULT_MAX_TIME_PER_TICK = 0.05
+
+# Compiled ad-hoc scripts kept for reuse (see CrossThreadDispatch._compile).
+DEFAULT_CHUNK_CACHE_SIZE = 256
+
+# Execution request kinds
+EXEC_SCRIPT = "script"  # Lua source, compiled through the chunk cache
+EXEC_JSON = "json"      # JSON-encoded {"function", "module", "args"} call
+EXEC_CALL = "call"      # registered entry point called with native args
+
+# Lane overflow policies
+POLICY_BLOCK = "block"              # producer waits (up to block_timeout) for space; drop_oldest on the loop thread
+POLICY_DROP_OLDEST = "drop_oldest"  # evict the oldest queued item
+POLICY_DROP_NEWEST = "drop_newest"  # reject the item being posted
+POLICY_COALESCE = "coalesce"        # replace a queued item with the same key in place
+OVERFLOW_POLICIES = (POLICY_BLOCK, POLICY_DROP_OLDEST, POLICY_DROP_NEWEST, POLICY_COALESCE)
+
+LANE_EXECUTION = "execution"
+LANE_LUA_CALL = "lua_call"
+LANE_CALLBACK = "callback"
+
+# Drain order, highest priority first.
+DEFAULT_LANE_PRIORITY = (LANE_EXECUTION, LANE_LUA_CALL, LANE_CALLBACK)
+
+# Per-lane defaults; override any field via the engine's `dispatch_lanes` config.
+DEFAULT_LANE_CONFIG: dict[str, dict[str, Any]] = {
+    LANE_EXECUTION: {"capacity": 1000, "policy": POLICY_DROP_NEWEST},
+    LANE_LUA_CALL: {"capacity": 10000, "policy": POLICY_DROP_OLDEST},
+    LANE_CALLBACK: {"capacity": 10000, "policy": POLICY_BLOCK},
+}
+
+
+class DispatchLane:
+    """
+    A bounded, thread-safe FIFO with an overflow policy and depth counters.
+
+    `capacity=0` means unbounded. With `POLICY_COALESCE`, an item posted with
+    a `key` that is already queued replaces the queued item's payload in place
+    (it keeps its position), which gives "latest value wins" semantics for
+    idempotent updates; keyless items on a full coalescing lane drop the
+    oldest entry. `POLICY_BLOCK` never blocks the consumer's own thread (it
+    would deadlock): a post from the loop thread - e.g. an MQTT, websocket or
+    TCP client task - to a full lane evicts the oldest entry instead, counted
+    as both `overflow` and `dropped`, so the lane stays bounded. Evicted
+    items are passed to `on_evict`, outside the lane's lock.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        capacity: int = 0,
+        policy: str = POLICY_DROP_OLDEST,
+        block_timeout: float = 1.0,
+        on_evict: Callable[[Any], None] | None = None,
+    ) -> None:
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy for lane {name}: {policy}")
+        self.name = name
+        self.capacity = max(0, int(capacity))
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.on_evict = on_evict
+        self.consumer_thread: int | None = None
+        # Entries are [key, item] lists so coalescing can update them in place.
+        self._items: deque[list] = deque()
+        self._keyed: dict[Hashable, list] = {}
+        self._cond = threading.Condition(threading.Lock())
+        self.posted = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.overflow = 0
+        self.high_water = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def put(self, item: Any, key: Hashable | None = None) -> bool:
+        """Queue `item`. Returns False if the item was dropped."""
+        evicted: list = []
+        with self._cond:
+            self.posted += 1
+            if key is not None and self.policy == POLICY_COALESCE:
+                entry = self._keyed.get(key)
+                if entry is not None:
+                    entry[1] = item
+                    self.coalesced += 1
+                    return True
+            if self.capacity and len(self._items) >= self.capacity:
+                if not self._make_room(evicted):
+                    self.dropped += 1
+                    return False
+            entry = [key, item]
+            self._items.append(entry)
+            if key is not None and self.policy == POLICY_COALESCE:
+                self._keyed[key] = entry
+            if len(self._items) > self.high_water:
+                self.high_water = len(self._items)
+        if evicted and self.on_evict is not None:
+            self.on_evict(evicted[0])
+        return True
+
+    def _make_room(self, evicted: list) -> bool:
+        """
+        Apply the overflow policy to a full lane. Called with the lock held;
+        an evicted item is appended to `evicted`.
+        """
+        if self.policy in (POLICY_DROP_OLDEST, POLICY_COALESCE):
+            evicted.append(self._pop_entry()[1])
+            self.dropped += 1
+            return True
+        if self.policy == POLICY_BLOCK:
+            if threading.get_ident() == self.consumer_thread:
+                # Waiting would deadlock the loop; fall back to drop_oldest
+                self.overflow += 1
+                evicted.append(self._pop_entry()[1])
+                self.dropped += 1
+                return True
+            if self._cond.wait_for(lambda: len(self._items) < self.capacity, self.block_timeout):
+                return True
+        return False
+
+    def _pop_entry(self) -> list:
+        entry = self._items.popleft()
+        if entry[0] is not None and self._keyed.get(entry[0]) is entry:
+            del self._keyed[entry[0]]
+        return entry
+
+    def get_nowait(self) -> Any:
+        """Pop the oldest item. Raises IndexError if the lane is empty."""
+        with self._cond:
+            entry = self._pop_entry()
+            self.delivered += 1
+            if self.policy == POLICY_BLOCK:
+                self._cond.notify()
+            return entry[1]
+
+    def stats(self) -> dict[str, Any]:
+        """Depth and saturation counters for this lane."""
+        return {
+            "depth": len(self._items),
+            "capacity": self.capacity,
+            "policy": self.policy,
+            "high_water": self.high_water,
+            "posted": self.posted,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "overflow": self.overflow,
+        }
+
+
+class FairLane:
+    """
+    A callback lane split into one `DispatchLane` per owner (QuickApp id).
+
+    In `--fibaro` mode several QAs share one Lua runtime; a single FIFO lets
+    a chatty QA (say, polling a gateway every 100 ms) queue ahead of every
+    other QA's replies. Here each owner gets its own sub-lane with the lane's
+    capacity and overflow policy, and `get_batch()` drains them with deficit
+    round-robin: each visit adds `quantum * weight` credits and every delivered
+    item costs one. Weights default to 1.0; `None` is the owner of callbacks
+    registered outside any QA (the emulator itself, plain scripts).
+
+    Each queued item carries its enqueue time so per-owner delivery latency
+    can be reported by `stats()`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        capacity: int = 0,
+        policy: str = POLICY_DROP_OLDEST,
+        block_timeout: float = 1.0,
+        quantum: int = 4,
+        weights: dict[Hashable, float] | None = None,
+    ) -> None:
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy for lane {name}: {policy}")
+        self.name = name
+        self.capacity = max(0, int(capacity))
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.quantum = max(1, int(quantum))
+        self._consumer_thread: int | None = None
+        self._lock = threading.Lock()
+        self._subs: dict[Hashable, DispatchLane] = {}
+        self._weights: dict[Hashable, float] = dict(weights or {})
+        self._deficit: dict[Hashable, float] = {}
+        # Owners with queued items, in round-robin order; `_active_set` mirrors it.
+        self._active: deque[Hashable] = deque()
+        self._active_set: set[Hashable] = set()
+        # owner -> [count, total_seconds, max_seconds]
+        self._latency: dict[Hashable, list] = {}
+
+    @property
+    def consumer_thread(self) -> int | None:
+        return self._consumer_thread
+
+    @consumer_thread.setter
+    def consumer_thread(self, ident: int | None) -> None:
+        self._consumer_thread = ident
+        for sub in list(self._subs.values()):
+            sub.consumer_thread = ident
+
+    def __len__(self) -> int:
+        return sum(len(sub) for sub in list(self._subs.values()))
+
+    def set_weight(self, owner: Hashable, weight: float) -> None:
+        """Set the share of `owner` relative to the others (default 1.0)."""
+        if weight <= 0:
+            raise ValueError(f"Weight for {owner} must be positive: {weight}")
+        with self._lock:
+            self._weights[owner] = float(weight)
+
+    def _sub(self, owner: Hashable) -> DispatchLane:
+        with self._lock:
+            sub = self._subs.get(owner)
+            if sub is None:
+                sub = DispatchLane(
+                    f"{self.name}:{owner}", self.capacity, self.policy, self.block_timeout
+                )
+                sub.consumer_thread = self._consumer_thread
+                self._subs[owner] = sub
+            return sub
+
+    def put(self, item: Any, key: Hashable | None = None, owner: Hashable | None = None) -> bool:
+        """Queue `item` for `owner`. Returns False if the item was dropped."""
+        sub = self._sub(owner)
+        # Put outside our lock: a blocking sub-lane must not stall other owners.
+        if not sub.put((time.monotonic(), item), key):
+            return False
+        with self._lock:
+            if owner not in self._active_set:
+                self._active_set.add(owner)
+                self._active.append(owner)
+        return True
+
+    def get_batch(self, limit: int) -> list[tuple[Hashable, Any]]:
+        """Pop up to `limit` `(owner, item)` pairs in deficit round-robin order."""
+        out: list[tuple[Hashable, Any]] = []
+        now = time.monotonic()
+        with self._lock:
+            while len(out) < limit and self._active:
+                owner = self._active[0]
+                sub = self._subs[owner]
+                # Credits left over when the previous batch hit `limit` are
+                # spent first, so a batch boundary does not grant an extra turn.
+                if self._deficit.get(owner, 0.0) < 1:
+                    self._deficit[owner] = (
+                        self._deficit.get(owner, 0.0) + self.quantum * self._weights.get(owner, 1.0)
+                    )
+                while self._deficit[owner] >= 1 and len(out) < limit:
+                    try:
+                        enqueued, item = sub.get_nowait()
+                    except IndexError:
+                        break
+                    self._deficit[owner] -= 1
+                    lat = self._latency.setdefault(owner, [0, 0.0, 0.0])
+                    lat[0] += 1
+                    lat[1] += now - enqueued
+                    if now - enqueued > lat[2]:
+                        lat[2] = now - enqueued
+                    out.append((owner, item))
+                if not len(sub):
+                    self._active.popleft()
+                    self._active_set.discard(owner)
+                    self._deficit[owner] = 0.0
+                elif self._deficit[owner] < 1:
+                    self._active.rotate(-1)
+        return out
+
+    def get_nowait(self) -> Any:
+        """Pop the next item in fair order. Raises IndexError if the lane is empty."""
+        batch = self.get_batch(1)
+        if not batch:
+            raise IndexError("get from empty lane")
+        return batch[0][1]
+
+    def owner_stats(self) -> dict[Hashable, dict[str, Any]]:
+        """Per-owner depth, weight, counters and enqueue-to-delivery latency."""
+        with self._lock:
+            owners = list(self._subs.items())
+        result = {}
+        for owner, sub in owners:
+            count, total, peak = self._latency.get(owner, (0, 0.0, 0.0))
+            result[owner if owner is not None else "system"] = {
+                "depth": len(sub),
+                "weight": self._weights.get(owner, 1.0),
+                "posted": sub.posted,
+                "delivered": sub.delivered,
+                "dropped": sub.dropped,
+                "coalesced": sub.coalesced,
+                "latency_avg_ms": round(total / count * 1000, 3) if count else 0.0,
+                "latency_max_ms": round(peak * 1000, 3),
+            }
+        return result
+
+    def stats(self) -> dict[str, Any]:
+        """Aggregate counters in the same shape as `DispatchLane.stats()`, plus `owners`."""
+        with self._lock:
+            subs = list(self._subs.values())
+        totals = {
+            field: sum(getattr(sub, field) for sub in subs)
+            for field in ("posted", "delivered", "dropped", "coalesced", "overflow")
+        }
+        return {
+            "depth": sum(len(sub) for sub in subs),
+            "capacity": self.capacity,
+            "policy": self.policy,
+            "high_water": max((sub.high_water for sub in subs), default=0),
+            **totals,
+            "owners": self.owner_stats(),
+        }
+
 
 class CrossThreadDispatch:
     """Owns the three thread→loop queues and the pending-results map."""
 
-    def __init__(self) -> None:
-        # Callback results posted from worker threads.
-        self._callback_queue: queue.Queue = queue.Queue()
+    def __init__(
+        self,
+        max_items_per_tick: int = DEFAULT_MAX_ITEMS_PER_TICK,
+        max_time_per_tick: float = DEFAULT_MAX_TIME_PER_TICK,
+        lanes: dict[str, dict[str, Any]] | None = None,
+        priority: tuple[str, ...] | list[str] = DEFAULT_LANE_PRIORITY,
+        owner_weights: dict[Hashable, float] | None = None,
+        chunk_cache_size: int = DEFAULT_CHUNK_CACHE_SIZE,
+    ) -> None:
+        lane_config = {name: dict(cfg) for name, cfg in DEFAULT_LANE_CONFIG.items()}
+        for name, cfg in (lanes or {}).items():
+            if name not in lane_config:
+                raise ValueError(f"Unknown dispatch lane: {name}")
+            lane_config[name].update(cfg)
+        callback_lane = FairLane(LANE_CALLBACK, weights=owner_weights, **lane_config[LANE_CALLBACK])
+        execution_lane = DispatchLane(LANE_EXECUTION, on_evict=self._evict_request, **lane_config[LANE_EXECUTION])
+        built: dict[str, DispatchLane | FairLane] = {LANE_CALLBACK: callback_lane, LANE_EXECUTION: execution_lane}
+        self._lanes: dict[str, DispatchLane | FairLane] = {
+            name: built[name] if name in built else DispatchLane(name, **cfg)
+            for name, cfg in lane_config.items()
+        }
+        if sorted(priority) != sorted(self._lanes):
+            raise ValueError(f"Lane priority must name each lane once: {list(self._lanes)}")
+        self._priority = tuple(priority)
+        # Callback results posted from worker threads, queued per owning QA.
+        # `_owners` maps callback id -> owner; Lua registers callbacks created
+        # inside a QA via set_callback_owner(). Unowned callbacks share `None`.
+        self._callback_queue = callback_lane
+        self._owners: dict[int, Hashable] = {}
         # Fire-and-forget _PY.<name>(*args) calls posted from worker threads.
-        self._lua_call_queue: queue.Queue = queue.Queue()
-        # Synchronous script execution requests + their resolved results.
-        self._execution_queue: queue.Queue = queue.Queue()
-        self._execution_results: dict[str, Any] = {}
+        self._lua_call_queue = self._lanes[LANE_LUA_CALL]
+        # Script execution requests + the futures their callers wait on.
+        # A request leaves `_pending` when it is resolved, times out or is
+        # cancelled, so late results are dropped instead of accumulating.
+        self._execution_queue = execution_lane
+        self._pending: dict[str, concurrent.futures.Future] = {}
+        self._pending_lock = threading.Lock()
+        # source -> compiled Lua function, most recently used last. Only
+        # touched from the loop thread.
+        self._chunks: OrderedDict[str, Any] = OrderedDict()
+        self.chunk_cache_size = max(0, int(chunk_cache_size))
+        self.chunk_hits = 0
+        self.chunk_misses = 0
+
+        self.max_items_per_tick = max(1, int(max_items_per_tick))
+        self.max_time_per_tick = max(0.0, float(max_time_per_tick))
+
+        # Wakeup plumbing. `_wakeup_pending` collapses many producer posts
+        # into a single call_soon_threadsafe() until the consumer runs.
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._wakeup_lock = threading.Lock()
+        self._wakeup_pending = False
 
     # ------------------------------------------------------------------
-    # Producers (called from any thread)
+    # Wakeup (producers → consumer)
     # ------------------------------------------------------------------
-    def post_callback(self, callback_id: int, error: Any = None, result: Any = None) -> None:
-        """Queue a callback result for delivery to Lua."""
+    def attach_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Bind to the loop the consumer runs on. Must be called from that loop."""
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        for lane in self._lanes.values():
+            lane.consumer_thread = threading.get_ident()
+        with self._wakeup_lock:
+            self._wakeup_pending = True
+        # Anything posted before the loop was attached is drained on the first wait.
+        self._wakeup.set()
+
+    def _notify(self) -> None:
+        """Wake the consumer. Safe to call from any thread."""
+        loop, wakeup = self._loop, self._wakeup
+        if loop is None or wakeup is None:
+            return
+        with self._wakeup_lock:
+            if self._wakeup_pending:
+                return
+            self._wakeup_pending = True
         try:
-            self._callback_queue.put_nowait((callback_id, error, result))
-        except queue.Full:
+            loop.call_soon_threadsafe(wakeup.set)
+        except RuntimeError:
+            # Loop already closed (shutdown race) - nothing left to wake.
+            pass
+
+    async def wait_for_work(self) -> None:
+        """Block until a producer has posted something since the last drain."""
+        assert self._wakeup is not None, "attach_loop() must be called first"
+        if not self.has_pending():
+            await self._wakeup.wait()
+        self._wakeup.clear()
+        # Reset before draining so a post racing with the drain re-arms the event.
+        with self._wakeup_lock:
+            self._wakeup_pending = False
+
+    def has_pending(self) -> bool:
+        """True if any of the three lanes has undelivered work."""
+        return any(self._lanes.values())
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """Per-lane depth and saturation counters, in priority order."""
+        stats = {name: self._lanes[name].stats() for name in self._priority}
+        stats[LANE_EXECUTION]["chunk_cache"] = {
+            "size": len(self._chunks),
+            "capacity": self.chunk_cache_size,
+            "hits": self.chunk_hits,
+            "misses": self.chunk_misses,
+        }
+        return stats
+
+    # ------------------------------------------------------------------
+    # Callback ownership (per-QA fairness)
+    # ------------------------------------------------------------------
+    def set_callback_owner(self, callback_id: int, owner: Hashable) -> None:
+        """Attribute future results for `callback_id` to `owner` (a QA id)."""
+        self._owners[callback_id] = owner
+
+    def clear_callback_owner(self, callback_id: int) -> None:
+        """Forget the owner of a callback that Lua has released."""
+        self._owners.pop(callback_id, None)
+
+    def set_owner_weight(self, owner: Hashable, weight: float) -> None:
+        """Give `owner` a larger (or smaller) share of each callback drain."""
+        self._callback_queue.set_weight(owner, weight)
+
+    # ------------------------------------------------------------------
+    # Producers (called from any thread)
+    # ------------------------------------------------------------------
+    def post_callback(
+        self,
+        callback_id: int,
+        error: Any = None,
+        result: Any = None,
+        coalesce_key: Hashable | None = None,
+    ) -> None:
+        """
+        Queue a callback result for delivery to Lua.
+
+        `coalesce_key` marks idempotent updates (e.g. latest value of an MQTT
+        topic); it only has an effect when the callback lane uses the
+        coalesce policy.
+        """
+        owner = self._owners.get(callback_id)
+        if not self._callback_queue.put((callback_id, error, result), coalesce_key, owner):
             logger.error(f"Callback queue is full, dropping callback {callback_id}")
+            return
+        self._notify()
 
-    def post_lua_call(self, func_name: str, args: tuple) -> None:
+    def post_lua_call(self, func_name: str, args: tuple, coalesce_key: Hashable | None = None) -> None:
         """Queue a fire-and-forget _PY.<name>(*args) call."""
-        try:
-            self._lua_call_queue.put_nowait((func_name, args))
-        except queue.Full:
+        if not self._lua_call_queue.put((func_name, args), coalesce_key):
             logger.error(f"Lua call queue is full, dropping call to {func_name}")
+            return
+        self._notify()
+
+    def submit_script(
+        self,
+        script: str,
+        timeout_seconds: float = 30.0,
+        is_json: bool = False,
+    ) -> tuple[str, concurrent.futures.Future]:
+        """
+        Queue a script for execution on the main loop.
+
+        Returns `(request_id, future)`. The future resolves to the result dict
+        produced by `_PY.threadRequest`; cancel it (or call `cancel_request()`)
+        if the caller no longer needs the result.
+        """
+        return self._submit(EXEC_JSON if is_json else EXEC_SCRIPT, script, None)
+
+    def submit_call(self, name: str, args: tuple = ()) -> tuple[str, concurrent.futures.Future]:
+        """
+        Queue a call to the Lua entry point `name` (see `_PY.registerEntryPoint`).
+
+        `args` are passed to Lua as-is, so no source is built or parsed. The
+        future resolves to the same result dict as `submit_script()`.
+        """
+        return self._submit(EXEC_CALL, name, args)
+
+    def _submit(self, kind: str, payload: str, args: tuple | None) -> tuple[str, concurrent.futures.Future]:
+        request_id = str(uuid.uuid4())
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        with self._pending_lock:
+            self._pending[request_id] = future
+        if not self._execution_queue.put((request_id, kind, payload, args)):
+            self._discard(request_id)
+            future.set_result(_error_result("Execution queue is full"))
+            return request_id, future
+        self._notify()
+        return request_id, future
 
     def execute_script_and_wait(
         self,
@@ -72,87 +572,251 @@ class CrossThreadDispatch:
         is_json: bool = False,
     ) -> dict[str, Any]:
         """Submit a script for execution on the main loop and block until result."""
-        request_id = str(uuid.uuid4())
+        return self._wait(*self.submit_script(script, timeout_seconds, is_json), timeout_seconds)
+
+    def call_and_wait(self, name: str, args: tuple = (), timeout_seconds: float = 30.0) -> dict[str, Any]:
+        """Call a Lua entry point on the main loop and block until result."""
+        return self._wait(*self.submit_call(name, args), timeout_seconds)
+
+    def _wait(
+        self,
+        request_id: str,
+        future: concurrent.futures.Future,
+        timeout_seconds: float,
+    ) -> dict[str, Any]:
         try:
-            self._execution_queue.put_nowait((request_id, script, timeout_seconds, is_json))
-        except queue.Full:
-            return {
-                "success": False,
-                "result": None,
-                "execution_time": 0,
-                "error": "Execution queue is full",
-            }
+            return future.result(timeout=timeout_seconds)
+        except concurrent.futures.TimeoutError:
+            self.cancel_request(request_id)
+            return _timeout_result(timeout_seconds)
 
-        start = time.time()
-        while time.time() - start < timeout_seconds:
-            if request_id in self._execution_results:
-                return self._execution_results.pop(request_id)
-            time.sleep(0.01)
+    async def execute_script_async(
+        self,
+        script: str,
+        timeout_seconds: float = 30.0,
+        is_json: bool = False,
+    ) -> dict[str, Any]:
+        """
+        Coroutine variant of `execute_script_and_wait()`.
 
-        self._execution_results.pop(request_id, None)
-        return {
-            "success": False,
-            "result": None,
-            "execution_time": timeout_seconds,
-            "error": f"Script execution timeout after {timeout_seconds} seconds",
-        }
+        If the awaiting task is cancelled (e.g. the HTTP client went away),
+        the pending request is cancelled too and never runs if not yet started.
+        """
+        return await self._wait_async(*self.submit_script(script, timeout_seconds, is_json), timeout_seconds)
+
+    async def call_async(self, name: str, args: tuple = (), timeout_seconds: float = 30.0) -> dict[str, Any]:
+        """Coroutine variant of `call_and_wait()`."""
+        return await self._wait_async(*self.submit_call(name, args), timeout_seconds)
+
+    async def _wait_async(
+        self,
+        request_id: str,
+        future: concurrent.futures.Future,
+        timeout_seconds: float,
+    ) -> dict[str, Any]:
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout_seconds)
+        except TimeoutError:
+            self.cancel_request(request_id)
+            return _timeout_result(timeout_seconds)
+        except asyncio.CancelledError:
+            self.cancel_request(request_id)
+            raise
+
+    def cancel_request(self, request_id: str) -> bool:
+        """Cancel a pending execution request. Returns False if it already completed."""
+        future = self._discard(request_id)
+        return future is not None and future.cancel()
+
+    def pending_request_count(self) -> int:
+        """Number of execution requests still waiting for a result."""
+        return len(self._pending)
+
+    def _discard(self, request_id: str) -> concurrent.futures.Future | None:
+        with self._pending_lock:
+            return self._pending.pop(request_id, None)
+
+    def _evict_request(self, item: tuple) -> None:
+        """An overflowing execution lane evicted `item`: fail its caller now."""
+        self.store_execution_result(item[0], _error_result("Execution queue is full"))
 
     # ------------------------------------------------------------------
     # Consumer side (called from the main loop)
     # ------------------------------------------------------------------
     def store_execution_result(self, request_id: str, result: Any) -> None:
-        """Resolve a pending execute_script_and_wait() request."""
-        self._execution_results[request_id] = result
+        """Resolve a pending execution request; late or cancelled results are dropped."""
+        future = self._discard(request_id)
+        if future is None:
+            logger.debug(f"Dropping result for expired execution request {request_id}")
+            return
+        try:
+            future.set_result(result)
+        except concurrent.futures.InvalidStateError:
+            # Cancelled by the caller between _discard() and set_result()
+            pass
 
-    def process_once(
+    def process_pending(
         self,
         lua: Any,
         py_table_convert: Callable[[Any], Any],
-    ) -> None:
+    ) -> bool:
         """
-        Drain one entry from each of the three queues, if available.
+        Drain the lanes in strict priority order until empty or the tick budget is spent.
+
+        Each pass visits the lanes in `priority` order and empties each one
+        (within the item budget) before moving on to the next, so a lower
+        lane only runs once every higher lane is empty.
 
         `lua` is the Lupa runtime; `py_table_convert` is `python_to_lua_table`.
-        Errors in any single queue are logged but do not stop the others.
+        Errors in any single item are logged but do not stop the drain.
+        Returns True if work is still pending (budget exhausted), in which case
+        the caller should yield to the loop and call again.
         """
-        # 1. Callback results → _PY.timerExpired(cb, err, res)
-        try:
-            callback_id, error, result = self._callback_queue.get_nowait()
-            if error is not None and isinstance(error, (dict, list)):
-                error = py_table_convert(error)
-            if result is not None and isinstance(result, (dict, list)):
-                result = py_table_convert(result)
-            # Hold strong refs across the Lua call to keep Python 3.12's GC from
-            # collecting Lupa wrapper objects mid-call.
-            _keep_alive = (error, result)
-            lua.globals()["_PY"]["timerExpired"](callback_id, error, result)
-            del _keep_alive
-        except queue.Empty:
-            pass
+        deadline = time.monotonic() + self.max_time_per_tick
+        handled = 0
+        while handled < self.max_items_per_tick:
+            progressed = False
+            for name in self._priority:
+                budget = self.max_items_per_tick - handled
+                if budget <= 0:
+                    break
+                if name == LANE_CALLBACK:
+                    try:
+                        delivered = self._deliver_callback_batch(lua, py_table_convert, budget)
+                    except Exception as e:
+                        delivered = 1
+                        logger.error(f"Error delivering callback batch: {e}")
+                    handled += delivered
+                    progressed = progressed or delivered > 0
+                    continue
+                step = self._deliver_execution if name == LANE_EXECUTION else self._deliver_lua_call
+                # Higher-priority lanes drain fully (within budget) before the next lane.
+                while handled < self.max_items_per_tick:
+                    try:
+                        if not step(lua, py_table_convert):
+                            break
+                    except Exception as e:
+                        logger.error(f"Error processing cross-thread item: {e}")
+                    progressed = True
+                    handled += 1
+            if not progressed:
+                return False
+            if time.monotonic() >= deadline:
+                break
+        return self.has_pending()
+
+    def _deliver_callback_batch(
+        self,
+        lua: Any,
+        py_table_convert: Callable[[Any], Any],
+        limit: int,
+    ) -> int:
+        """
+        Callback results → one _PY.timerExpiredBatch(batch, n) call.
 
-        # 2. Fire-and-forget _PY calls
+        Items are taken across owners in deficit round-robin order. `batch`
+        is a flat Lua array of `n` (callback_id, error, result) triples; nil
+        errors/results leave holes, so Lua walks it by `n` rather than
+        `#batch`. A payload that fails to convert (e.g. a cyclic dict) is
+        delivered to its callback as an error string with a nil result, so
+        the rest of the batch still runs. Returns the number of callbacks
+        delivered.
+        """
+        flat: list[Any] = []
+        n = 0
+        for _owner, (callback_id, error, result) in self._callback_queue.get_batch(limit):
+            try:
+                if error is not None and isinstance(error, (dict, list)):
+                    error = py_table_convert(error)
+                if result is not None and isinstance(result, (dict, list)):
+                    result = py_table_convert(result)
+            except Exception as e:
+                logger.error(f"Error converting result for callback {callback_id}: {e}")
+                error, result = f"Failed to convert callback result: {e}", None
+            flat += (callback_id, error, result)
+            n += 1
+        if n == 0:
+            return 0
+        # `flat` holds strong refs to the converted Lupa tables across the
+        # Lua call, keeping Python 3.12's GC from collecting them mid-call.
+        batch = lua.table_from(flat)
+        lua.globals()["_PY"]["timerExpiredBatch"](batch, n)
+        return n
+
+    def _deliver_lua_call(self, lua: Any, py_table_convert: Callable[[Any], Any]) -> bool:
+        """Fire-and-forget _PY.<name>(*args) calls."""
         try:
             func_name, args = self._lua_call_queue.get_nowait()
-            py_func = lua.globals()["_PY"][func_name]
-            if py_func is not None:
-                py_func(*args)
-        except queue.Empty:
-            pass
+        except IndexError:
+            return False
+        py_func = lua.globals()["_PY"][func_name]
+        if py_func is not None:
+            py_func(*args)
+        return True
 
-        # 3. Synchronous script execution requests
+    def _deliver_execution(self, lua: Any, py_table_convert: Callable[[Any], Any]) -> bool:
+        """
+        Execution requests → Lua.
+
+        Scripts run via _PY.threadRequestChunk(id, fn, err) with `fn` from the
+        chunk cache, entry points via _PY.callEntryPoint(id, name, *args), and
+        JSON calls via _PY.threadRequest(id, json, true).
+        """
         try:
-            request_id, script, _timeout_seconds, is_json = self._execution_queue.get_nowait()
-            start_time = time.time()
-            try:
-                lua.globals()["_PY"]["threadRequest"](request_id, script, is_json)
-                # The result is delivered later via store_execution_result()
-                # when Lua calls _PY.threadRequestResult(id, result).
-            except Exception as e:
-                self._execution_results[request_id] = {
-                    "success": False,
-                    "result": None,
-                    "execution_time": time.time() - start_time,
-                    "error": f"Failed to execute threadRequest: {e}",
-                }
-        except queue.Empty:
-            pass
+            request_id, kind, payload, args = self._execution_queue.get_nowait()
+        except IndexError:
+            return False
+        if request_id not in self._pending:
+            # Cancelled or timed out before it reached the loop - skip the work.
+            return True
+        start_time = time.time()
+        try:
+            py = lua.globals()["_PY"]
+            if kind == EXEC_CALL:
+                py["callEntryPoint"](request_id, payload, *args)
+            elif kind == EXEC_SCRIPT:
+                func, err = self._compile(lua, payload)
+                py["threadRequestChunk"](request_id, func, err)
+            else:
+                py["threadRequest"](request_id, payload, True)
+            # The result is delivered later via store_execution_result()
+            # when Lua calls _PY.threadRequestResult(id, result).
+        except Exception as e:
+            self.store_execution_result(
+                request_id,
+                _error_result(f"Failed to execute threadRequest: {e}", time.time() - start_time),
+            )
+        return True
+
+    def _compile(self, lua: Any, script: str) -> tuple[Any, str | None]:
+        """Compiled function for `script` via the LRU, or `(None, error)` if it does not load."""
+        func = self._chunks.get(script)
+        if func is not None:
+            self._chunks.move_to_end(script)
+            self.chunk_hits += 1
+            return func, None
+        self.chunk_misses += 1
+        loaded = lua.globals()["load"](script, "=threadRequest")
+        if isinstance(loaded, tuple):
+            # load() returned nil, message
+            return None, loaded[1]
+        if self.chunk_cache_size:
+            self._chunks[script] = loaded
+            if len(self._chunks) > self.chunk_cache_size:
+                self._chunks.popitem(last=False)
+        return loaded, None
+
+
+def _error_result(error: str, execution_time: float = 0) -> dict[str, Any]:
+    return {
+        "success": False,
+        "result": None,
+        "execution_time": execution_time,
+        "error": error,
+    }
+
+
+def _timeout_result(timeout_seconds: float) -> dict[str, Any]:
+    return _error_result(
+        f"Script execution timeout after {timeout_seconds} seconds", timeout_seconds
+    )
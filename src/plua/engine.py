@@ -16,8 +16,14 @@ import lupa
 
 # Import extensions to register decorated functions
 from . import extensions  # noqa: F401,F811
-from .cross_thread import CrossThreadDispatch
-from .lua_bindings import LuaBindings, set_global_engine
+from .cross_thread import (
+    DEFAULT_CHUNK_CACHE_SIZE,
+    DEFAULT_LANE_PRIORITY,
+    DEFAULT_MAX_ITEMS_PER_TICK,
+    DEFAULT_MAX_TIME_PER_TICK,
+    CrossThreadDispatch,
+)
+from .lua_bindings import LuaBindings, lua_to_python_table, set_global_engine
 from .timers import AsyncTimerManager
 
 logger = logging.getLogger(__name__)
@@ -75,14 +81,35 @@ class LuaEngine:
             unpack_returned_tuples=True,
             encoding='UTF-8'  # pyright: ignore[reportCallIssue]
         )
-        self._timer_manager = AsyncTimerManager()
+        # `timer_slack_ms` lets timers run up to that much late so that timers
+        # due close together share one wakeup and one Lua entry.
+        self._timer_manager = AsyncTimerManager(default_slack_ms=self._config.get("timer_slack_ms", 0))
         self._bindings = LuaBindings(self._timer_manager, self)
         self._running = False
         self._scripts: dict[str, str] = {}  # Store loaded scripts
+        # Mirrors "any pending callbacks or intervals" in init.lua (see set_activity);
+        # `_idle` is set whenever nothing is pending, see wait_until_idle().
+        self._lua_active = False
+        self._idle = asyncio.Event()
+        self._idle.set()
 
         # All cross-thread queue plumbing (callbacks, fire-and-forget Lua
         # calls, synchronous script execution) lives in CrossThreadDispatch.
-        self._dispatch = CrossThreadDispatch()
+        # The per-tick drain budget can be tuned via config.
+        # Lane capacities/overflow policies and the drain order can be set via
+        # `dispatch_lanes` / `dispatch_priority` (see cross_thread.DEFAULT_LANE_CONFIG).
+        # `qa_weights` maps QuickApp id -> share of callback delivery.
+        self._dispatch = CrossThreadDispatch(
+            max_items_per_tick=self._config.get("dispatch_max_items", DEFAULT_MAX_ITEMS_PER_TICK),
+            max_time_per_tick=self._config.get("dispatch_max_ms", DEFAULT_MAX_TIME_PER_TICK * 1000) / 1000.0,
+            lanes=self._config.get("dispatch_lanes"),
+            priority=self._config.get("dispatch_priority", DEFAULT_LANE_PRIORITY),
+            chunk_cache_size=self._config.get("chunk_cache_size", DEFAULT_CHUNK_CACHE_SIZE),
+            owner_weights={
+                int(k) if str(k).isdigit() else k: v
+                for k, v in (self._config.get("qa_weights") or {}).items()
+            },
+        )
 
         self._queue_processor_task = None
 
@@ -168,16 +195,27 @@ class LuaEngine:
         self._running = True
         await self._timer_manager.start()
 
+        # Producers wake the queue processor via this loop
+        self._dispatch.attach_loop(self._loop)
+
         # Start the queue processor task
         self._queue_processor_task = asyncio.create_task(self._process_queues())
 
     async def _process_queues(self):
-        """Drain the cross-thread dispatch queues into the main loop."""
+        """
+        Drain the cross-thread dispatch queues into the main loop.
+
+        Sleeps until a producer posts work, then drains everything pending in
+        budget-sized slices, yielding to the loop between slices.
+        """
         from .lua_bindings import python_to_lua_table
         while self._running:
             try:
-                self._dispatch.process_once(self._lua, python_to_lua_table)
-                await asyncio.sleep(0.01)
+                await self._dispatch.wait_for_work()
+                while self._dispatch.process_pending(self._lua, python_to_lua_table):
+                    await asyncio.sleep(0)
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.error(f"Error processing callback queue: {e}")
                 await asyncio.sleep(0.1)
@@ -303,6 +341,32 @@ class LuaEngine:
         """
         self._lua.globals()[name] = value
 
+    def get_callback_stats(self) -> dict[str, Any]:
+        """
+        Per-QA callback run-time histograms recorded by the Lua watchdog.
+
+        Returns `{"bounds": [...ms], "qas": {owner: {count, total_ms, max_ms,
+        overruns, buckets}}}`, or an empty dict when the watchdog is disabled.
+        """
+        get_stats = self._lua.globals()["_PY"]["getCallbackStats"]
+        if get_stats is None:
+            return {}
+        return lua_to_python_table(get_stats())
+
+    def get_registry(self, with_traceback: bool = False) -> dict[str, Any]:
+        """
+        Snapshot of live Lua callbacks and timers (see `_PY.getRegistry`).
+
+        Returns `{"callbacks": [{id, type, owner, persistent, system, age_s,
+        site, due_in_ms, ...}], "owners": {owner: {total, persistent, <type>:
+        n}}, "microtasks": n, "python_timers": n}`. Must be called on the
+        engine's loop; other threads use the "getRegistry" entry point.
+        """
+        registry = lua_to_python_table(self._lua.globals()["_PY"]["getRegistry"](with_traceback))
+        if not registry.get("callbacks"):
+            registry["callbacks"] = []
+        return registry
+
     def get_timer_manager(self) -> AsyncTimerManager:
         """Get the timer manager instance."""
         return self._timer_manager
@@ -324,30 +388,72 @@ class LuaEngine:
             return 0
 
     def has_active_operations(self) -> bool:
-        """Check if there are any active async operations (callbacks or intervals)."""
-        callback_count = self.get_pending_callback_count()
-        interval_count = self.get_running_intervals_count()
-        
-        # Debug logging to understand what's keeping the script alive
-        if callback_count > 0 or interval_count > 0:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.info(f"Active operations: callbacks={callback_count}, intervals={interval_count}")
-        
-        return callback_count > 0 or interval_count > 0
-
-    def post_lua_call(self, func_name: str, *args) -> None:
+        """
+        Check if there are any active async operations (callbacks or intervals).
+
+        init.lua keeps the counts incrementally and reports idle/active
+        transitions via _PY.set_activity(), so this does not call into Lua.
+        """
+        return self._lua_active
+
+    def set_activity(self, active: bool) -> None:
+        """Record an idle/active transition reported by init.lua."""
+        self._lua_active = bool(active)
+        if self._lua_active:
+            self._idle.clear()
+        else:
+            self._idle.set()
+        logger.debug(f"Lua activity: {'active' if active else 'idle'}")
+
+    async def wait_until_idle(self) -> None:
+        """Return as soon as the last non-system timer, interval or callback is gone."""
+        while self._lua_active:
+            await self._idle.wait()
+
+    def post_lua_call(self, func_name: str, *args, coalesce_key=None) -> None:
         """Post a fire-and-forget _PY.<func_name>(*args) call from any thread."""
-        self._dispatch.post_lua_call(func_name, args)
+        self._dispatch.post_lua_call(func_name, args, coalesce_key)
 
-    def post_callback_from_thread(self, callback_id: int, error=None, result=None):
+    def post_callback_from_thread(self, callback_id: int, error=None, result=None, coalesce_key=None):
         """Post a callback result from any Python thread to the main loop."""
-        self._dispatch.post_callback(callback_id, error, result)
+        self._dispatch.post_callback(callback_id, error, result, coalesce_key)
+
+    def get_dispatch_stats(self) -> dict[str, dict[str, Any]]:
+        """Per-lane queue depth and saturation counters of the cross-thread dispatcher."""
+        return self._dispatch.stats()
+
+    def set_callback_owner(self, callback_id: int, owner: Any) -> None:
+        """Attribute a registered Lua callback to a QuickApp for fair scheduling."""
+        self._dispatch.set_callback_owner(callback_id, owner)
+
+    def clear_callback_owner(self, callback_id: int) -> None:
+        """Forget the owner of a released Lua callback."""
+        self._dispatch.clear_callback_owner(callback_id)
+
+    def set_qa_weight(self, owner: Any, weight: float) -> None:
+        """Set a QuickApp's share of callback delivery (default 1.0)."""
+        self._dispatch.set_owner_weight(owner, weight)
 
     def execute_script_from_thread(self, script: str, timeout_seconds: float = 30.0, is_json: bool = False):
         """Execute a Lua script from any thread and block until the result is ready."""
         return self._dispatch.execute_script_and_wait(script, timeout_seconds, is_json)
 
+    async def execute_script_async(self, script: str, timeout_seconds: float = 30.0, is_json: bool = False):
+        """Execute a Lua script through the dispatch queue from a coroutine on any loop."""
+        return await self._dispatch.execute_script_async(script, timeout_seconds, is_json)
+
+    def call_entry_point_from_thread(self, name: str, *args: Any, timeout_seconds: float = 30.0):
+        """Call a Lua function registered with _PY.registerEntryPoint() from any thread and block for the result."""
+        return self._dispatch.call_and_wait(name, args, timeout_seconds)
+
+    async def call_entry_point_async(self, name: str, *args: Any, timeout_seconds: float = 30.0):
+        """Coroutine variant of call_entry_point_from_thread()."""
+        return await self._dispatch.call_async(name, args, timeout_seconds)
+
+    def cancel_script_request(self, request_id: str) -> bool:
+        """Cancel a pending script execution request (see CrossThreadDispatch.submit_script)."""
+        return self._dispatch.cancel_request(request_id)
+
     def handle_thread_request_result(self, request_id: str, result: Any):
         """
         Handle the result of a thread-safe script execution request.
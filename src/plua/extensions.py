@@ -511,6 +511,12 @@ def open_quickapp_window(qa_id: int, title: str, width: int = 800, height: int =
             # Fallback to default port used by FastAPI
             server_port = 8080
             
+        # Shards serve their API internally; the UI belongs on the coordinator's port
+        from .shard_worker import get_shard_worker
+        shard_worker = get_shard_worker()
+        if shard_worker:
+            server_port = int(shard_worker.coordinator.rsplit(":", 1)[1])
+
         # Construct the URL for the QuickApp UI
         base_url = f"http://localhost:{server_port}"
         static_url = f"{base_url}/static/quickapp_ui.html?qa_id={qa_id}&desktop=true"
@@ -647,6 +653,15 @@ def broadcast_view_update(qa_id: int, element_id: str, property_name: str, value
             from .lua_bindings import lua_to_python_table
             value = lua_to_python_table(value)
         
+        # In shard mode the browser is connected to the coordinator, not to this process
+        from .shard_worker import get_shard_worker
+        shard_worker = get_shard_worker()
+        if shard_worker:
+            shard_worker.broadcast(
+                {"qa_id": qa_id, "element_id": element_id, "property_name": property_name, "value": value}
+            )
+            return True
+
         # Check if API manager is available (multi-process mode)
         api_manager = getattr(engine, '_api_manager', None)
         if api_manager:
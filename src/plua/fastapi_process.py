@@ -5,16 +5,23 @@ This eliminates asyncio event loop conflicts and provides a stable web server
 """
 
 import asyncio
+import contextlib
 import json
 import logging
 import os
 import platform
 import queue
+import threading
 import time
 import uuid
-from collections.abc import Callable
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Union
 
+from lupa import lua_type
+
+from .ipc_channel import FramedChannel
+
 # Platform-specific imports
 if platform.system() == "Windows":
     # On Windows, use threading queues since we use threading instead of multiprocessing
@@ -44,7 +51,7 @@ if platform.system() == "Windows":
 import uvicorn
 from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
@@ -74,8 +81,12 @@ class IPCMessage(BaseModel):
     timestamp: float
 
 
-def create_fastapi_app(request_queue: Union[queue.Queue, 'multiprocessing.Queue'], response_queue: Union[queue.Queue, 'multiprocessing.Queue'], broadcast_queue: Union[queue.Queue, 'multiprocessing.Queue'], config: dict[str, Any]) -> FastAPI:
-    """Create the FastAPI application with IPC communication"""
+def create_fastapi_app(request_queue: Union[queue.Queue, 'multiprocessing.Queue', FramedChannel] | None, response_queue: Union[queue.Queue, 'multiprocessing.Queue', FramedChannel] | None, broadcast_queue: Union[queue.Queue, 'multiprocessing.Queue', FramedChannel] | None, config: dict[str, Any], request_handler: Callable[[str, dict[str, Any]], Awaitable[dict[str, Any]]] | None = None) -> FastAPI:
+    """Create the FastAPI application with IPC communication.
+    
+    With `request_handler` (in-process mode) requests are awaited on it directly
+    instead of going through the queues, which may then be None.
+    """
     
     app = FastAPI(
         title="PLua API Server", 
@@ -119,38 +130,67 @@ def create_fastapi_app(request_queue: Union[queue.Queue, 'multiprocessing.Queue'
     start_time = time.time()
     request_count = 0
     
+    # In-flight IPC requests: message id -> future resolved by the response reader
+    pending_responses: dict[str, asyncio.Future] = {}
+    reader_stop = threading.Event()
+    
+    def resolve_response(message_id: str, data: dict[str, Any]):
+        """Complete the waiting request (runs on the event loop)"""
+        future = pending_responses.pop(message_id, None)
+        if future is None:
+            logger.debug(f"Dropping IPC response for unknown or timed out request {message_id}")
+        elif not future.done():
+            future.set_result(data)
+    
+    def read_ipc_responses(loop: asyncio.AbstractEventLoop):
+        """Blocking reader thread: route each response to its request's future by id"""
+        while not reader_stop.is_set():
+            try:
+                response_data = response_queue.get(timeout=0.5)  # pyright: ignore[reportOptionalMemberAccess]
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            try:
+                loop.call_soon_threadsafe(resolve_response, response_data.get("id"), response_data.get("data", {}))
+            except RuntimeError:
+                break  # Event loop closed
+    
     # Helper function to send IPC request and wait for response
     async def send_ipc_request(message_type: str, data: dict[str, Any], timeout: float = 30.0) -> dict[str, Any]:
-        """Send an IPC request and wait for response"""
+        """Send an IPC request and wait for its response without blocking the event loop"""
         nonlocal request_count
         request_count += 1
         
+        if request_handler is not None:
+            try:
+                return await asyncio.wait_for(request_handler(message_type, data), timeout)
+            except TimeoutError:
+                return {"success": False, "error": f"Request timeout after {timeout} seconds"}
+            except Exception as e:
+                return {"success": False, "error": f"Request error: {str(e)}"}
+        
         message_id = str(uuid.uuid4())
-        message = IPCMessage(
-            id=message_id,
-            type=message_type,
-            data=data,
-            timestamp=time.time()
-        )
+        message = {"id": message_id, "type": message_type, "data": data, "timestamp": time.time()}  # IPCMessage layout
         
+        future = asyncio.get_running_loop().create_future()
+        pending_responses[message_id] = future
         try:
-            # Send request to main process
-            request_queue.put(message.dict(), timeout=1.0)
-            
-            # Wait for response
-            start_wait = time.time()
-            while time.time() - start_wait < timeout:
-                try:
-                    response_data = response_queue.get(timeout=0.1)
-                    if response_data.get("id") == message_id:
-                        return response_data.get("data", {})
-                except queue.Empty:
-                    continue
-                    
+            # Send request to main process. The multiprocessing queue is unbounded;
+            # a FramedChannel can fill up, so it waits off the event loop.
+            if isinstance(request_queue, FramedChannel):
+                await request_queue.put_async(message, timeout=1.0)
+            else:
+                request_queue.put(message, timeout=1.0)  # pyright: ignore[reportOptionalMemberAccess]
+            return await asyncio.wait_for(future, timeout)
+        except TimeoutError:
             return {"success": False, "error": f"IPC timeout after {timeout} seconds"}
-            
+        except queue.Full:
+            return {"success": False, "error": "IPC request channel full", "status_code": 503}
         except Exception as e:
             return {"success": False, "error": f"IPC error: {str(e)}"}
+        finally:
+            pending_responses.pop(message_id, None)
     
     # Health check endpoint
     @app.get("/health")
@@ -160,7 +200,7 @@ def create_fastapi_app(request_queue: Union[queue.Queue, 'multiprocessing.Queue'
             "status": "healthy",
             "uptime_seconds": uptime,
             "requests_served": request_count,
-            "mode": "multi-process",
+            "mode": "in-process" if request_handler else "multi-process",
             "lua_engine": "connected via IPC",
             "fibaro_api": "available (hook-based)"
         }
@@ -201,6 +241,7 @@ def create_fastapi_app(request_queue: Union[queue.Queue, 'multiprocessing.Queue'
                 <li><a href="/health">GET /health</a> - Health check</li>
                 <li>POST /plua/execute - Execute Lua code</li>
                 <li>GET/POST/PUT/DELETE /api/* - Fibaro API endpoints (if enabled)</li>
+                <li><a href="/plua/registry">GET /plua/registry</a> - Live callbacks and timers</li>
                 <li><a href="/docs">GET /docs</a> - API Documentation</li>
             </ul>
         </body>
@@ -241,11 +282,10 @@ def create_fastapi_app(request_queue: Union[queue.Queue, 'multiprocessing.Queue'
         method = request.method
         body_data = None
         
-        if method in ["POST", "PUT"] and await request.body():
-            try:
-                body_data = await request.json()
-            except Exception:
-                body_data = None
+        if method in ["POST", "PUT"]:
+            # Raw body text, decoded once by the Lua hook
+            body = await request.body()
+            body_data = body.decode("utf-8", "replace") if body else None
                 
         # Always send fibaro request via IPC - hook will handle it
         result = await send_ipc_request(
@@ -265,9 +305,12 @@ def create_fastapi_app(request_queue: Union[queue.Queue, 'multiprocessing.Queue'
             
             # Accept any 2xx status code as success (200, 201, 202, etc.)
             if not (200 <= status_code < 300):
-                error_msg = hook_result if isinstance(hook_result, str) else "Fibaro API error"
+                error_msg = hook_result if isinstance(hook_result, str) and not result.get("encoded") else "Fibaro API error"
                 raise HTTPException(status_code=status_code, detail=error_msg)
                 
+            if result.get("encoded"):
+                # JSON text already encoded by the Lua hook
+                return Response(content=hook_result, media_type="application/json")
             return hook_result
         else:
             # IPC failed
@@ -312,6 +355,14 @@ def create_fastapi_app(request_queue: Union[queue.Queue, 'multiprocessing.Queue'
             error_msg = result.get("error", "Failed to get QuickApps info")
             raise HTTPException(status_code=500, detail=error_msg)
     
+    @app.get("/plua/registry")
+    async def get_registry(traceback: bool = False):
+        """Live Lua callbacks and timers by type and owning QA, with age and registration site"""
+        result = await send_ipc_request("registry", {"traceback": traceback}, timeout=10.0)
+        if result.get("success", False):
+            return result.get("data")
+        raise HTTPException(status_code=500, detail=result.get("error", "Failed to get registry"))
+    
     # WebSocket management - define connections set and message buffer at function level
     websocket_connections = set()
     pending_broadcasts = []  # Buffer for messages when no connections are available
@@ -453,7 +504,7 @@ def create_fastapi_app(request_queue: Union[queue.Queue, 'multiprocessing.Queue'
                 try:
                     # Check for broadcast requests in the broadcast queue (non-blocking)
                     try:
-                        message = broadcast_queue.get_nowait()
+                        message = broadcast_queue.get_nowait()  # pyright: ignore[reportOptionalMemberAccess]
                         
                         if isinstance(message, dict) and message.get("type") == "websocket_broadcast":
                             # Handle broadcast request directly
@@ -484,6 +535,16 @@ def create_fastapi_app(request_queue: Union[queue.Queue, 'multiprocessing.Queue'
             
             logger.info("📥 Broadcast processor stopping...")
         
+        # In-process mode has no queues: requests are awaited directly and
+        # broadcasts are scheduled on this loop by the manager
+        if request_handler is not None:
+            return
+        
+        # Start the IPC response reader
+        threading.Thread(
+            target=read_ipc_responses, args=(asyncio.get_running_loop(),), name="ipc-response-reader", daemon=True
+        ).start()
+        
         # Start the broadcast processor
         logger.info("🔄 Starting broadcast processor task...")
         asyncio.create_task(process_websocket_broadcasts())
@@ -493,12 +554,37 @@ def create_fastapi_app(request_queue: Union[queue.Queue, 'multiprocessing.Queue'
     async def shutdown_event_handler():
         """Signal background tasks to shutdown"""
         shutdown_event.set()
+        reader_stop.set()
 
     
     return app
 
 
-def run_fastapi_server(request_queue: Union[queue.Queue, 'multiprocessing.Queue'], response_queue: Union[queue.Queue, 'multiprocessing.Queue'], broadcast_queue: Union[queue.Queue, 'multiprocessing.Queue'], config: dict[str, Any]):
+def _uvicorn_log_level(config: dict[str, Any]) -> str:
+    """Determine uvicorn log level based on PLua config"""
+    plua_log_level = config.get("loglevel", "INFO").upper()
+    if plua_log_level in ["CRITICAL", "ERROR"]:
+        return "error"
+    elif plua_log_level == "WARNING":
+        return "warning"
+    elif plua_log_level == "INFO":
+        return "error"  # Hide uvicorn startup messages unless explicitly requested
+    else:  # DEBUG
+        return "info"
+
+
+class _EmbeddedServer(uvicorn.Server):
+    """uvicorn server for in-process mode: signal handling stays with PLua"""
+    
+    @contextlib.contextmanager
+    def capture_signals(self):  # uvicorn >= 0.29
+        yield
+        
+    def install_signal_handlers(self):  # older uvicorn
+        pass
+
+
+def run_fastapi_server(request_queue: Union[queue.Queue, 'multiprocessing.Queue', FramedChannel], response_queue: Union[queue.Queue, 'multiprocessing.Queue', FramedChannel], broadcast_queue: Union[queue.Queue, 'multiprocessing.Queue', FramedChannel], config: dict[str, Any]):
     """Run the FastAPI server in a separate process"""
     import os
     import sys
@@ -531,23 +617,12 @@ def run_fastapi_server(request_queue: Union[queue.Queue, 'multiprocessing.Queue'
         # Create the FastAPI app
         app = create_fastapi_app(request_queue, response_queue, broadcast_queue, config)
         
-        # Determine uvicorn log level based on PLua config
-        plua_log_level = config.get("loglevel", "INFO").upper()
-        if plua_log_level in ["CRITICAL", "ERROR"]:
-            uvicorn_log_level = "error"
-        elif plua_log_level == "WARNING":
-            uvicorn_log_level = "warning"  
-        elif plua_log_level == "INFO":
-            uvicorn_log_level = "error"  # Hide uvicorn startup messages unless explicitly requested
-        else:  # DEBUG
-            uvicorn_log_level = "info"
-        
         # Run with uvicorn
         uvicorn.run(
             app,
             host=config.get("host", "0.0.0.0"),
             port=config.get("port", 8080),
-            log_level=uvicorn_log_level,
+            log_level=_uvicorn_log_level(config),
             access_log=False
         )
         
@@ -566,6 +641,16 @@ class FastAPIProcessManager:
         self.config = config or {}
         self.config.update({"host": host, "port": port})
         
+        # IPC transport: multiprocessing queues (default), framed Unix-socket
+        # channels (--api-transport socket), which skip pickling and the feeder
+        # thread, or no IPC at all (--api-inprocess: uvicorn on the engine's loop)
+        self.transport = "queue"
+        if self.config.get("api_inprocess"):
+            self.transport = "inprocess"
+        elif self.config.get("api_transport") == "socket" and platform.system() != "Windows":
+            self.transport = "socket"
+        mp_queues = self.transport == "queue" and platform.system() != "Windows"
+        
         # When multiprocessing creates its first Queue it spawns a resource_tracker
         # subprocess via subprocess.Popen.  That call always passes fds 0, 1, 2
         # to the child (FD_CLOEXEC does NOT help here).  If plua's stdout/stderr
@@ -575,7 +660,7 @@ class FastAPIProcessManager:
         # Fix: temporarily redirect fd 1 and fd 2 to /dev/null in the parent while
         # the Queues are created (i.e. while resource_tracker is spawned), then
         # restore them.  This is safe because no output is printed during __init__.
-        if platform.system() != "Windows":
+        if mp_queues:
             _saved_stdout = os.dup(1)
             _saved_stderr = os.dup(2)
             _devnull = os.open(os.devnull, os.O_WRONLY)
@@ -585,12 +670,21 @@ class FastAPIProcessManager:
             finally:
                 os.close(_devnull)
 
-        # IPC queues
-        self.request_queue = QueueType()
-        self.response_queue = QueueType()
-        self.broadcast_queue = QueueType()  # Separate queue for WebSocket broadcasts
+        # IPC queues (unused in-process)
+        if self.transport == "inprocess":
+            self.request_queue = queue.Queue()
+            self.response_queue = queue.Queue()
+            self.broadcast_queue = queue.Queue()
+        elif self.transport == "socket":
+            self.request_queue = FramedChannel()
+            self.response_queue = FramedChannel()
+            self.broadcast_queue = FramedChannel()
+        else:
+            self.request_queue = QueueType()
+            self.response_queue = QueueType()
+            self.broadcast_queue = QueueType()  # Separate queue for WebSocket broadcasts
 
-        if platform.system() != "Windows":
+        if mp_queues:
             # Restore original stdout/stderr
             os.dup2(_saved_stdout, 1)
             os.dup2(_saved_stderr, 2)
@@ -600,11 +694,22 @@ class FastAPIProcessManager:
         # Process management
         self.server_process: multiprocessing.Process | None = None
         self.running = False
+        self._server: _EmbeddedServer | None = None  # In-process mode
+        self._server_task: asyncio.Task | None = None
+        self._app: FastAPI | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        
+        # IPC requests handled concurrently; beyond the cap they wait in request_queue
+        self.max_inflight = max(1, int(self.config.get("api_max_inflight", 32)))
+        self._inflight = threading.BoundedSemaphore(self.max_inflight)
+        self._workers: ThreadPoolExecutor | None = None
         
         # Callbacks
         self.lua_executor: Callable[..., Any] | None = None
         self.fibaro_callback: Callable[..., Any] | None = None
+        self.fibaro_callback_async: Callable[..., Awaitable[Any]] | None = None
         self.quickapp_callback: Callable[..., Any] | None = None
+        self.registry_callback: Callable[..., Any] | None = None
         
     def set_lua_executor(self, executor: Callable[..., Any]):
         """Set the Lua code executor function"""
@@ -612,18 +717,32 @@ class FastAPIProcessManager:
         logger.info("Lua executor set for FastAPI process")
         
     def set_fibaro_callback(self, callback: Callable[..., Any]):
-        """Set the Fibaro API callback function"""
+        """Set the Fibaro API callback function.
+        
+        Called as callback(method, path, body) with the raw request body text
+        (or None); returns (data, status), or (json_text, status, True) for
+        an already encoded response.
+        """
         self.fibaro_callback = callback
         logger.info("Fibaro API callback set for FastAPI process")
         
+    def set_fibaro_callback_async(self, callback: Callable[..., Awaitable[Any]]):
+        """Set the coroutine variant of the Fibaro API callback, awaited on the loop in in-process mode"""
+        self.fibaro_callback_async = callback
+        
     def set_quickapp_callback(self, callback: Callable[..., Any]):
         """Set the QuickApp data callback function"""
         self.quickapp_callback = callback
         logger.info("QuickApp callback set for FastAPI process")
         
+    def set_registry_callback(self, callback: Callable[..., Any]):
+        """Set the callback/timer registry snapshot function"""
+        self.registry_callback = callback
+        logger.info("Registry callback set for FastAPI process")
+        
     def _convert_lua_objects(self, obj):
         """Convert LuaTable objects to Python objects to avoid pickle errors"""
-        if hasattr(obj, '__class__') and 'LuaTable' in str(obj.__class__):
+        if lua_type(obj) == "table":
             # Import here to avoid circular imports
             try:
                 from .lua_bindings import lua_to_python_table
@@ -653,13 +772,16 @@ class FastAPIProcessManager:
             logger.warning("FastAPI process already running")
             return
             
+        if self.transport == "inprocess":
+            self._start_inprocess()
+            return
+            
         logger.info(f"Starting FastAPI server process on {self.host}:{self.port}")
         
         # Start the server process with Windows-specific handling
         if platform.system() == "Windows":
             # On Windows, use threading instead of multiprocessing to avoid spawn issues
             import asyncio
-            import threading
             
             def run_in_thread():
                 # Create new event loop for this thread
@@ -670,24 +792,13 @@ class FastAPIProcessManager:
                     # Create the FastAPI app
                     app = create_fastapi_app(self.request_queue, self.response_queue, self.broadcast_queue, self.config)
                     
-                    # Determine uvicorn log level based on PLua config
-                    plua_log_level = self.config.get("loglevel", "INFO").upper()
-                    if plua_log_level in ["CRITICAL", "ERROR"]:
-                        uvicorn_log_level = "error"
-                    elif plua_log_level == "WARNING":
-                        uvicorn_log_level = "warning"  
-                    elif plua_log_level == "INFO":
-                        uvicorn_log_level = "error"  # Hide uvicorn startup messages unless explicitly requested
-                    else:  # DEBUG
-                        uvicorn_log_level = "info"
-                    
                     # Run with uvicorn
                     import uvicorn
                     uvicorn.run(
                         app,
                         host=self.host,
                         port=self.port,
-                        log_level=uvicorn_log_level,
+                        log_level=_uvicorn_log_level(self.config),
                         access_log=False
                     )
                 except Exception as e:
@@ -712,13 +823,56 @@ class FastAPIProcessManager:
         
         self.running = True
         
-        # Start IPC message handler in a thread
-        import threading
+        # Start IPC message handler in a thread, with its worker pool
+        self._workers = ThreadPoolExecutor(max_workers=self.max_inflight, thread_name_prefix="plua-ipc")
         self.ipc_thread = threading.Thread(target=self._handle_ipc_messages, daemon=True)
         self.ipc_thread.start()
         
         logger.info("FastAPI server started successfully")
         
+    def _start_inprocess(self):
+        """Serve the API from the calling (engine) event loop, without IPC"""
+        logger.info(f"Starting in-process FastAPI server on {self.host}:{self.port}")
+        self._loop = asyncio.get_running_loop()
+        self._workers = ThreadPoolExecutor(max_workers=self.max_inflight, thread_name_prefix="plua-api")
+        self._app = create_fastapi_app(None, None, None, self.config, request_handler=self._handle_request_async)
+        self._server = _EmbeddedServer(uvicorn.Config(
+            self._app,
+            host=self.host,
+            port=self.port,
+            log_level=_uvicorn_log_level(self.config),
+            access_log=False
+        ))
+        self._server_task = self._loop.create_task(self._server.serve())
+        self.running = True
+        
+    async def _handle_request_async(self, message_type: str, data: dict[str, Any]) -> dict[str, Any]:
+        """In-process request handler.
+        
+        `/api/*` calls await `fibaro_callback_async` on this loop when it is
+        set. Everything else runs the blocking callback on a worker thread:
+        those wait on the engine's dispatch queue, which this loop drains, so
+        they must not run on the loop thread itself. The pool size is the
+        max_inflight cap; further requests wait for a worker.
+        """
+        if message_type == "fibaro_api" and self.fibaro_callback_async:
+            try:
+                return self._fibaro_response(*await self.fibaro_callback_async(
+                    data["method"],
+                    data["path"],
+                    data["data"]
+                ))
+            except Exception as e:
+                return {"success": False, "error": str(e), "status_code": 500}
+        return await asyncio.get_running_loop().run_in_executor(
+            self._workers, self._handle_request, message_type, data
+        )
+        
+    async def wait_closed(self, timeout: float = 5.0):
+        """In-process mode: wait for uvicorn to finish shutting down after stop()"""
+        if self._server_task and not self._server_task.done():
+            await asyncio.wait({self._server_task}, timeout=timeout)
+        
     def stop(self):
         """Stop the FastAPI server process/thread"""
         if not self.running:
@@ -726,8 +880,13 @@ class FastAPIProcessManager:
             
         logger.info("Stopping FastAPI server...")
         self.running = False
+        if self._workers:
+            self._workers.shutdown(wait=False, cancel_futures=True)
         
-        if platform.system() == "Windows":
+        if self.transport == "inprocess":
+            if self._server:
+                self._server.should_exit = True
+        elif platform.system() == "Windows":
             # On Windows, we're using threading - daemon threads will die with main process
             if hasattr(self, 'server_thread') and self.server_thread.is_alive():
                 logger.info("FastAPI thread will terminate with main process")
@@ -740,147 +899,174 @@ class FastAPIProcessManager:
                 if self.server_process.is_alive():
                     logger.warning("Force killing FastAPI process")
                     self.server_process.kill()
+                    
+            for channel in (self.request_queue, self.response_queue, self.broadcast_queue):
+                if isinstance(channel, FramedChannel):
+                    channel.close()
                 
         logger.info("FastAPI server process stopped")
         
     def _handle_ipc_messages(self):
-        """Handle IPC messages from the FastAPI process"""
-        logger.info("IPC message handler started")
+        """Read IPC messages from the FastAPI process and hand them to the worker pool.
+        
+        Up to max_inflight messages are processed concurrently, so a slow hook
+        call doesn't hold up other requests; responses go back as they complete
+        and the FastAPI side matches them up by message id. When the cap is
+        reached, reading pauses and further requests wait in the request queue.
+        """
+        logger.info(f"IPC message handler started (max {self.max_inflight} in flight)")
         
         while self.running:
+            if not self._inflight.acquire(timeout=1.0):
+                continue
             try:
                 # Get message from FastAPI process
-                message_data = self.request_queue.get(timeout=1.0)
-                message = IPCMessage(**message_data)
-                
-                # Process the message
-                response_data = None
+                # Plain dict in the IPCMessage layout; it comes from our own
+                # send_ipc_request(), so there is no model validation here
+                message = self.request_queue.get(timeout=1.0)
+                future = self._workers.submit(self._process_ipc_message, message)  # pyright: ignore[reportOptionalMemberAccess]
+                future.add_done_callback(lambda _: self._inflight.release())
+            except queue.Empty:
+                self._inflight.release()
+            except Exception as e:
+                self._inflight.release()
+                if self.running:  # else the channel was closed by stop()
+                    logger.error(f"IPC message handling error: {e}")
                 
-                if message.type == "execute" and self.lua_executor:
-                    # Execute Lua code
-                    data = message.data
-                    try:
-                        result = self.lua_executor(data["code"], data.get("timeout", 30.0))
-                        response_data = {"success": True, **result}
-                    except Exception as e:
-                        response_data = {"success": False, "error": str(e)}
-                        
-                elif message.type == "fibaro_api":
-                    # Always handle Fibaro API call - hook will determine response
-                    data = message.data
-                    try:
-                        if self.fibaro_callback:
-                            # Call the hook function
-                            hook_result, status_code = self.fibaro_callback(
-                                data["method"], 
-                                data["path"], 
-                                json.dumps(data["data"]) if data["data"] else None
-                            )
-                            
-                            # Handle the hook response - pass through status code
-                            if status_code == 200:
-                                response_data = {
-                                    "success": True, 
-                                    "data": hook_result,
-                                    "status_code": 200
-                                }
-                            else:
-                                # Non-200 status code - this will trigger HTTPException in FastAPI
-                                response_data = {
-                                    "success": True,  # IPC succeeded 
-                                    "data": hook_result,
-                                    "status_code": status_code
-                                }
-                        else:
-                            # No callback set - this shouldn't happen but handle gracefully
-                            response_data = {
-                                "success": False, 
-                                "error": "Fibaro callback not set", 
-                                "status_code": 503
-                            }
-                    except Exception as e:
-                        response_data = {"success": False, "error": str(e), "status_code": 500}
-                        
-                elif message.type == "quickapp_info":
-                    # Get specific QuickApp info
-                    data = message.data
-                    qa_id = data.get("qa_id")
-                    logger.info(f"🔧 IPC QuickApp info request: QA {qa_id}")
-                    try:
-                        if self.quickapp_callback:
-                            logger.info(f"🔧 Calling quickapp_callback for QA {qa_id}")
-                            cb = self.quickapp_callback
-                            qa_result = cb("get_quickapp", qa_id)  # pyright: ignore[reportOptionalCall]
-                            if qa_result.get("success"):
-                                qa_info = self._convert_lua_objects(qa_result["data"])
-                                logger.info(f"🔧 QuickApp info found: {qa_info}")
-                                response_data = {"success": True, "data": qa_info}
-                            else:
-                                reason = qa_result.get("reason", "unknown")
-                                err_msg = qa_result.get("error", f"QuickApp {qa_id} not found")
-                                if reason == "timeout":
-                                    logger.warning(f"🔧 QuickApp {qa_id}: Lua engine busy (cross-thread execution timed out)")
-                                elif reason == "queue_full":
-                                    logger.warning(f"🔧 QuickApp {qa_id}: Lua execution queue full")
-                                elif reason == "not_found":
-                                    logger.warning(f"🔧 QuickApp {qa_id} not found in Lua DIR (QA may still be initializing)")
-                                elif reason == "lua_error":
-                                    logger.warning(f"🔧 QuickApp {qa_id}: Lua error — {err_msg}")
-                                else:
-                                    logger.warning(f"🔧 QuickApp {qa_id}: {err_msg}")
-                                response_data = {"success": False, "error": err_msg}
+        logger.info("IPC message handler stopped")
+        
+    def _process_ipc_message(self, message: dict[str, Any]):
+        """Run one IPC request on a worker thread and post its response"""
+        try:
+            response_data = self._handle_request(message["type"], message["data"])
+            
+            # Send response back
+            response = {
+                "id": message["id"],
+                "type": "response",
+                "data": response_data,
+                "timestamp": time.time()
+            }
+            
+            self.response_queue.put(response, timeout=1.0)
+        except Exception as e:
+            logger.error(f"IPC message handling error: {e}")
+        
+    def _handle_request(self, message_type: str, data: dict[str, Any]) -> dict[str, Any]:
+        """Run the callback for one API request and return its response data (blocking)"""
+        response_data = None
+        
+        if message_type == "execute" and self.lua_executor:
+            # Execute Lua code
+            try:
+                result = self.lua_executor(data["code"], data.get("timeout", 30.0))
+                response_data = {"success": True, **result}
+            except Exception as e:
+                response_data = {"success": False, "error": str(e)}
+        
+        elif message_type == "fibaro_api":
+            # Always handle Fibaro API call - hook will determine response
+            try:
+                if self.fibaro_callback:
+                    # Call the hook function
+                    response_data = self._fibaro_response(*self.fibaro_callback(
+                        data["method"], 
+                        data["path"], 
+                        data["data"]
+                    ))
+                else:
+                    # No callback set - this shouldn't happen but handle gracefully
+                    response_data = {
+                        "success": False, 
+                        "error": "Fibaro callback not set", 
+                        "status_code": 503
+                    }
+            except Exception as e:
+                response_data = {"success": False, "error": str(e), "status_code": 500}
+        
+        elif message_type == "quickapp_info":
+            # Get specific QuickApp info
+            qa_id = data.get("qa_id")
+            logger.info(f"🔧 IPC QuickApp info request: QA {qa_id}")
+            try:
+                if self.quickapp_callback:
+                    logger.info(f"🔧 Calling quickapp_callback for QA {qa_id}")
+                    cb = self.quickapp_callback
+                    qa_result = cb("get_quickapp", qa_id)  # pyright: ignore[reportOptionalCall]
+                    if qa_result.get("success"):
+                        qa_info = self._convert_lua_objects(qa_result["data"])
+                        logger.info(f"🔧 QuickApp info found: {qa_info}")
+                        response_data = {"success": True, "data": qa_info}
+                    else:
+                        reason = qa_result.get("reason", "unknown")
+                        err_msg = qa_result.get("error", f"QuickApp {qa_id} not found")
+                        if reason == "timeout":
+                            logger.warning(f"🔧 QuickApp {qa_id}: Lua engine busy (cross-thread execution timed out)")
+                        elif reason == "queue_full":
+                            logger.warning(f"🔧 QuickApp {qa_id}: Lua execution queue full")
+                        elif reason == "not_found":
+                            logger.warning(f"🔧 QuickApp {qa_id} not found in Lua DIR (QA may still be initializing)")
+                        elif reason == "lua_error":
+                            logger.warning(f"🔧 QuickApp {qa_id}: Lua error — {err_msg}")
                         else:
-                            logger.error("🔧 QuickApp callback not set!")
-                            response_data = {"success": False, "error": "QuickApp callback not set"}
-                    except Exception as e:
-                        logger.error(f"🔧 QuickApp callback error: {e}")
-                        response_data = {"success": False, "error": str(e)}
-                        
-                elif message.type == "all_quickapps_info":
-                    # Get all QuickApps info
-                    logger.info("🔧 IPC All QuickApps info request")
-                    try:
-                        if self.quickapp_callback:
-                            logger.info("🔧 Calling quickapp_callback for all QAs")
-                            cb = self.quickapp_callback
-                            qa_result = cb("get_all_quickapps")  # pyright: ignore[reportOptionalCall]
-                            all_qas = self._convert_lua_objects(qa_result.get("data", []))
-                            if qa_result.get("success"):
-                                logger.info(f"🔧 All QuickApps found: {all_qas}")
-                                response_data = {"success": True, "data": all_qas}
-                            else:
-                                reason = qa_result.get("reason", "unknown")
-                                if reason == "timeout":
-                                    logger.warning("🔧 All QuickApps: Lua engine busy (cross-thread execution timed out)")
-                                else:
-                                    logger.warning(f"🔧 All QuickApps: {qa_result.get('error', 'unknown error')}")
-                                response_data = {"success": True, "data": all_qas}
+                            logger.warning(f"🔧 QuickApp {qa_id}: {err_msg}")
+                        response_data = {"success": False, "error": err_msg}
+                else:
+                    logger.error("🔧 QuickApp callback not set!")
+                    response_data = {"success": False, "error": "QuickApp callback not set"}
+            except Exception as e:
+                logger.error(f"🔧 QuickApp callback error: {e}")
+                response_data = {"success": False, "error": str(e)}
+        
+        elif message_type == "all_quickapps_info":
+            # Get all QuickApps info
+            logger.info("🔧 IPC All QuickApps info request")
+            try:
+                if self.quickapp_callback:
+                    logger.info("🔧 Calling quickapp_callback for all QAs")
+                    cb = self.quickapp_callback
+                    qa_result = cb("get_all_quickapps")  # pyright: ignore[reportOptionalCall]
+                    all_qas = self._convert_lua_objects(qa_result.get("data", []))
+                    if qa_result.get("success"):
+                        logger.info(f"🔧 All QuickApps found: {all_qas}")
+                        response_data = {"success": True, "data": all_qas}
+                    else:
+                        reason = qa_result.get("reason", "unknown")
+                        if reason == "timeout":
+                            logger.warning("🔧 All QuickApps: Lua engine busy (cross-thread execution timed out)")
                         else:
-                            logger.error("🔧 QuickApp callback not set!")
-                            response_data = {"success": False, "error": "QuickApp callback not set"}
-                    except Exception as e:
-                        logger.error(f"🔧 QuickApp callback error: {e}")
-                        response_data = {"success": False, "error": str(e)}
-                        
+                            logger.warning(f"🔧 All QuickApps: {qa_result.get('error', 'unknown error')}")
+                        response_data = {"success": True, "data": all_qas}
                 else:
-                    response_data = {"success": False, "error": "Unknown message type or no handler"}
-                
-                # Send response back
-                response = {
-                    "id": message.id,
-                    "type": "response",
-                    "data": response_data,
-                    "timestamp": time.time()
-                }
-                
-                self.response_queue.put(response, timeout=1.0)
-                
-            except queue.Empty:
-                continue
+                    logger.error("🔧 QuickApp callback not set!")
+                    response_data = {"success": False, "error": "QuickApp callback not set"}
             except Exception as e:
-                logger.error(f"IPC message handling error: {e}")
-                
-        logger.info("IPC message handler stopped")
+                logger.error(f"🔧 QuickApp callback error: {e}")
+                response_data = {"success": False, "error": str(e)}
+        
+        elif message_type == "registry" and self.registry_callback:
+            try:
+                response_data = self.registry_callback(data.get("traceback", False))
+            except Exception as e:
+                response_data = {"success": False, "error": str(e)}
+        
+        else:
+            response_data = {"success": False, "error": "Unknown message type or no handler"}
+        
+        return response_data
+        
+    @staticmethod
+    def _fibaro_response(hook_result: Any, status_code: int, encoded: bool = False) -> dict[str, Any]:
+        """Response data for a hook result; a non-200 status code becomes an HTTPException in FastAPI.
+        
+        With `encoded` the hook result is JSON text, returned to the client as-is.
+        """
+        return {
+            "success": True,  # IPC succeeded
+            "data": hook_result,
+            "status_code": status_code,
+            "encoded": encoded
+        }
         
     def broadcast_view_update(self, qa_id: int, element_id: str, property_name: str, value: Any) -> bool:
         """Send a WebSocket broadcast request via IPC"""
@@ -891,6 +1077,13 @@ class FastAPIProcessManager:
                 
             # Convert LuaTable objects before sending via IPC
             converted_value = self._convert_lua_objects(value)
+            
+            if self.transport == "inprocess":
+                asyncio.run_coroutine_threadsafe(
+                    self._app.state.broadcast_to_websockets(qa_id, element_id, property_name, converted_value),  # pyright: ignore[reportOptionalMemberAccess]
+                    self._loop  # pyright: ignore[reportArgumentType]
+                )
+                return True
                 
             # Queue the WebSocket broadcast request
             broadcast_data = {
@@ -905,16 +1098,22 @@ class FastAPIProcessManager:
                 "timestamp": time.time()
             }
             
-            self.broadcast_queue.put(broadcast_data)
+            # Called on the engine loop: never wait for room, a UI update is best effort
+            self.broadcast_queue.put(broadcast_data, timeout=0)
             return True
             
+        except queue.Full:
+            logger.warning("WebSocket broadcast dropped: IPC broadcast channel full")
+            return False
         except Exception as e:
             logger.error(f"Error queuing WebSocket broadcast: {e}")
             return False
         
     def is_running(self) -> bool:
         """Check if the FastAPI process/thread is running"""
-        if platform.system() == "Windows":
+        if self.transport == "inprocess":
+            return bool(self.running and self._server_task and not self._server_task.done())
+        elif platform.system() == "Windows":
             # On Windows, check thread instead of process
             return self.running and hasattr(self, 'server_thread') and self.server_thread.is_alive()
         else:
@@ -0,0 +1,173 @@
+"""
+Framed Unix-socket channel for IPC between the main process and the FastAPI subprocess.
+
+`FramedChannel` is a drop-in for the one-directional `multiprocessing.Queue`s
+used by `FastAPIProcessManager` (`put`, `get(timeout)`, `get_nowait`, raising
+`queue.Empty`). Each message is `marshal`-encoded behind a 4-byte big-endian
+length prefix on one end of a `socket.socketpair()`. `put()` writes from the
+calling thread, so there is no pickling and no feeder thread to wake.
+
+The sending socket is non-blocking. `put(timeout)` raises `queue.Full` if the
+frame cannot be started in time (the reader has stopped and the socket buffer
+is full); a frame that has started is always finished, since abandoning it
+would corrupt the stream. Event-loop callers use `put_async()`, which sends
+in place when there is room and otherwise finishes on a worker thread.
+
+marshal only handles plain built-in types, which is what the IPC messages are
+(dicts/lists/strings/numbers from JSON or `lua_to_python_table`); anything else
+is passed through JSON first (`default=str`), as the HTTP response would be.
+Both ends are the same interpreter, so marshal's version-specific format is fine.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import marshal
+import queue
+import select
+import socket
+import struct
+import threading
+import time
+from typing import Any
+
+_HEADER = struct.Struct("!I")
+_RECV_SIZE = 1 << 16
+
+
+def _encode(message: Any) -> bytes:
+    try:
+        return marshal.dumps(message)
+    except ValueError:
+        return marshal.dumps(json.loads(json.dumps(message, default=str)))
+
+
+class FramedChannel:
+    """One-directional, length-prefixed message channel over a Unix socket pair."""
+
+    def __init__(self):
+        self._send_sock, self._recv_sock = socket.socketpair()
+        self._init_local()
+
+    def _init_local(self) -> None:
+        self._send_sock.setblocking(False)
+        self._send_lock = threading.Lock()
+        self._recv_lock = threading.Lock()
+        self._buffer = bytearray()
+
+    def __getstate__(self) -> dict[str, Any]:
+        # Sockets are handed over by multiprocessing's reducer (spawn/forkserver)
+        return {"_send_sock": self._send_sock, "_recv_sock": self._recv_sock}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._init_local()
+
+    @staticmethod
+    def _frame(message: Any) -> bytes:
+        body = _encode(message)
+        return _HEADER.pack(len(body)) + body
+
+    def _send_some(self, frame: memoryview) -> int:
+        try:
+            return self._send_sock.send(frame)
+        except BlockingIOError:
+            return 0
+
+    def _wait_writable(self, timeout: float | None) -> bool:
+        return bool(select.select([], [self._send_sock], [], timeout)[1])
+
+    def _finish(self, frame: memoryview, sent: int) -> None:
+        """Write the rest of a started frame (waiting as long as it takes), then release the send lock."""
+        try:
+            while sent < len(frame):
+                sent += self._send_some(frame[sent:])
+                if sent < len(frame):
+                    self._wait_writable(None)
+        finally:
+            self._send_lock.release()
+
+    def _put_frame(self, frame: bytes, timeout: float | None) -> None:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if not self._send_lock.acquire(timeout=-1 if timeout is None else max(0.0, timeout)):
+            raise queue.Full
+        view = memoryview(frame)
+        try:
+            while True:
+                sent = self._send_some(view)
+                if sent:
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0 or not self._wait_writable(remaining):
+                    raise queue.Full
+        except BaseException:
+            self._send_lock.release()
+            raise
+        self._finish(view, sent)
+
+    def put(self, message: Any, timeout: float | None = None) -> None:
+        """Send one message; safe to call from several threads. Raises queue.Full if not started within `timeout`."""
+        self._put_frame(self._frame(message), timeout)
+
+    async def put_async(self, message: Any, timeout: float | None = None) -> None:
+        """put() for event-loop callers: never blocks the loop, waiting is done on a worker thread."""
+        frame = self._frame(message)
+        loop = asyncio.get_running_loop()
+        if self._send_lock.acquire(blocking=False):
+            view = memoryview(frame)
+            try:
+                sent = self._send_some(view)
+            except BaseException:
+                self._send_lock.release()
+                raise
+            if sent == len(frame):
+                self._send_lock.release()
+                return
+            if sent:
+                # Started: a worker finishes the frame and releases the lock
+                await loop.run_in_executor(None, self._finish, view, sent)
+                return
+            self._send_lock.release()
+        await loop.run_in_executor(None, self._put_frame, frame, timeout)
+
+    def _pop_frame(self) -> tuple[bool, Any]:
+        buffer = self._buffer
+        if len(buffer) < _HEADER.size:
+            return False, None
+        end = _HEADER.size + _HEADER.unpack_from(buffer)[0]
+        if len(buffer) < end:
+            return False, None
+        message = marshal.loads(memoryview(buffer)[_HEADER.size:end])
+        del buffer[:end]
+        return True, message
+
+    def get(self, block: bool = True, timeout: float | None = None) -> Any:
+        """Receive one message, raising queue.Empty if none arrives within `timeout` seconds."""
+        if not block:
+            timeout = 0.0
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._recv_lock:
+            while True:
+                found, message = self._pop_frame()
+                if found:
+                    return message
+                # settimeout(0.0) makes recv non-blocking
+                self._recv_sock.settimeout(None if deadline is None else max(0.0, deadline - time.monotonic()))
+                try:
+                    chunk = self._recv_sock.recv(_RECV_SIZE)
+                except (TimeoutError, BlockingIOError):
+                    raise queue.Empty from None
+                if not chunk:
+                    raise EOFError("IPC channel closed")
+                self._buffer += chunk
+
+    def get_nowait(self) -> Any:
+        return self.get(block=False)
+
+    def close(self) -> None:
+        for sock in (self._send_sock, self._recv_sock):
+            try:
+                sock.close()
+            except OSError:
+                pass
@@ -12,8 +12,11 @@ import socket
 import subprocess
 from collections.abc import Callable
 from functools import wraps
+from itertools import compress
 from typing import Any
 
+from lupa import LuaError, lua_type
+
 logger = logging.getLogger(__name__)
 
 # Registry for decorated functions
@@ -41,8 +44,49 @@ def get_global_engine():
 _MAX_TABLE_DEPTH = 100
 
 
-def _is_lua_table(obj: Any) -> bool:
-    return hasattr(obj, '__class__') and 'lua' in str(obj.__class__).lower()
+# Keys and values of these types are returned by Lupa as-is.
+_PY_SCALAR_TYPES = frozenset((str, int, float, bool, type(None)))
+
+# Returns n, t[1], ..., t[n] when the keys of t are exactly 1..n, else nil,
+# so a sequence crosses into Python in one call instead of one per element.
+# Bounded by Lua's stack limit; larger sequences are iterated.
+_SEQUENCE_VALUES_LUA = """
+local rawlen, next, unpack, mtype = rawlen, next, table.unpack, math.type
+return function(t)
+  local n, count = rawlen(t), 0
+  if n > 100000 then return nil end
+  for k in next, t do
+    if mtype(k) ~= "integer" or k < 1 or k > n then return nil end
+    count = count + 1
+  end
+  if count ~= n then return nil end
+  return n, unpack(t, 1, n)
+end
+"""
+_sequence_values: tuple[Any, Callable] | None = None  # (LuaRuntime, compiled function)
+
+
+def _sequence_values_of(lua_table: Any) -> tuple | None:
+    """`(n, t[1], ..., t[n])` for a sequence, else None (also without an engine or for another runtime's table)."""
+    global _sequence_values
+    if _global_engine is None:
+        return None
+    lua = _global_engine._lua
+    if _sequence_values is None or _sequence_values[0] is not lua:
+        _sequence_values = (lua, lua.execute(_SEQUENCE_VALUES_LUA))
+    try:
+        return _sequence_values[1](lua_table)
+    except LuaError:
+        # Tables from another LuaRuntime cannot be passed to this one; iterate them instead
+        return None
+
+
+def _event_coalesce_key(event: Any) -> Any:
+    """Key for refreshStates events that only carry a latest value (property updates)."""
+    if isinstance(event, dict) and event.get('type') == 'DevicePropertyUpdatedEvent':
+        data = event.get('data') or {}
+        return ('DevicePropertyUpdatedEvent', data.get('id'), data.get('property'))
+    return None
 
 
 def _decode_bytes(b: bytes) -> str:
@@ -52,13 +96,28 @@ def _decode_bytes(b: bytes) -> str:
         return b.decode('utf-8', errors='replace')
 
 
+class _ContainerTypes(dict):
+    """type -> whether python_to_lua_table converts it to a table (dict, list, tuple and subclasses)."""
+
+    def __missing__(self, cls: type) -> bool:
+        is_container = self[cls] = issubclass(cls, (dict, list, tuple))
+        return is_container
+
+
+# Looked up through map() so that scanning a container's values for nested
+# containers runs at C speed, without a Python-level loop per value.
+_is_container_type = _ContainerTypes().__getitem__
+
+
 def python_to_lua_table(data: Any) -> Any:
     """
     Convert Python data structures to Lua tables using Lupa.
 
-    Cycles are detected by walking `data` first; if any cycle is found, the
-    converter raises `ValueError` rather than letting Lupa recurse into a
-    stack overflow. Callers should not pass self-referential structures.
+    One pass with an explicit stack: a container without nested containers
+    becomes a table with a single `table_from()` call; any other container
+    is copied shallowly, and its nested containers are replaced by their
+    tables as the walk unwinds. Cycles and nesting deeper than
+    `_MAX_TABLE_DEPTH` are detected on the way down and raise `ValueError`.
     """
     if _global_engine is None:
         raise RuntimeError("Global engine not set. Call set_global_engine() first.")
@@ -66,25 +125,43 @@ def python_to_lua_table(data: Any) -> Any:
     if not isinstance(data, (dict, list)):
         return data
 
-    # Cycle check before handing off to Lupa's C-level recursive converter
-    # (Lupa has no cycle protection and will stack-overflow on cyclic data).
-    def _check(obj: Any, seen: set[int], depth: int) -> None:
-        if depth > _MAX_TABLE_DEPTH:
-            raise ValueError(f"python_to_lua_table: depth limit ({_MAX_TABLE_DEPTH}) exceeded")
-        if isinstance(obj, (dict, list)):
-            oid = id(obj)
-            if oid in seen:
-                raise ValueError("python_to_lua_table: cycle detected in input")
-            seen.add(oid)
-            try:
-                values = obj.values() if isinstance(obj, dict) else obj
-                for v in values:
-                    _check(v, seen, depth + 1)
-            finally:
-                seen.discard(oid)
+    table_from = _global_engine._lua.table_from
 
-    _check(data, set(), 0)
-    return _global_engine._lua.table_from(data, recursive=True)
+    def flags(node: Any) -> list[bool]:
+        return list(map(_is_container_type, map(type, node.values() if isinstance(node, dict) else node)))
+
+    def frame(node: Any, nested: list[bool], key: Any) -> tuple:
+        # (node, shallow copy, (key, child) pairs still to visit, key in the parent's copy)
+        if isinstance(node, dict):
+            return node, dict(node), compress(node.items(), nested), key
+        return node, list(node), compress(enumerate(node), nested), key
+
+    nested = flags(data)
+    if not any(nested):
+        return table_from(data)
+    stack = [frame(data, nested, None)]
+    on_path = {id(data)}
+    while True:
+        node, copy, pending, key = stack[-1]
+        for child_key, child in pending:
+            nested = flags(child)
+            if not any(nested):
+                copy[child_key] = table_from(child)
+                continue
+            if id(child) in on_path:
+                raise ValueError("python_to_lua_table: cycle detected in input")
+            if len(stack) >= _MAX_TABLE_DEPTH:
+                raise ValueError(f"python_to_lua_table: depth limit ({_MAX_TABLE_DEPTH}) exceeded")
+            on_path.add(id(child))
+            stack.append(frame(child, nested, child_key))
+            break
+        else:
+            stack.pop()
+            on_path.discard(id(node))
+            table = table_from(copy)
+            if not stack:
+                return table
+            stack[-1][1][key] = table
 
 
 def lua_to_python_table(lua_table: Any) -> Any:
@@ -105,11 +182,15 @@ def _lua_to_python(lua_table: Any, seen: set[int], depth: int) -> Any:
         logger.warning("lua_to_python_table: depth limit exceeded; truncating")
         return "<max-depth>"
 
-    if isinstance(lua_table, bytes):
-        return _decode_bytes(lua_table)
-
-    if not _is_lua_table(lua_table):
+    cls = type(lua_table)
+    if cls in _PY_SCALAR_TYPES:
         return lua_table
+    if cls is bytes:
+        return _decode_bytes(lua_table)
+    kind = lua_type(lua_table)
+    if kind != "table":
+        # Functions, userdata and coroutines become their description
+        return lua_table if kind is None else str(lua_table)
 
     oid = id(lua_table)
     if oid in seen:
@@ -117,31 +198,41 @@ def _lua_to_python(lua_table: Any, seen: set[int], depth: int) -> Any:
     seen.add(oid)
 
     try:
-        temp_dict: dict[Any, Any] = {}
-        for key, value in lua_table.items():
-            if isinstance(key, bytes):
-                python_key = _decode_bytes(key)
-            elif _is_lua_table(key):
-                python_key = _lua_to_python(key, seen, depth + 1)
-            else:
-                python_key = key
-
-            if isinstance(value, bytes):
-                python_value = _decode_bytes(value)
-            elif _is_lua_table(value):
-                python_value = _lua_to_python(value, seen, depth + 1)
-            else:
-                python_value = value
+        # Short sequences and records are cheaper to iterate
+        sequence = _sequence_values_of(lua_table) if len(lua_table) >= 16 else None
+        if sequence is not None:
+            values = list(sequence[1:])
+            if _PY_SCALAR_TYPES.issuperset(map(type, values)):
+                return values
+            return [
+                v if type(v) in _PY_SCALAR_TYPES else _lua_to_python(v, seen, depth + 1)
+                for v in values
+            ]
 
-            temp_dict[python_key] = python_value
-
-        # Detect Lua array shape (consecutive integer keys starting from 1).
-        if temp_dict and all(isinstance(k, (int, float)) and k > 0 for k in temp_dict.keys()):
-            keys = sorted([int(k) for k in temp_dict.keys()])
-            if keys == list(range(1, len(keys) + 1)):
-                return [temp_dict[k] for k in keys]
+        # Keys 1, 2, 3... in iteration order (Lua's array part) fill `items`;
+        # the first other key switches to a dict.
+        items: list[Any] = []
+        result: dict[Any, Any] | None = None
+        for key, value in lua_table.items():
+            if type(key) not in _PY_SCALAR_TYPES:
+                key = _lua_to_python(key, seen, depth + 1)
+            if type(value) not in _PY_SCALAR_TYPES:
+                value = _lua_to_python(value, seen, depth + 1)
+            if result is None:
+                if type(key) is int and key == len(items) + 1:
+                    items.append(value)
+                    continue
+                result = dict(enumerate(items, 1))
+            result[key] = value
 
-        return temp_dict
+        if result is None:
+            return items if items else {}
+        # A sequence stored out of order (e.g. in the hash part): n distinct
+        # integer keys between 1 and n.
+        n = len(result)
+        if all(type(k) is int for k in result) and min(result) == 1 and max(result) == n:
+            return [result[i] for i in range(1, n + 1)]
+        return result
     except Exception as e:
         logger.warning(f"Error converting Lua table: {e}")
         return str(lua_table)
@@ -212,32 +303,91 @@ class LuaBindings:
     def _setup_exported_functions(self):
         """Setup exported functions with access to self."""
         # Timer functions
+        def timer_expired(callback_id: int) -> None:
+            """Callback that notifies Lua when timer expires."""
+            try:
+                # Call back into Lua
+                self.engine._lua.globals()["_PY"]["timerExpired"](callback_id)
+            except Exception as e:
+                logger.error(f"Error in timeout callback {callback_id}: {e}")
+
+        def timers_expired(batch: list[tuple]) -> None:
+            """All Lua timers of one wakeup -> one _PY.timerExpiredBatch call."""
+            if len(batch) == 1:
+                timer_expired(*batch[0])
+                return
+            flat: list[Any] = []
+            for (callback_id,) in batch:
+                flat += (callback_id, None, None)
+            try:
+                lua = self.engine._lua
+                lua.globals()["_PY"]["timerExpiredBatch"](lua.table_from(flat), len(batch))
+            except Exception as e:
+                logger.error(f"Error in batched timeout callbacks: {e}")
+
+        self.timer_manager.set_batch_handler(timer_expired, timers_expired)
+
+        def run_microtasks() -> None:
+            try:
+                self.engine._lua.globals()["_PY"]["runMicrotasks"]()
+            except Exception as e:
+                logger.error(f"Error running Lua microtasks: {e}")
+
+        @export_to_lua("schedule_microtasks")
+        def schedule_microtasks() -> None:
+            """Run the Lua nextTick queue on the next loop turn (see _PY.nextTick in init.lua)."""
+            import asyncio
+            asyncio.get_running_loop().call_soon(run_microtasks)
+
         @export_to_lua("set_timeout")
-        def set_timeout(callback_id: int, delay_ms: int) -> str:
+        def set_timeout(callback_id: int, delay_ms: int, slack_ms: float | None = None, realtime: bool = False) -> int:
             """
             Set a timeout timer from Lua.
             
             Args:
                 callback_id: ID of the Lua callback
                 delay_ms: Delay in milliseconds
+                slack_ms: How late the timer may run to share a wakeup (default: timer_slack_ms)
+                realtime: Follow the real clock even while simulating
                 
             Returns:
                 Python timer ID
             """
-            logger.debug(f"Setting timeout: {delay_ms}ms for callback {callback_id}")
+            return self.timer_manager.set_timeout(
+                delay_ms, timer_expired, callback_id, slack_ms=slack_ms, realtime=bool(realtime)
+            )
+        
+        @export_to_lua("set_interval")
+        def set_interval(callback_id: int, period_ms: int, policy: str = "skip", slack_ms: float | None = None) -> int:
+            """
+            Set a fixed-rate interval timer from Lua.
             
-            def python_callback():
-                """Callback that notifies Lua when timer expires."""
-                try:
-                    # Call back into Lua
-                    self.engine._lua.globals()["_PY"]["timerExpired"](callback_id)
-                except Exception as e:
-                    logger.error(f"Error in timeout callback {callback_id}: {e}")
-                    
-            return self.timer_manager.set_timeout(delay_ms, python_callback)
+            Args:
+                callback_id: ID of the persistent Lua callback run on every tick
+                period_ms: Period in milliseconds
+                policy: Overrun policy, "skip", "burst" or "delay"
+                slack_ms: How late each tick may run (default: timer_slack_ms)
+                
+            Returns:
+                Python timer ID (cancel with clear_timeout)
+            """
+            return self.timer_manager.set_interval(
+                period_ms, timer_expired, callback_id, policy=policy or "skip", slack_ms=slack_ms
+            )
+        
+        @export_to_lua("get_interval_stats")
+        def get_interval_stats(timer_id: int) -> Any:
+            """Get tick count and drift/jitter stats (ms) of an interval, or nil."""
+            stats = self.timer_manager.get_interval_stats(timer_id)
+            return python_to_lua_table(stats) if stats is not None else None
+        
+        @export_to_lua("get_timer_registry")
+        def get_timer_registry() -> Any:
+            """Live Python timers keyed by timer id (see AsyncTimerManager.list_timers)."""
+            return python_to_lua_table(self.timer_manager.list_timers())
         
         @export_to_lua("clear_timeout")
-        def clear_timeout(timer_id: str) -> bool:
+        def clear_timeout(timer_id: int) -> bool:
             """
             Clear a timeout timer from Lua.
             
@@ -247,13 +397,37 @@ class LuaBindings:
             Returns:
                 True if timer was cleared, False otherwise
             """
-            logger.debug(f"Clearing timeout: {timer_id}")
             return self.timer_manager.clear_timer(timer_id)
         
         @export_to_lua("get_timer_count")
         def get_timer_count() -> int:
             """Get the number of active timers."""
             return self.timer_manager.get_timer_count()
+
+        @export_to_lua("get_dispatch_stats")
+        def get_dispatch_stats() -> Any:
+            """Get per-lane depth/drop counters of the cross-thread dispatcher."""
+            return python_to_lua_table(self.engine.get_dispatch_stats())
+
+        @export_to_lua("set_activity")
+        def set_activity(active: bool) -> None:
+            """Called by init.lua when pending callbacks/intervals go from zero to non-zero or back."""
+            self.engine.set_activity(active)
+
+        @export_to_lua("set_callback_owner")
+        def set_callback_owner(callback_id: int, owner: Any) -> None:
+            """Attribute a callback to the QuickApp that registered it."""
+            self.engine.set_callback_owner(callback_id, owner)
+
+        @export_to_lua("clear_callback_owner")
+        def clear_callback_owner(callback_id: int) -> None:
+            """Forget the owner of a released callback."""
+            self.engine.clear_callback_owner(callback_id)
+
+        @export_to_lua("set_qa_weight")
+        def set_qa_weight(owner: Any, weight: float) -> None:
+            """Set a QuickApp's share of callback delivery (default 1.0)."""
+            self.engine.set_qa_weight(owner, weight)
         
         # Engine functions
         @export_to_lua("print")
@@ -302,6 +476,12 @@ class LuaBindings:
             import time
             return time.time()
         
+        @export_to_lua("monotonic")
+        def monotonic() -> float:
+            """Monotonic clock in seconds, for measuring elapsed time."""
+            import time
+            return time.monotonic()
+
         @export_to_lua("sleep")
         def sleep(seconds: float) -> None:
             """Sleep function (note: this is blocking, prefer timers for async)."""
@@ -414,9 +594,13 @@ class LuaBindings:
             import json
             try:
                 parsed_data = json.loads(json_string)
-                # Convert Python data to Lua-compatible format
-                lua_data = python_to_lua_table(parsed_data)
-                return lua_data, None
+                if not isinstance(parsed_data, (dict, list)):
+                    return parsed_data, None
+                # json.loads output has no cycles or shared values, and is
+                # never nested deeper than the interpreter's recursion limit
+                # (it raises RecursionError first), so the python_to_lua_table
+                # walk would find nothing: Lupa's converter runs on its own.
+                return self.engine._lua.table_from(parsed_data, recursive=True), None
             except json.JSONDecodeError as e:
                 return None, str(e)
             except Exception as e:
@@ -475,9 +659,27 @@ class LuaBindings:
         def milli_time() -> float:
             """
             Get the current time in seconds with milliseconds precision.
+            Follows the virtual clock while simulating (see start_simulation).
             """
-            import time
-            return time.time()
+            return self.timer_manager.wall_time()
+
+        @export_to_lua("start_simulation")
+        def start_simulation(seconds: float, start_epoch: float | None = None, callback_id: int | None = None) -> None:
+            """
+            Run timers on a virtual clock for `seconds` simulated seconds (see _PY.simulate).
+            
+            Args:
+                seconds: Simulated time span
+                start_epoch: Epoch time to start the virtual clock at (default: now)
+                callback_id: Lua callback to run when the span is over
+            """
+            on_end = None if callback_id is None else lambda: timer_expired(callback_id)
+            self.timer_manager.simulate(seconds, start_epoch, on_end)
+
+        @export_to_lua("is_simulating")
+        def is_simulating() -> bool:
+            """True while timers run on the virtual clock."""
+            return self.timer_manager.is_simulating()
         
         @export_to_lua("dotgetenv")
         def dotgetenv(key: str, default: str | None = None) -> str | None:
@@ -920,7 +1122,7 @@ class LuaBindings:
             """Deeply convert a Lua table (or plain dict) to a pure Python dict."""
             if isinstance(lua_table, dict):
                 return lua_table
-            elif hasattr(lua_table, '__class__') and 'lua' in str(lua_table.__class__).lower():
+            elif lua_type(lua_table) is not None:
                 # Use full recursive converter so no Lupa proxies survive into background threads
                 return lua_to_python_table(lua_table)
             elif hasattr(lua_table, 'items'):
@@ -1002,7 +1204,9 @@ class LuaBindings:
                 # Direct Lua calls from this background thread are unsafe (SIGSEGV/LuaIter race).
                 try:
                     event_json = event if isinstance(event, str) else json.dumps(event)
-                    self.engine.post_lua_call('newRefreshStatesEvent', event_json)
+                    self.engine.post_lua_call(
+                        'newRefreshStatesEvent', event_json, coalesce_key=_event_coalesce_key(event)
+                    )
                 except Exception:
                     # Silently ignore errors in event hook - don't break the queue
                     pass
@@ -0,0 +1,240 @@
+"""
+Worker side of `--shards` (see shards.py for the coordinator).
+
+A worker started with --shard-coordinator keeps the coordinator informed about
+its devices and refreshStates events, and asks it where devices it does not
+own live. The Lua side (fibaro/shard.lua) calls the functions exported here;
+outside shard mode none of them is used.
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from typing import Any
+
+import httpx
+
+from .lua_bindings import (
+    export_to_lua,
+    get_exported_functions,
+    lua_to_python_table,
+    python_to_lua_table,
+)
+from .shards import SHARD_CALL_TIMEOUT, device_ids_in
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between directory refreshes caused by unknown device ids
+_REFRESH_INTERVAL = 1.0
+# Seconds the coordinator holds an event poll open
+_POLL_WAIT = 25.0
+
+
+class ShardWorker:
+    """Connection from one worker process to the shard coordinator."""
+
+    def __init__(self, index: int, coordinator: str) -> None:
+        self.index = index
+        self.coordinator = coordinator.rstrip("/")
+        self.client = httpx.Client(timeout=SHARD_CALL_TIMEOUT)
+        self.local_ids: set[int] = set()
+        self.urls: list[str] = []
+        self.devices: dict[int, int] = {}
+        self._refreshed = 0.0
+        self._outbox: queue.Queue[tuple[str, Any]] = queue.Queue()
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        threading.Thread(target=self._send_loop, name="shard-sender", daemon=True).start()
+        threading.Thread(target=self._poll_loop, name="shard-events", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._outbox.put(("stop", None))
+
+    # Device directory
+
+    def publish_devices(self, ids: list[int]) -> None:
+        """Tell the coordinator that this shard owns exactly `ids`."""
+        self.local_ids = {int(i) for i in ids}
+        try:
+            self.client.post(
+                f"{self.coordinator}/plua/shards/devices",
+                json={"shard": self.index, "ids": sorted(self.local_ids)},
+            )
+        except httpx.HTTPError as e:
+            logger.warning(f"Shard {self.index}: cannot publish devices: {e}")
+
+    def refresh(self, force: bool = False) -> None:
+        """Fetch the coordinator's device directory, at most once per _REFRESH_INTERVAL unless forced."""
+        now = time.monotonic()
+        if not force and now - self._refreshed < _REFRESH_INTERVAL:
+            return
+        self._refreshed = now
+        try:
+            resp = self.client.get(f"{self.coordinator}/plua/shards")
+            data = resp.json()
+        except (httpx.HTTPError, ValueError) as e:
+            logger.debug(f"Shard {self.index}: cannot read shard directory: {e}")
+            return
+        self.urls = data["shards"]
+        self.devices = {int(k): v for k, v in data["devices"].items()}
+
+    def owner(self, ids: list[int]) -> int | None:
+        """Index of the other shard owning the first known of `ids`, None when local or unknown."""
+        for device_id in ids:
+            if device_id in self.local_ids:
+                return None
+            if device_id not in self.devices:
+                self.refresh()
+            shard = self.devices.get(device_id)
+            if shard is not None:
+                return shard if shard != self.index else None
+        return None
+
+    def call(self, shard: int, method: str, path: str, data: Any) -> tuple[Any, int]:
+        """Run a Fibaro API request on another shard. Returns (data, status) like api.get."""
+        try:
+            resp = self.client.request(method, f"{self.urls[shard]}/api{path}", json=data)
+        except httpx.HTTPError as e:
+            logger.warning(f"Shard {self.index}: {method} {path} on shard {shard} failed: {e}")
+            return None, 503
+        try:
+            body = resp.json() if resp.content else None
+        except ValueError:
+            body = resp.text
+        return body, resp.status_code
+
+    def remote_lists(self, path: str) -> list[Any]:
+        """Concatenated JSON list results of GET /api`path` on every other shard."""
+        self.refresh()
+        items: list[Any] = []
+        for shard, url in enumerate(self.urls):
+            if shard == self.index:
+                continue
+            try:
+                result = self.client.get(f"{url}/api{path}").json()
+            except (httpx.HTTPError, ValueError) as e:
+                logger.debug(f"Shard {self.index}: GET {path} on shard {shard} failed: {e}")
+                continue
+            if isinstance(result, list):
+                items.extend(result)
+        return items
+
+    # Events and UI updates
+
+    def publish_event(self, event: Any) -> None:
+        self._outbox.put(("event", event))
+
+    def broadcast(self, message: dict[str, Any]) -> None:
+        self._outbox.put(("broadcast", message))
+
+    def _send_loop(self) -> None:
+        held = None  # item taken off the queue while batching events
+        while not self._stop.is_set():
+            kind, payload = held or self._outbox.get()
+            held = None
+            if kind == "stop":
+                return
+            try:
+                if kind == "event":
+                    events = [payload]
+                    while held is None:  # batch whatever queued up meanwhile
+                        try:
+                            item = self._outbox.get_nowait()
+                        except queue.Empty:
+                            break
+                        if item[0] == "event":
+                            events.append(item[1])
+                        else:
+                            held = item
+                    self.client.post(
+                        f"{self.coordinator}/plua/shards/events", json={"shard": self.index, "events": events}
+                    )
+                else:
+                    self.client.post(f"{self.coordinator}/plua/shards/broadcast", json=payload)
+            except httpx.HTTPError as e:
+                logger.debug(f"Shard {self.index}: cannot reach coordinator: {e}")
+
+    def _poll_loop(self) -> None:
+        last = 0
+        while not self._stop.is_set():
+            try:
+                resp = self.client.get(
+                    f"{self.coordinator}/plua/shards/events",
+                    params={"shard": self.index, "last": last, "wait": _POLL_WAIT},
+                    timeout=_POLL_WAIT + SHARD_CALL_TIMEOUT,
+                )
+                data = resp.json()
+            except (httpx.HTTPError, ValueError) as e:
+                logger.debug(f"Shard {self.index}: event poll failed: {e}")
+                self._stop.wait(1.0)
+                continue
+            if data["events"]:
+                add_event = get_exported_functions().get("addEvent")
+                if add_event is None:  # engine not up yet: poll the same events again
+                    self._stop.wait(0.5)
+                    continue
+                for event in data["events"]:
+                    add_event(event)
+            last = data["last"]
+
+
+_worker: ShardWorker | None = None
+
+
+def start_shard_worker(index: int, coordinator: str) -> ShardWorker:
+    global _worker
+    _worker = ShardWorker(index, coordinator)
+    _worker.start()
+    return _worker
+
+
+def get_shard_worker() -> ShardWorker | None:
+    return _worker
+
+
+@export_to_lua("shard_publish_devices")
+def shard_publish_devices(ids: Any) -> bool:
+    """Publish the ids of the devices in this shard's Emu.DIR"""
+    if _worker is None:
+        return False
+    _worker.publish_devices(list(lua_to_python_table(ids) or []))
+    return True
+
+
+@export_to_lua("shard_call")
+def shard_call(method: str, path: str, data: Any = None) -> tuple[Any, ...]:
+    """
+    Run an api.* call on the shard owning the device it names.
+    Returns false when the device is local (or unknown), else true, data, status.
+    """
+    if _worker is None:
+        return (False,)
+    payload = lua_to_python_table(data) if data is not None else None
+    shard = _worker.owner(device_ids_in(path, payload))
+    if shard is None:
+        return (False,)
+    body, status = _worker.call(shard, method.upper(), path, payload)
+    return True, python_to_lua_table(body), status
+
+
+@export_to_lua("shard_remote_devices")
+def shard_remote_devices(path: str) -> Any:
+    """The devices other shards return for GET `path`, as a Lua list"""
+    if _worker is None:
+        return python_to_lua_table([])
+    return python_to_lua_table(_worker.remote_lists(path))
+
+
+@export_to_lua("shard_publish_event")
+def shard_publish_event(event_json: str) -> bool:
+    """Forward a refreshStates event raised in this shard to the others"""
+    if _worker is None:
+        return False
+    import json
+    _worker.publish_event(json.loads(event_json))
+    return True
@@ -0,0 +1,411 @@
+"""
+Multi-process QuickApp sharding for the CLI (`plua --fibaro --shards N a.lua b.lua ...`).
+
+One `LuaEngine` runs every QuickApp on a single asyncio loop, so a box hosting
+dozens of QAs uses one core. With `--shards N` the CLI instead acts as a
+coordinator: it splits the QA files round-robin over N worker processes, each a
+plain `plua` run with its own engine, prefixes their output with the shard
+number, stops them all together, and keeps them looking like one emulator:
+
+- Devices: each worker publishes the ids in its `Emu.DIR` to the coordinator's
+  registry (see shard_worker.py). Ids a worker assigns itself come from a
+  per-shard range, so they never collide.
+- API: the coordinator serves `--api-port`. `/api/*` and `/plua/quickApp/<id>`
+  requests go to the shard that owns the device named in the path, the
+  `deviceID`/`deviceId`/`parentId` query parameter or JSON body field.
+  `GET /api/devices` and `/plua/quickApp/info` merge all shards, and any
+  other request goes to shard 0 (or to `?shard=i`). Workers serve their own
+  API on 127.0.0.1, `--api-port + 1 + i`. A QA calling `api.*` for a device
+  in another shard is sent straight to that shard's API.
+- refreshStates: events raised in a shard are posted to the coordinator, and
+  every other shard long-polls them into its own event queue, so
+  `/refreshStates` and RefreshStateSubscriber see the events of all shards.
+- UI: view updates are posted to the coordinator, which pushes them to the
+  websocket clients connected to its `/ws`.
+
+Every other option is forwarded to each worker unchanged; options that cannot
+run once per worker (-e, -i, -l, --tool, --diagnostic, --no-api) are rejected.
+
+Cross-shard `api.*` calls are synchronous HTTP requests, like HC3 calls: two
+shards calling each other at the same moment both wait until one times out
+(SHARD_CALL_TIMEOUT). QAs that talk to each other a lot are best kept on one
+shard; file i goes to shard i mod N.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import signal
+import subprocess
+import sys
+import threading
+from collections import deque
+from typing import IO, Any
+from urllib.parse import parse_qsl
+
+logger = logging.getLogger(__name__)
+
+# Seconds a shard waits for another shard's API before giving up
+SHARD_CALL_TIMEOUT = 10.0
+# Events kept by the coordinator for shards that poll late
+MAX_SHARD_EVENTS = 1000
+
+# Path segments followed by a device id, and the query/body fields naming one
+_DEVICE_SEGMENTS = {"devices", "quickApp", "export", "removeChildDevice"}
+_DEVICE_FIELDS = ("deviceID", "deviceId", "parentId")
+
+# Options that make no sense once per worker: they run code or tools in the
+# coordinator's terminal, attach to stdin, or turn off the API the shards
+# talk to each other through. Keyed by argparse dest.
+UNSHARDABLE = {
+    "eval": "-e/--eval",
+    "interactive": "-i/--interactive",
+    "tool": "-t/--tool",
+    "diagnostic": "--diagnostic",
+    "l": "-l",
+    "no_api": "--no-api",
+}
+
+# Options the coordinator sets per worker instead of forwarding.
+_PER_SHARD = {
+    "scripts", "shards", "api_port", "api_host", "telnet_port", "nodebugger", "nogreet", "help",
+    "shard_index", "shard_coordinator",
+}
+
+
+def partition_scripts(scripts: list[str], shards: int) -> list[list[str]]:
+    """Split `scripts` round-robin into at most `shards` non-empty groups."""
+    shards = max(1, min(shards, len(scripts)))
+    return [scripts[i::shards] for i in range(shards)]
+
+
+def unshardable_options(args: argparse.Namespace) -> list[str]:
+    """The options in `args` that cannot be combined with --shards."""
+    return [flag for dest, flag in UNSHARDABLE.items() if getattr(args, dest, None)]
+
+
+def shard_url(args: argparse.Namespace, index: int) -> str:
+    """Base URL of worker `index`'s API server."""
+    return f"http://127.0.0.1:{args.api_port + 1 + index}"
+
+
+def coordinator_url(args: argparse.Namespace) -> str:
+    """Base URL the workers reach the coordinator on."""
+    host = args.api_host if args.api_host not in ("0.0.0.0", "::", "") else "127.0.0.1"
+    return f"http://{host}:{args.api_port}"
+
+
+def shard_argv(
+    parser: argparse.ArgumentParser, args: argparse.Namespace, scripts: list[str], index: int
+) -> list[str]:
+    """
+    Command line for worker `index`: every option in `args` that differs from
+    the parser's default is forwarded as given, followed by the per-shard ones
+    (internal API port, telnet port + index, coordinator URL, no debugger, no
+    greeting) and the scripts.
+    """
+    argv = [sys.executable, "-m", "plua.cli"]
+    for action in parser._actions:
+        if not action.option_strings or action.dest in _PER_SHARD:
+            continue
+        value = getattr(args, action.dest, action.default)
+        if value == action.default or value is None:
+            continue
+        flag = action.option_strings[-1]
+        if action.nargs == 0:
+            argv.append(flag)
+        elif isinstance(value, list):
+            for item in value:
+                argv += [flag, str(item)]
+        else:
+            argv += [flag, str(value)]
+    # A debugger can attach to one process at most; shards always run without it.
+    argv += ["--nogreet", "--nodebugger"]
+    argv += ["--api-host", "127.0.0.1", "--api-port", str(args.api_port + 1 + index)]
+    argv += ["--telnet-port", str(args.telnet_port + index)]
+    argv += ["--shard-index", str(index), "--shard-coordinator", coordinator_url(args)]
+    return argv + scripts
+
+
+def device_ids_in(path: str, data: Any = None) -> list[int]:
+    """
+    Device ids a Fibaro API request refers to, most specific first: the id
+    after /devices/, /quickApp/... in the path, then the deviceID/deviceId/
+    parentId query parameter and body field. `data` is a dict or Lua table.
+    """
+    path, _, query = path.partition("?")
+    ids = []
+    segments = path.split("/")
+    for prev, segment in zip(segments, segments[1:], strict=False):
+        if prev in _DEVICE_SEGMENTS and segment.isdigit():
+            ids.append(int(segment))
+    params = dict(parse_qsl(query))
+    for source in (params, data):
+        if source is None:
+            continue
+        for key in _DEVICE_FIELDS:
+            try:
+                value = source[key]
+            except (KeyError, TypeError, IndexError):
+                continue
+            if isinstance(value, (int, float)) or (isinstance(value, str) and value.isdigit()):
+                ids.append(int(value))
+    return ids
+
+
+class ShardDirectory:
+    """
+    The coordinator's view of the shards: which shard owns each device, and
+    the refreshStates events raised in each of them. Only touched from the
+    coordinator's event loop.
+    """
+
+    def __init__(self, urls: list[str]) -> None:
+        self.urls = urls
+        self.devices: dict[int, int] = {}
+        self.events: deque[tuple[int, int, Any]] = deque(maxlen=MAX_SHARD_EVENTS)
+        self.last = 0
+        self._changed: asyncio.Condition | None = None
+
+    def publish_devices(self, shard: int, ids: list[int]) -> None:
+        """Replace the device ids owned by `shard`."""
+        self.devices = {d: s for d, s in self.devices.items() if s != shard}
+        for device_id in ids:
+            self.devices[int(device_id)] = shard
+
+    def owner(self, ids: list[int]) -> int | None:
+        """Shard owning the first of `ids` that any shard has published."""
+        for device_id in ids:
+            if device_id in self.devices:
+                return self.devices[device_id]
+        return None
+
+    @property
+    def changed(self) -> asyncio.Condition:
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        return self._changed
+
+    async def add_events(self, shard: int, events: list[Any]) -> None:
+        async with self.changed:
+            for event in events:
+                self.last += 1
+                self.events.append((self.last, shard, event))
+            self.changed.notify_all()
+
+    async def events_for(self, shard: int, last: int, timeout: float) -> tuple[int, list[Any]]:
+        """Events after `last` raised by other shards, waiting up to `timeout` for new ones."""
+        async with self.changed:
+            if self.last <= last:
+                try:
+                    await asyncio.wait_for(self.changed.wait_for(lambda: self.last > last), timeout)
+                except TimeoutError:
+                    pass
+            return self.last, [event for seq, origin, event in self.events if seq > last and origin != shard]
+
+
+def create_coordinator_app(directory: ShardDirectory, client: Any = None):
+    """FastAPI app that fronts the shards on the public API port. `client` is the httpx.AsyncClient used to reach them."""
+    import httpx
+    from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+    from fastapi.responses import JSONResponse, Response
+
+    client = client or httpx.AsyncClient(timeout=30.0)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app: FastAPI):
+        yield
+        await client.aclose()
+
+    app = FastAPI(title="PLua shard coordinator", lifespan=lifespan)
+    websockets: set[WebSocket] = set()
+    pending: deque[dict[str, Any]] = deque(maxlen=MAX_SHARD_EVENTS)
+
+    async def forward(index: int, request: Request, path: str, body: bytes) -> Response:
+        params = [(k, v) for k, v in request.query_params.multi_items() if k != "shard"]
+        headers = {k: v for k, v in request.headers.items() if k.lower() in ("content-type", "accept")}
+        try:
+            resp = await client.request(
+                request.method, directory.urls[index] + path, params=params, content=body, headers=headers
+            )
+        except httpx.HTTPError as e:
+            return JSONResponse({"detail": f"Shard {index} unavailable: {e}"}, status_code=503)
+        return Response(resp.content, status_code=resp.status_code, media_type=resp.headers.get("content-type"))
+
+    async def gather_lists(path: str, request: Request) -> list[Any]:
+        """Concatenate the JSON lists returned by every shard for `path`, first copy of each id wins."""
+        params = list(request.query_params.multi_items())
+        results = await asyncio.gather(
+            *(client.get(url + path, params=params) for url in directory.urls), return_exceptions=True
+        )
+        merged, seen = [], set()
+        for resp in results:
+            if isinstance(resp, BaseException) or resp.status_code != 200:
+                continue
+            for item in resp.json() or []:
+                key = item.get("id") if isinstance(item, dict) else None
+                if key is not None and key in seen:
+                    continue
+                seen.add(key)
+                merged.append(item)
+        return merged
+
+    def pick_shard(request: Request, path: str, body: bytes) -> int:
+        explicit = request.query_params.get("shard")
+        if explicit is not None and explicit.isdigit() and int(explicit) < len(directory.urls):
+            return int(explicit)
+        data = None
+        if body:
+            try:
+                data = json.loads(body)
+            except ValueError:
+                pass
+        owner = directory.owner(device_ids_in(path + "?" + str(request.query_params), data))
+        return owner if owner is not None else 0
+
+    @app.post("/plua/shards/devices")
+    async def publish_devices(request: Request):
+        msg = await request.json()
+        directory.publish_devices(int(msg["shard"]), msg.get("ids") or [])
+        return {"devices": len(directory.devices)}
+
+    @app.get("/plua/shards")
+    async def shards():
+        return {"shards": directory.urls, "devices": {str(k): v for k, v in directory.devices.items()}}
+
+    @app.post("/plua/shards/events")
+    async def publish_events(request: Request):
+        msg = await request.json()
+        await directory.add_events(int(msg["shard"]), msg.get("events") or [])
+        return {"last": directory.last}
+
+    @app.get("/plua/shards/events")
+    async def poll_events(shard: int, last: int = 0, wait: float = 25.0):
+        last, events = await directory.events_for(shard, last, min(wait, 60.0))
+        return {"last": last, "events": events}
+
+    @app.post("/plua/shards/broadcast")
+    async def broadcast(request: Request):
+        message = await request.json()
+        message["type"] = "view_update"
+        if not websockets:
+            pending.append(message)
+            return {"sent": 0}
+        for ws in list(websockets):
+            try:
+                await ws.send_json(message)
+            except Exception:
+                websockets.discard(ws)
+        return {"sent": len(websockets)}
+
+    @app.websocket("/ws")
+    async def websocket_endpoint(websocket: WebSocket):
+        await websocket.accept()
+        websockets.add(websocket)
+        try:
+            while pending:
+                await websocket.send_json(pending.popleft())
+            while True:
+                msg = json.loads(await websocket.receive_text())
+                if msg.get("type") == "ping":
+                    await websocket.send_text(json.dumps({"type": "pong", "timestamp": msg.get("timestamp")}))
+        except (WebSocketDisconnect, ValueError):
+            pass
+        except Exception as e:
+            logger.debug(f"Coordinator WebSocket error: {e}")
+        finally:
+            websockets.discard(websocket)
+
+    @app.get("/plua/quickApp/info")
+    async def quickapps_info(request: Request):
+        return await gather_lists("/plua/quickApp/info", request)
+
+    @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
+    async def proxy(request: Request, path: str):
+        path = "/" + path
+        body = await request.body()
+        if request.method == "GET" and path.rstrip("/") == "/api/devices" and "shard" not in request.query_params:
+            return await gather_lists("/api/devices", request)
+        return await forward(pick_shard(request, path, body), request, path, body)
+
+    return app
+
+
+def start_coordinator(args: argparse.Namespace, directory: ShardDirectory) -> tuple[Any, threading.Thread]:
+    """Serve the coordinator app on --api-host/--api-port from a background thread."""
+    import uvicorn
+
+    from .fastapi_process import _EmbeddedServer, _uvicorn_log_level
+    from .port_utils import free_port
+
+    free_port(args.api_port)
+    server = _EmbeddedServer(uvicorn.Config(
+        create_coordinator_app(directory),
+        host=args.api_host,
+        port=args.api_port,
+        log_level=_uvicorn_log_level({"loglevel": args.loglevel}),
+        access_log=False,
+    ))
+    thread = threading.Thread(target=server.run, name="shard-coordinator", daemon=True)
+    thread.start()
+    return server, thread
+
+
+def _pump(index: int, stream: IO[str]) -> None:
+    """Copy a worker's output to ours, one prefixed line at a time."""
+    for line in stream:
+        sys.stdout.write(f"[shard {index}] {line}")
+        sys.stdout.flush()
+
+
+def run_sharded(parser: argparse.ArgumentParser, args: argparse.Namespace) -> int:
+    """Start the coordinator and one worker per script group, and wait for all of them. Returns the worst exit code."""
+    rejected = unshardable_options(args)
+    if rejected:
+        parser.error(f"--shards cannot be combined with {', '.join(rejected)}")
+    groups = partition_scripts(args.scripts, args.shards)
+    directory = ShardDirectory([shard_url(args, index) for index in range(len(groups))])
+    server, server_thread = start_coordinator(args, directory)
+    print(f"Shard coordinator: API port {args.api_port}")
+    procs: list[subprocess.Popen] = []
+    pumps: list[threading.Thread] = []
+    for index, scripts in enumerate(groups):
+        argv = shard_argv(parser, args, scripts, index)
+        print(f"Shard {index}: {', '.join(scripts)} (internal API port {args.api_port + 1 + index})")
+        proc = subprocess.Popen(
+            argv,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+        )
+        procs.append(proc)
+        pump = threading.Thread(target=_pump, args=(index, proc.stdout), daemon=True)
+        pump.start()
+        pumps.append(pump)
+
+    try:
+        codes = [proc.wait() for proc in procs]
+    except KeyboardInterrupt:
+        logger.info("Stopping shards")
+        for proc in procs:
+            if proc.poll() is None:
+                if sys.platform == "win32":
+                    proc.terminate()
+                else:
+                    proc.send_signal(signal.SIGINT)
+        codes = []
+        for proc in procs:
+            try:
+                codes.append(proc.wait(timeout=5))
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                codes.append(proc.wait())
+    for pump in pumps:
+        pump.join(timeout=1)
+    server.should_exit = True
+    server_thread.join(timeout=5)
+    return max(codes, default=0)
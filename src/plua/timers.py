@@ -1,46 +1,166 @@
 """
 Async Timer Manager for Lua Engine
 
-This module provides basic async timer functionality (setTimeout only) that can be controlled from Lua scripts.
-The Lua layer builds setInterval on top of setTimeout.
+This module provides async timers (setTimeout and fixed-rate setInterval) that can be controlled from Lua scripts.
+
+All timers live in one binary heap ordered by due time and are driven by a
+single `loop.call_at()` handle armed for the earliest one, so arming is
+O(log n) and no asyncio Task is created per timer. Cancelled timers are
+removed lazily (the heap is compacted when they outnumber live ones).
+
+Intervals are anchored to their start time: tick k is due at
+`start + k * period` on the loop's monotonic clock, so a slow callback or a
+late wakeup never pushes later ticks back. What happens when ticks are
+missed is chosen per interval (INTERVAL_SKIP, INTERVAL_BURST,
+INTERVAL_DELAY), and each interval keeps lateness (drift) and jitter stats.
+
+A timer may carry slack: it can run up to `slack` after its due time. The
+heap is ordered by that deadline, and each wakeup runs every timer that is
+already due, so timers within each other's slack share one wakeup. Timers
+whose callback has a batch handler (see set_batch_handler) are delivered
+together in one call per wakeup; the Lua bindings use this to enter Lua
+once (`_PY.timerExpiredBatch`) for all the timers of a wakeup.
+
+simulate() switches the manager to a virtual clock for discrete-event
+simulation: instead of sleeping until the next deadline, each loop turn
+jumps the clock to it and fires, so days of timer activity run in seconds,
+in the same order every run. wall_time() follows the virtual clock (the Lua
+bindings use it for `_PY.milli_time`, os.time/os.date and emulator log
+time). Real network I/O is not simulated; its callbacks see whatever the
+virtual time is when they arrive. When the simulated span is over, pending
+timers keep their remaining delay and the manager returns to real time.
+Timers set with realtime=True (e.g. the CLI's --run-for guard) always
+follow the real clock.
 """
 
 import asyncio
+import heapq
+import itertools
 import logging
 import time
-import uuid
 from collections.abc import Callable
-from dataclasses import dataclass
 from typing import Any
 
 logger = logging.getLogger(__name__)
 
+# Overrun policies for set_interval(): what to do with ticks whose slot has
+# already passed when the previous tick finishes.
+INTERVAL_SKIP = "skip"    # drop missed ticks, stay on the original grid
+INTERVAL_BURST = "burst"  # run missed ticks back to back (one per loop turn)
+INTERVAL_DELAY = "delay"  # restart the grid one period after the late tick
+INTERVAL_POLICIES = (INTERVAL_SKIP, INTERVAL_BURST, INTERVAL_DELAY)
+
+# A burst never replays more than this many missed ticks; beyond that (e.g.
+# after the host slept) the interval skips ahead like INTERVAL_SKIP.
+MAX_BURST_TICKS = 100
+
 
-@dataclass
 class TimerInfo:
     """Information about a timer."""
-    timer_id: str
-    delay: float
-    callback: Callable
-    task: asyncio.Task | None = None
-    created_at: float = 0.0
 
-    def __post_init__(self):
-        if not self.created_at:
-            self.created_at = time.time()
+    __slots__ = ("timer_id", "delay", "when", "slack", "callback", "args", "kwargs", "created_at", "cancelled")
+
+    def __init__(self, timer_id: int, delay: float, when: float, callback: Callable, args: tuple, kwargs: dict,
+                 slack: float = 0.0):
+        self.timer_id = timer_id
+        self.delay = delay
+        self.when = when
+        self.slack = slack
+        self.callback: Callable | None = callback  # None once cleared
+        self.args = args
+        self.kwargs = kwargs
+        self.created_at = time.time()
+        self.cancelled = False
+
+
+class IntervalInfo(TimerInfo):
+    """A fixed-rate timer: tick k is due at `anchor + k * delay`."""
+
+    __slots__ = ("policy", "anchor", "tick", "ticks", "skipped", "late_last", "late_sum", "late_sq", "late_max")
+
+    def __init__(self, timer_id: int, period: float, when: float, callback: Callable, args: tuple, kwargs: dict,
+                 policy: str, slack: float = 0.0):
+        super().__init__(timer_id, period, when, callback, args, kwargs, slack)
+        self.policy = policy
+        self.anchor = when
+        self.tick = 0
+        self.ticks = 0
+        self.skipped = 0
+        self.late_last = 0.0
+        self.late_sum = 0.0
+        self.late_sq = 0.0
+        self.late_max = 0.0
+
+    def record_lateness(self, late: float) -> None:
+        self.ticks += 1
+        self.late_last = late
+        self.late_sum += late
+        self.late_sq += late * late
+        if late > self.late_max:
+            self.late_max = late
+
+    def advance(self, now: float) -> float:
+        """Move to the next tick according to the overrun policy and return its due time."""
+        period = self.delay
+        self.tick += 1
+        when = self.anchor + self.tick * period
+        if when > now:
+            return when
+        missed = int((now - when) // period) + 1
+        if self.policy == INTERVAL_DELAY:
+            self.anchor, self.tick = now + period, 0
+            return self.anchor
+        if self.policy == INTERVAL_BURST and missed <= MAX_BURST_TICKS:
+            return when
+        self.tick += missed
+        self.skipped += missed
+        return self.anchor + self.tick * period
+
+    def stats(self) -> dict[str, Any]:
+        n = self.ticks
+        mean = self.late_sum / n if n else 0.0
+        variance = max(0.0, self.late_sq / n - mean * mean) if n else 0.0
+        return {
+            "timer_id": self.timer_id,
+            "period_ms": self.delay * 1000.0,
+            "policy": self.policy,
+            "ticks": n,
+            "skipped": self.skipped,
+            "drift_last_ms": self.late_last * 1000.0,
+            "drift_avg_ms": mean * 1000.0,
+            "drift_max_ms": self.late_max * 1000.0,
+            "jitter_ms": variance ** 0.5 * 1000.0,
+        }
 
 
 class AsyncTimerManager:
     """
     Manages async timers that can be created and controlled from Lua scripts.
 
-    Provides only setTimeout functionality - setInterval is implemented in Lua
-    by chaining setTimeout calls.
+    Provides setTimeout and fixed-rate setInterval; both share one id space
+    and are cancelled with clear_timer().
     """
 
-    def __init__(self):
-        self._timers: dict[str, TimerInfo] = {}
+    def __init__(self, default_slack_ms: float = 0):
+        self._timers: dict[int, TimerInfo] = {}
+        self._default_slack = max(0.0, default_slack_ms / 1000.0)
+        self._batch_handlers: dict[Callable, Callable[[list[tuple]], Any]] = {}
+        # (when + slack, seq, TimerInfo); seq increases on every push (intervals
+        # are pushed again for each tick), so it breaks ties in scheduling order.
+        self._heap: list[tuple[float, int, TimerInfo]] = []
+        self._ids = itertools.count(1)
+        self._seqs = itertools.count(1)
+        self._last_seq = 0
+        self._handle: asyncio.Handle | None = None
+        self._armed_at: float | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
         self._running = False
+        # Virtual clock (see simulate()); _virtual is None in real time.
+        self._virtual: float | None = None
+        self._virtual_end = 0.0
+        self._epoch_offset = 0.0
+        self._on_simulation_end: list[Callable[[], Any]] = []
+        self._realtime: dict[int, asyncio.TimerHandle] = {}
 
     async def start(self):
         """Start the timer manager."""
@@ -53,7 +173,26 @@ class AsyncTimerManager:
         await self.clear_all_timers()
         logger.info("AsyncTimerManager stopped")
 
-    def set_timeout(self, delay_ms: int, callback: Callable, *args, **kwargs) -> str:
+    def set_batch_handler(self, callback: Callable, handler: Callable[[list[tuple]], Any] | None) -> None:
+        """
+        Deliver timers whose callback is `callback` in batches.
+
+        Consecutive due timers with this callback that fire in the same
+        wakeup result in one `handler([args, ...])` call instead of one
+        `callback(*args)` call each (kwargs are not passed). The handler
+        must tolerate timers cancelled by earlier ones of the same batch.
+        Pass None to remove the handler.
+        """
+        if handler is None:
+            self._batch_handlers.pop(callback, None)
+        else:
+            self._batch_handlers[callback] = handler
+
+    def _slack(self, slack_ms: float | None) -> float:
+        return self._default_slack if slack_ms is None else max(0.0, slack_ms / 1000.0)
+
+    def set_timeout(self, delay_ms: int, callback: Callable, *args, slack_ms: float | None = None,
+                    realtime: bool = False, **kwargs) -> int:
         """
         Set a one-time timer (like JavaScript setTimeout).
 
@@ -61,39 +200,145 @@ class AsyncTimerManager:
             delay_ms: Delay in milliseconds
             callback: Function to call when timer fires
             *args, **kwargs: Arguments to pass to callback
+            slack_ms: How late the timer may run so it can share a wakeup
+                with other timers (default: the manager's default_slack_ms)
+            realtime: Follow the real clock even while simulating
 
         Returns:
             Timer ID that can be used to cancel the timer
         """
-        delay_seconds = delay_ms / 1000.0
-        timer_id = str(uuid.uuid4())
+        self._loop = self._loop or asyncio.get_running_loop()
+        delay_seconds = max(0.0, delay_ms / 1000.0)
+        timer_id = next(self._ids)
+        when = self.time() + delay_seconds
+        timer_info = TimerInfo(timer_id, delay_seconds, when, callback, args, kwargs, self._slack(slack_ms))
+        self._timers[timer_id] = timer_info
+        if realtime:
+            self._realtime[timer_id] = self._loop.call_later(delay_seconds, self._fire_realtime, timer_info)
+        else:
+            self._push(when, timer_info)
+        return timer_id
 
-        async def timer_task():
-            try:
-                await asyncio.sleep(delay_seconds)
-                if timer_id in self._timers and self._running:
-                    logger.debug(f"Timeout timer {timer_id} firing")
-                    await self._safe_call_callback(callback, *args, **kwargs)
-                    # Remove timer after it fires
-                    self._timers.pop(timer_id, None)
-            except asyncio.CancelledError:
-                logger.debug(f"Timeout timer {timer_id} cancelled")
-            except Exception as e:
-                logger.error(f"Error in timeout timer {timer_id}: {e}")
+    def set_interval(self, period_ms: int, callback: Callable, *args, policy: str = INTERVAL_SKIP,
+                     slack_ms: float | None = None, **kwargs) -> int:
+        """
+        Set a fixed-rate repeating timer (like JavaScript setInterval).
 
-        task = asyncio.create_task(timer_task())
-        timer_info = TimerInfo(
-            timer_id=timer_id,
-            delay=delay_seconds,
-            callback=callback,
-            task=task
-        )
+        The first tick is due one period from now, tick k at `start + k * period`,
+        independent of how long callbacks take.
 
+        Args:
+            period_ms: Period in milliseconds (at least 1)
+            callback: Function to call on every tick
+            *args, **kwargs: Arguments to pass to callback
+            policy: What to do with missed ticks, one of INTERVAL_POLICIES
+            slack_ms: How late each tick may run (see set_timeout)
+
+        Returns:
+            Timer ID that can be used with clear_timer() and get_interval_stats()
+        """
+        if policy not in INTERVAL_POLICIES:
+            raise ValueError(f"Unknown interval policy {policy!r}, expected one of {INTERVAL_POLICIES}")
+        self._loop = self._loop or asyncio.get_running_loop()
+        period_seconds = max(1.0, period_ms) / 1000.0
+        timer_id = next(self._ids)
+        when = self.time() + period_seconds
+        timer_info = IntervalInfo(timer_id, period_seconds, when, callback, args, kwargs, policy,
+                                  self._slack(slack_ms))
         self._timers[timer_id] = timer_info
-        logger.debug(f"Created timeout timer {timer_id} with delay {delay_ms}ms")
+        self._push(when, timer_info)
         return timer_id
 
-    def clear_timer(self, timer_id: str) -> bool:
+    def time(self) -> float:
+        """Monotonic scheduler time in seconds (virtual while simulating)."""
+        if self._virtual is not None:
+            return self._virtual
+        return (self._loop or asyncio.get_running_loop()).time()
+
+    def wall_time(self) -> float:
+        """Epoch time in seconds (virtual while simulating)."""
+        if self._virtual is not None:
+            return self._virtual + self._epoch_offset
+        return time.time()
+
+    def is_simulating(self) -> bool:
+        return self._virtual is not None
+
+    def simulate(self, duration_s: float, start_epoch: float | None = None,
+                 on_end: Callable[[], Any] | None = None) -> None:
+        """
+        Run timers on a virtual clock for `duration_s` simulated seconds.
+
+        Args:
+            duration_s: Simulated time span in seconds
+            start_epoch: Epoch time the virtual clock starts at (default: now,
+                or the current virtual time if already simulating)
+            on_end: Called once the span is over and real time is back. A
+                call while already simulating replaces the span; the earlier
+                call's on_end still runs (first) when it ends.
+
+        The simulation also ends early, jumping to the end of the span, once
+        no timers are left.
+        """
+        self._loop = self._loop or asyncio.get_running_loop()
+        now = self.time()
+        wall = self.wall_time() if start_epoch is None else start_epoch
+        self._virtual = now
+        self._epoch_offset = wall - now
+        self._virtual_end = now + max(0.0, duration_s)
+        if on_end is not None:
+            self._on_simulation_end.append(on_end)
+        logger.info(f"Simulating {duration_s:.0f}s of virtual time from {time.ctime(wall)}")
+        self._arm(self._heap[0][0] if self._heap else self._virtual_end)
+
+    def _end_simulation(self) -> None:
+        """Leave the virtual clock; pending timers keep their remaining delay."""
+        assert self._loop is not None and self._virtual is not None
+        delta = self._loop.time() - self._virtual
+        self._virtual = None
+        for _, _, timer_info in self._heap:
+            timer_info.when += delta
+            if isinstance(timer_info, IntervalInfo):
+                timer_info.anchor += delta
+        # A uniform shift keeps the heap order.
+        self._heap[:] = [(deadline + delta, seq, info) for deadline, seq, info in self._heap]
+        callbacks, self._on_simulation_end = self._on_simulation_end, []
+        logger.info("Simulation ended, back to real time")
+        for on_end in callbacks:
+            try:
+                on_end()
+            except Exception as e:
+                logger.error(f"Error in simulation end callback: {e}")
+
+    def _step(self) -> None:
+        """Virtual clock: jump to the earliest deadline and fire, or end the simulation."""
+        self._handle = None
+        self._armed_at = None
+        if self._virtual is None:
+            return
+        heap = self._heap
+        while heap and heap[0][2].cancelled:
+            heapq.heappop(heap)
+        # Deadlines are sums of floats (anchor + k * period), so one landing
+        # exactly on the end of the span may round a hair past it
+        if not heap or heap[0][0] > self._virtual_end + 1e-6:
+            # Past the span, or nothing left to run in it
+            self._virtual = self._virtual_end
+            self._end_simulation()
+            if heap and self._armed_at is None:
+                self._arm(heap[0][0])
+            return
+        self._virtual = max(self._virtual, heap[0][0])
+        self._fire()
+
+    def get_interval_stats(self, timer_id: int) -> dict[str, Any] | None:
+        """Tick count, skipped ticks and lateness/jitter (ms) of an interval, or None."""
+        timer_info = self._timers.get(timer_id)
+        if isinstance(timer_info, IntervalInfo):
+            return timer_info.stats()
+        return None
+
+    def clear_timer(self, timer_id: int) -> bool:
         """
         Clear a specific timer (like JavaScript clearTimeout).
 
@@ -104,32 +349,44 @@ class AsyncTimerManager:
             True if timer was found and cleared, False otherwise
         """
         timer_info = self._timers.pop(timer_id, None)
-        if timer_info:
-            if timer_info.task:
-                timer_info.task.cancel()
-            logger.debug(f"Cleared timer {timer_id}")
-            return True
-        return False
+        if timer_info is None:
+            return False
+        handle = self._realtime.pop(timer_id, None)
+        if handle is not None:
+            handle.cancel()
+        timer_info.cancelled = True
+        # Drop references now; the heap entry itself is discarded lazily.
+        timer_info.callback = None
+        timer_info.args = ()
+        timer_info.kwargs = {}
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._timers):
+            # In place: _fire() may be iterating over this list.
+            self._heap[:] = [entry for entry in self._heap if not entry[2].cancelled]
+            heapq.heapify(self._heap)
+        return True
 
     async def clear_all_timers(self):
         """Clear all timers."""
-        timer_ids = list(self._timers.keys())
-        for timer_id in timer_ids:
-            self.clear_timer(timer_id)
-
-        # Wait for all tasks to complete cancellation
-        tasks = [info.task for info in self._timers.values() if info.task]
-        if tasks:
-            await asyncio.gather(*tasks, return_exceptions=True)
-
+        for timer_info in self._timers.values():
+            timer_info.cancelled = True
         self._timers.clear()
+        self._heap.clear()
+        for handle in self._realtime.values():
+            handle.cancel()
+        self._realtime.clear()
+        if self._handle is not None:
+            self._handle.cancel()
+        self._handle = None
+        self._armed_at = None
+        self._virtual = None
+        self._on_simulation_end = []
         logger.debug("Cleared all timers")
 
     def get_timer_count(self) -> int:
         """Get the number of active timers."""
         return len(self._timers)
 
-    def get_timer_info(self, timer_id: str) -> dict[str, Any] | None:
+    def get_timer_info(self, timer_id: int) -> dict[str, Any] | None:
         """Get information about a specific timer."""
         timer_info = self._timers.get(timer_id)
         if timer_info:
@@ -137,10 +394,120 @@ class AsyncTimerManager:
                 "timer_id": timer_info.timer_id,
                 "delay": timer_info.delay,
                 "created_at": timer_info.created_at,
-                "running": timer_info.task and not timer_info.task.done()
+                "running": not timer_info.cancelled
             }
         return None
 
+    def list_timers(self) -> dict[int, dict[str, Any]]:
+        """Live timers by id: type, delay, time until due (ms) and age (s)."""
+        now, wall = self.time(), time.time()
+        return {
+            timer_id: {
+                "type": "interval" if isinstance(info, IntervalInfo) else "timeout",
+                "delay_ms": info.delay * 1000.0,
+                "due_in_ms": (info.when - now) * 1000.0,
+                "age_s": wall - info.created_at,
+                "realtime": timer_id in self._realtime,
+            }
+            for timer_id, info in self._timers.items()
+        }
+
+    def _push(self, when: float, timer_info: TimerInfo) -> None:
+        timer_info.when = when
+        deadline = when + timer_info.slack
+        self._last_seq = seq = next(self._seqs)
+        heapq.heappush(self._heap, (deadline, seq, timer_info))
+        if self._armed_at is None or deadline < self._armed_at:
+            self._arm(deadline)
+
+    def _arm(self, when: float) -> None:
+        """(Re)arm the single loop handle for the earliest timer deadline."""
+        if self._handle is not None:
+            self._handle.cancel()
+        self._armed_at = when
+        assert self._loop is not None, "timers are armed from set_timeout/set_interval on the loop"
+        if self._virtual is not None:
+            # One timer wakeup per loop turn, so I/O and dispatch still interleave.
+            self._handle = self._loop.call_soon(self._step)
+        else:
+            self._handle = self._loop.call_at(when, self._fire)
+
+    def _fire(self) -> None:
+        """Run every timer that is due, then re-arm for the next deadline."""
+        self._handle = None
+        # -inf keeps set_timeout() from arming while we run callbacks; we
+        # arm once for the earliest remaining deadline when done.
+        self._armed_at = float("-inf")
+        now = self.time()
+        # Timers armed by the callbacks below (and the next tick of a bursting
+        # interval) wait for the next turn, so a zero-delay re-arm loop cannot
+        # starve the rest of the event loop.
+        last_seq = self._last_seq
+        heap = self._heap
+        try:
+            # The heap top has the earliest deadline; everything already due
+            # behind it (timers with slack) rides along on this wakeup.
+            due: list[TimerInfo] = []
+            while heap and (heap[0][2].cancelled or (heap[0][2].when <= now and heap[0][1] <= last_seq)):
+                timer_info = heapq.heappop(heap)[2]
+                if timer_info.cancelled:
+                    continue
+                if isinstance(timer_info, IntervalInfo):
+                    timer_info.record_lateness(now - timer_info.when)
+                else:
+                    self._timers.pop(timer_info.timer_id, None)
+                due.append(timer_info)
+            if self._running:
+                self._run_due(due)
+            for timer_info in due:
+                if isinstance(timer_info, IntervalInfo) and not timer_info.cancelled:
+                    self._push(timer_info.advance(self.time()), timer_info)
+        finally:
+            while heap and heap[0][2].cancelled:
+                heapq.heappop(heap)
+            self._armed_at = None
+            if heap:
+                self._arm(heap[0][0])
+            elif self._virtual is not None:
+                self._arm(self._virtual_end)  # _step() ends the simulation
+
+    def _fire_realtime(self, timer_info: TimerInfo) -> None:
+        self._realtime.pop(timer_info.timer_id, None)
+        if timer_info.cancelled:
+            return
+        self._timers.pop(timer_info.timer_id, None)
+        if self._running:
+            self._run_due([timer_info])
+
+    def _run_due(self, due: list[TimerInfo]) -> None:
+        """Call the due timers in order, one handler call per run of batched timers."""
+        i, n = 0, len(due)
+        while i < n:
+            timer_info = due[i]
+            callback = timer_info.callback
+            handler = self._batch_handlers.get(callback) if callback is not None else None
+            if handler is not None:
+                batch = []
+                while i < n and due[i].callback is callback:
+                    batch.append(due[i].args)
+                    i += 1
+                try:
+                    handler(batch)
+                except Exception as e:
+                    logger.error(f"Error in timer batch callback: {e}")
+                continue
+            i += 1
+            if timer_info.cancelled or callback is None:
+                continue
+            args, kwargs = timer_info.args, timer_info.kwargs
+            if asyncio.iscoroutinefunction(callback):
+                asyncio.ensure_future(self._safe_call_callback(callback, *args, **kwargs))
+            else:
+                try:
+                    callback(*args, **kwargs)
+                except Exception as e:
+                    logger.error(f"Error in timer callback: {e}")
+
     async def _safe_call_callback(self, callback: Callable, *args, **kwargs):
         """Safely call a callback function, handling both sync and async functions."""
         try:
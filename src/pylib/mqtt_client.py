@@ -263,7 +263,7 @@ async def _mqtt_connect_and_listen(client_id: str):
                             'retain': message.retain,
                             'packetId': packet_id,
                             'dup': False  # Duplicate delivery flag
-                        })
+                        }, coalesce_key=(callback_id, str(message.topic)))
                 
                 # Also send to 'message' event listeners
                 if 'message' in client_info['event_listeners']:
@@ -279,7 +279,7 @@ async def _mqtt_connect_and_listen(client_id: str):
                             'retain': message.retain,
                             'packetId': packet_id,
                             'dup': False  # Duplicate delivery flag
-                        })
+                        }, coalesce_key=(event_callback_id, str(message.topic)))
                         
     except Exception as e:
         logger.error(f"MQTT connection error: {e}")
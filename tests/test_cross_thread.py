@@ -0,0 +1,369 @@
+"""
+Tests for CrossThreadDispatch delivery through a running LuaEngine.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from plua import LuaEngine
+from plua.cross_thread import (
+    POLICY_BLOCK,
+    POLICY_COALESCE,
+    POLICY_DROP_NEWEST,
+    POLICY_DROP_OLDEST,
+    DispatchLane,
+    FairLane,
+)
+
+
+class TestDispatchLane:
+    """Test cases for bounded lanes and their overflow policies."""
+
+    def test_drop_oldest(self):
+        lane = DispatchLane("t", capacity=2, policy=POLICY_DROP_OLDEST)
+        for i in range(3):
+            assert lane.put(i) is True
+        assert [lane.get_nowait(), lane.get_nowait()] == [1, 2]
+        assert lane.stats()["dropped"] == 1
+
+    def test_drop_newest(self):
+        lane = DispatchLane("t", capacity=1, policy=POLICY_DROP_NEWEST)
+        assert lane.put("a") is True
+        assert lane.put("b") is False
+        assert lane.get_nowait() == "a"
+        with pytest.raises(IndexError):
+            lane.get_nowait()
+
+    def test_coalesce_keeps_position_and_latest_value(self):
+        lane = DispatchLane("t", capacity=10, policy=POLICY_COALESCE)
+        lane.put("t1=1", key="t1")
+        lane.put("t2=1", key="t2")
+        lane.put("t1=2", key="t1")
+        assert len(lane) == 2
+        assert [lane.get_nowait(), lane.get_nowait()] == ["t1=2", "t2=1"]
+        stats = lane.stats()
+        assert stats["coalesced"] == 1
+        assert stats["high_water"] == 2
+
+
+    def test_block_from_consumer_thread_stays_bounded(self):
+        lane = FairLane("cb", capacity=100, policy=POLICY_BLOCK)
+        lane.consumer_thread = threading.get_ident()
+        for i in range(300):
+            assert lane.put(i) is True
+        stats = lane.stats()
+        assert stats["depth"] == 100
+        assert stats["overflow"] == 200 and stats["dropped"] == 200
+        assert lane.get_nowait() == 200
+
+
+class TestFairLane:
+    """Test cases for per-owner deficit round-robin."""
+
+    def test_busy_owner_does_not_starve_others(self):
+        lane = FairLane("cb", quantum=2)
+        for i in range(100):
+            lane.put(("busy", i), owner=1)
+        lane.put(("quiet", 0), owner=2)
+        batch = lane.get_batch(10)
+        assert ("quiet", 0) in [item for _, item in batch[:4]]
+        assert len(lane) == 91
+
+    def test_weights_split_the_batch(self):
+        lane = FairLane("cb", quantum=1, weights={1: 3})
+        for i in range(30):
+            lane.put(i, owner=1)
+            lane.put(i, owner=2)
+        owners = [owner for owner, _ in lane.get_batch(20)]
+        assert owners.count(1) == 15
+        assert owners.count(2) == 5
+        stats = lane.stats()
+        assert stats["delivered"] == 20
+        assert stats["owners"][1]["weight"] == 3
+        assert stats["owners"][2]["depth"] == 25
+
+
+class TestCrossThreadDispatch:
+    """Test cases for thread→loop dispatch."""
+
+    @pytest.mark.asyncio
+    async def test_burst_drains_in_one_tick(self):
+        """A burst of callbacks is delivered without per-item polling delays."""
+        engine = LuaEngine()
+        await engine.start()
+
+        await engine.run_script("""
+        _G.received = 0
+        _G.ids = {}
+        for i = 1, 500 do
+            ids[i] = _PY.registerCallback(function() received = received + 1 end)
+        end
+        """)
+        ids = engine.get_lua_global("ids")
+        for i in range(1, 501):
+            engine.post_callback_from_thread(ids[i], None, i)
+
+        await asyncio.sleep(0.05)
+        assert engine.get_lua_global("received") == 500
+
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_flood_from_loop_thread_is_bounded(self):
+        """Clients running as loop tasks cannot grow the blocking callback lane past capacity."""
+        engine = LuaEngine(config={"dispatch_lanes": {"callback": {"capacity": 100}}})
+        await engine.start()
+
+        await engine.run_script("""
+        _G.received = 0
+        _G.cb = _PY.registerCallback(function() received = received + 1 end, true)
+        """)
+        cb = engine.get_lua_global("cb")
+        for i in range(3000):  # no await: the loop cannot drain in between
+            engine.post_callback_from_thread(cb, None, i)
+        stats = engine.get_dispatch_stats()["callback"]
+        assert stats["depth"] == 100
+        assert stats["dropped"] == 2900
+
+        await asyncio.sleep(0.05)
+        assert engine.get_lua_global("received") == 100
+
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_post_from_thread_wakes_loop(self):
+        """A post from a worker thread is delivered promptly."""
+        engine = LuaEngine()
+        await engine.start()
+
+        cb_id = await engine.run_script("""
+        _G.got = nil
+        return _PY.registerCallback(function(err, res) got = res end)
+        """)
+        await asyncio.sleep(0.05)  # let the processor go idle
+
+        start = time.monotonic()
+        threading.Thread(target=engine.post_callback_from_thread, args=(cb_id, None, "hi")).start()
+        while engine.get_lua_global("got") is None and time.monotonic() - start < 1.0:
+            await asyncio.sleep(0.001)
+        assert engine.get_lua_global("got") == "hi"
+        assert time.monotonic() - start < 0.1
+
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_budget_yields_between_slices(self):
+        """With a small item budget, a burst is still fully delivered."""
+        engine = LuaEngine(config={"dispatch_max_items": 10})
+        await engine.start()
+
+        await engine.run_script("""
+        _G.received = 0
+        _G.ids = {}
+        for i = 1, 100 do
+            ids[i] = _PY.registerCallback(function() received = received + 1 end)
+        end
+        """)
+        ids = engine.get_lua_global("ids")
+        for i in range(1, 101):
+            engine.post_callback_from_thread(ids[i])
+
+        await asyncio.sleep(0.05)
+        assert engine.get_lua_global("received") == 100
+
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_batch_isolates_errors_and_keeps_nil_args(self):
+        """One failing callback in a batch does not stop the others."""
+        engine = LuaEngine()
+        await engine.start()
+
+        await engine.run_script("""
+        _G.seen = {}
+        _G.a = _PY.registerCallback(function(err, res) seen[#seen+1] = tostring(err) .. ":" .. tostring(res) end)
+        _G.b = _PY.registerCallback(function() error("boom") end)
+        _G.c = _PY.registerCallback(function(err, res) seen[#seen+1] = tostring(err) .. ":" .. tostring(res.v) end)
+        """)
+        engine.post_callback_from_thread(engine.get_lua_global("a"), None, None)
+        engine.post_callback_from_thread(engine.get_lua_global("b"), None, None)
+        engine.post_callback_from_thread(engine.get_lua_global("c"), "e", {"v": 3})
+
+        await asyncio.sleep(0.05)
+        seen = engine.get_lua_global("seen")
+        assert [seen[1], seen[2]] == ["nil:nil", "e:3"]
+
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_batch_isolates_unconvertible_payload(self):
+        """A payload that cannot be converted fails only its own callback."""
+        engine = LuaEngine()
+        await engine.start()
+
+        await engine.run_script("""
+        _G.seen = {}
+        _G.a = _PY.registerCallback(function(err, res) seen.a = res end)
+        _G.b = _PY.registerCallback(function(err, res) seen.b = tostring(err) .. ":" .. tostring(res) end)
+        _G.c = _PY.registerCallback(function(err, res) seen.c = res end)
+        """)
+        cyclic: dict = {}
+        cyclic["self"] = cyclic
+        engine.post_callback_from_thread(engine.get_lua_global("a"), None, 1)
+        engine.post_callback_from_thread(engine.get_lua_global("b"), None, cyclic)
+        engine.post_callback_from_thread(engine.get_lua_global("c"), None, 3)
+
+        await asyncio.sleep(0.05)
+        seen = engine.get_lua_global("seen")
+        assert (seen["a"], seen["c"]) == (1, 3)
+        assert seen["b"].startswith("Failed to convert callback result") and seen["b"].endswith(":nil")
+        assert await engine.run_script("return _PY.getPendingCallbackCount()") == 0
+
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_execute_script_from_thread(self):
+        """A worker thread gets the script result without polling."""
+        engine = LuaEngine()
+        await engine.start()
+
+        result = await asyncio.to_thread(engine.execute_script_from_thread, "return 6 * 7", 5.0)
+        assert result["success"] is True
+        assert result["result"] == 42
+        assert engine._dispatch.pending_request_count() == 0
+
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_execute_script_async_timeout_expires_request(self):
+        """A timed-out async request is removed and its late result dropped."""
+        engine = LuaEngine()
+        await engine.start()
+
+        result = await engine.execute_script_async("return 1", timeout_seconds=0)
+        assert result["success"] is False
+        assert "timeout" in result["error"]
+        await asyncio.sleep(0.05)
+        assert engine._dispatch.pending_request_count() == 0
+
+        result = await engine.execute_script_async("return 'ok'", timeout_seconds=5)
+        assert result["result"] == "ok"
+
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_evicted_request_fails_immediately(self):
+        """A request evicted from a full execution lane gets the overflow error at once."""
+        engine = LuaEngine(config={"dispatch_lanes": {"execution": {"capacity": 2, "policy": "drop_oldest"}}})
+        await engine.start()
+
+        # No await in between: the loop cannot drain the lane
+        futures = [engine._dispatch.submit_script(f"return {i}")[1] for i in range(3)]
+        assert futures[0].done()
+        assert futures[0].result()["error"] == "Execution queue is full"
+        assert engine._dispatch.pending_request_count() == 2
+        assert engine.get_dispatch_stats()["execution"]["dropped"] == 1
+
+        results = await asyncio.gather(*(asyncio.wrap_future(f) for f in futures[1:]))
+        assert [r["result"] for r in results] == [1, 2]
+
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_cancelled_request_never_runs(self):
+        """Cancelling a queued request skips it on the loop."""
+        engine = LuaEngine()
+        await engine.start()
+
+        await engine.run_script("_G.ran = false")
+        request_id, future = engine._dispatch.submit_script("ran = true")
+        assert engine.cancel_script_request(request_id) is True
+        assert future.cancelled()
+        await asyncio.sleep(0.05)
+        assert engine.get_lua_global("ran") is False
+
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_execution_lane_drains_before_callbacks(self):
+        """Execution requests run before queued bulk callbacks."""
+        engine = LuaEngine()
+        await engine.start()
+
+        await engine.run_script("""
+        _G.order = {}
+        _G.cb = _PY.registerCallback(function() order[#order+1] = "callback" end)
+        """)
+        await asyncio.sleep(0.01)
+        engine.post_callback_from_thread(engine.get_lua_global("cb"))
+        engine._dispatch.submit_script("order[#order+1] = 'execution'")
+
+        await asyncio.sleep(0.05)
+        order = engine.get_lua_global("order")
+        assert [order[1], order[2]] == ["execution", "callback"]
+        assert engine.get_dispatch_stats()["callback"]["delivered"] == 1
+
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_callbacks_tagged_with_current_owner(self):
+        """Callbacks registered under a QA owner are queued and reported per owner."""
+        engine = LuaEngine()
+        await engine.start()
+
+        await engine.run_script("""
+        _G.got = {}
+        local prev = _PY.setCurrentOwner(42)
+        _G.owned = _PY.registerCallback(function() got[#got+1] = _PY.getCurrentOwner() end)
+        _PY.setCurrentOwner(prev)
+        _G.plain = _PY.registerCallback(function() got[#got+1] = _PY.getCurrentOwner() or "none" end)
+        """)
+        engine.post_callback_from_thread(engine.get_lua_global("owned"))
+        engine.post_callback_from_thread(engine.get_lua_global("plain"))
+
+        await asyncio.sleep(0.05)
+        got = engine.get_lua_global("got")
+        assert sorted([got[1], got[2]], key=str) == [42, "none"]
+        owners = engine.get_dispatch_stats()["callback"]["owners"]
+        assert owners[42]["delivered"] == 1
+        assert owners["system"]["delivered"] == 1
+        assert engine._dispatch._owners == {}
+
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_entry_point_called_with_native_args(self):
+        """Registered entry points get Python args as-is, with no quoting."""
+        engine = LuaEngine()
+        await engine.start()
+
+        await engine.run_script("""
+        _PY.registerEntryPoint("echo", function(a, b) return a .. "|" .. tostring(b) end)
+        """)
+        result = await engine.call_entry_point_async("echo", 'say "hi"\n]]', 5)
+        assert result["result"] == 'say "hi"\n]]|5'
+        result = await engine.call_entry_point_async("missing")
+        assert result["success"] is False
+        assert "Entry point not found" in result["error"]
+
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_scripts_compiled_once(self):
+        """Repeated scripts hit the chunk cache; load errors are reported."""
+        engine = LuaEngine(config={"chunk_cache_size": 2})
+        await engine.start()
+
+        for _ in range(3):
+            result = await engine.execute_script_async("return 1 + 1")
+            assert result["result"] == 2
+        result = await engine.execute_script_async("return +")
+        assert result["success"] is False
+        assert result["error"].startswith("Load error")
+        cache = engine.get_dispatch_stats()["execution"]["chunk_cache"]
+        assert (cache["hits"], cache["misses"], cache["size"]) == (2, 2, 1)
+
+        await engine.stop()
@@ -3,6 +3,7 @@ Tests for the LuaEngine class.
 """
 
 import asyncio
+import time
 import pytest
 from plua import LuaEngine
 
@@ -135,10 +136,11 @@ class TestLuaEngine:
         engine = LuaEngine()
         await engine.start()
         
-        # Test setInterval (implemented in Lua using setTimeout)
+        # Test setInterval (a fixed-rate timer in the Python timer manager)
         lua_code = """
         local count = 0
-        local interval_id = setInterval(function()
+        local interval_id
+        interval_id = setInterval(function()
             count = count + 1
             _G.test_count = count
             if count >= 3 then
@@ -161,6 +163,220 @@ class TestLuaEngine:
         
         await engine.stop()
         
+    @pytest.mark.asyncio
+    async def test_interval_policy_stats_and_error(self):
+        """Intervals take an overrun policy, report stats to Lua and stop on error."""
+        engine = LuaEngine()
+        await engine.start()
+
+        await engine.run_script("""
+        _G.n, _G.bad = 0, 0
+        _G.iv = setInterval(function() n = n + 1 end, 20, {policy = "burst"})
+        setInterval(function() bad = bad + 1 error("boom") end, 20)
+        """)
+        await asyncio.sleep(0.11)
+        stats = await engine.run_script("local s = _PY.getIntervalStats(iv) clearInterval(iv) return s")
+        assert stats["policy"] == "burst"
+        assert stats["ticks"] == engine.get_lua_global("n") >= 3
+        assert stats["drift_max_ms"] >= 0
+        assert engine.get_lua_global("bad") == 1
+        assert engine.get_running_intervals_count() == 0
+        assert await engine.run_script("return _PY.getIntervalStats(iv)") is None
+
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_timers_with_slack_enter_lua_once(self):
+        """Timers due within the slack window are delivered in one batched Lua call."""
+        engine = LuaEngine(config={"timer_slack_ms": 50})
+        await engine.start()
+
+        await engine.run_script("""
+        _G.fired, _G.batches = {}, 0
+        local batch = _PY.timerExpiredBatch
+        _PY.timerExpiredBatch = function(...) batches = batches + 1 return batch(...) end
+        for i = 1, 5 do setTimeout(function() fired[#fired+1] = i end, 10 + 5 * i) end
+        """)
+        await asyncio.sleep(0.15)
+        fired = engine.get_lua_global("fired")
+        assert [fired[i] for i in range(1, 6)] == [1, 2, 3, 4, 5]
+        assert engine.get_lua_global("batches") == 1
+
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_next_tick_runs_after_current_callback(self):
+        """Microtasks run FIFO right after the queuing callback, isolated from each other's errors."""
+        engine = LuaEngine()
+        await engine.start()
+
+        await engine.run_script("""
+        _G.order = {}
+        local function log(s) order[#order+1] = s end
+        _PY.nextTick(function() log("top") end)
+        setTimeout(function()
+            _PY.nextTick(function() log("tick1") error("boom") end)
+            _PY.nextTick(function() log("tick2") end)
+            log("timer")
+        end, 10)
+        """)
+        await asyncio.sleep(0.05)
+        order = engine.get_lua_global("order")
+        assert [order[i] for i in range(1, 5)] == ["top", "timer", "tick1", "tick2"]
+        assert not engine.has_active_operations()
+
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_next_tick_requeue_yields_to_loop(self):
+        """A microtask that keeps requeueing itself does not block the event loop."""
+        engine = LuaEngine()
+        await engine.start()
+
+        await engine.run_script("""
+        _G.n, _G.stop = 0, false
+        local function again() n = n + 1 if not stop then _PY.nextTick(again) end end
+        _PY.nextTick(again)
+        """)
+        await asyncio.sleep(0.01)
+        assert engine.get_lua_global("n") > 1
+        await engine.run_script("stop = true")
+        await asyncio.sleep(0.01)
+        assert not engine.has_active_operations()
+
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_simulate_from_lua(self):
+        """_PY.simulate drives timers and os.time/os.date from the virtual clock."""
+        engine = LuaEngine()
+        await engine.start()
+
+        await engine.run_script("""
+        _G.days, _G.done = {}, false
+        _PY.simulate(24 * 7, 1767225600, function() done = true end)
+        setInterval(function() days[#days+1] = os.date("!%Y-%m-%d %H:%M", os.time()) end, 86400 * 1000)
+        """)
+        for _ in range(100):
+            if engine.get_lua_global("done"):
+                break
+            await asyncio.sleep(0.01)
+        days = engine.get_lua_global("days")
+        assert engine.get_lua_global("done") is True
+        assert [days[i] for i in (1, 7)] == ["2026-01-02 00:00", "2026-01-08 00:00"]
+        assert abs(await engine.run_script("return os.time()") - time.time()) < 2
+
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_simulate_ends_when_timers_run_out(self):
+        """A simulation whose last timer has fired ends at once; a nested call keeps the first onEnd."""
+        engine = LuaEngine()
+        await engine.start()
+
+        await engine.run_script("""
+        _G.ends, _G.fired = {}, false
+        _PY.simulate(24, 1767225600, function() ends[#ends+1] = "first" end)
+        _PY.simulate(48, nil, function() ends[#ends+1] = "second" end)
+        setTimeout(function() fired = os.time() end, 1000)
+        """)
+        for _ in range(100):
+            if engine.get_lua_global("ends")[2]:
+                break
+            await asyncio.sleep(0.01)
+        ends = engine.get_lua_global("ends")
+        assert [ends[1], ends[2]] == ["first", "second"]
+        assert engine.get_lua_global("fired") == 1767225601
+        assert await engine.run_script("return _PY.is_simulating()") is False
+        assert abs(await engine.run_script("return os.time()") - time.time()) < 2
+
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_registry_lists_callbacks_and_timers(self):
+        """The registry reports type, owner, age, site and due time of live entries."""
+        engine = LuaEngine(config={"callback_sites": True})
+        await engine.start()
+
+        await engine.run_script("""
+        local prev = _PY.setCurrentOwner(7)
+        _G.t = setTimeout(function() end, 5000)
+        _G.cb = _PY.registerCallback(function() end, true)
+        _PY.setCurrentOwner(prev)
+        _G.iv = setInterval(function() end, 1000)
+        """)
+        registry = engine.get_registry(with_traceback=True)
+        entries = {entry["id"]: entry for entry in registry["callbacks"]}
+        timeout = entries[engine.get_lua_global("t")]
+        assert (timeout["type"], timeout["owner"]) == ("timeout", 7)
+        assert 4000 < timeout["due_in_ms"] <= 5000
+        assert timeout["site"] == '[string "<python>"]:3'
+        persistent = entries[engine.get_lua_global("cb")]
+        assert persistent["persistent"] is True
+        assert '[string "<python>"]:4' in persistent["traceback"]
+        assert entries[engine.get_lua_global("iv")]["owner"] == "system"
+        assert registry["owners"]["7"] == {"total": 2, "persistent": 1, "timeout": 1, "callback": 1}
+
+        await engine.run_script("clearTimeout(t) clearInterval(iv) _PY.clearRegisteredCallback(cb)")
+        assert engine.get_registry()["callbacks"] == []
+
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_registry_warns_about_growing_persistent_callbacks(self, capsys):
+        """A QA that keeps adding persistent callbacks is reported at each doubling."""
+        engine = LuaEngine(config={"callback_leak_warn": 5})
+        await engine.start()
+
+        await engine.run_script("""
+        _PY.setCurrentOwner(9)
+        for i = 1, 12 do _PY.registerCallback(function() end, true) end
+        _PY.setCurrentOwner(nil)
+        """)
+        warnings = [line for line in capsys.readouterr().out.splitlines() if line.startswith("Registry:")]
+        assert len(warnings) == 2
+        assert "QA 9 holds 5 persistent callbacks" in warnings[0]
+        assert "registration sites are recorded from now on" in warnings[0]
+        # Sites are captured for QA 9 after the first report
+        assert "QA 9 holds 10 persistent callbacks" in warnings[1]
+        assert '(5 registered at [string "<python>"]:3)' in warnings[1]
+        sites = {entry["owner"]: entry.get("site") for entry in engine.get_registry()["callbacks"]}
+        assert sites[9] is not None
+
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_registry_does_not_count_intervals_as_leaks(self, capsys):
+        """Intervals are persistent but never trigger the leak warning."""
+        engine = LuaEngine(config={"callback_leak_warn": 5})
+        await engine.start()
+
+        await engine.run_script("""
+        _PY.setCurrentOwner(9)
+        _G.ivs = {}
+        for i = 1, 12 do ivs[i] = setInterval(function() end, 60000) end
+        _PY.setCurrentOwner(nil)
+        """)
+        assert not [line for line in capsys.readouterr().out.splitlines() if line.startswith("Registry:")]
+        assert engine.get_registry()["owners"]["9"]["interval"] == 12
+
+        await engine.run_script("for _, ref in ipairs(ivs) do clearInterval(ref) end")
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_registry_skips_sites_by_default(self):
+        """Without callback_sites the registry has ages but no registration sites."""
+        engine = LuaEngine()
+        await engine.start()
+
+        await engine.run_script("_G.t = setTimeout(function() end, 5000)")
+        (entry,) = engine.get_registry(with_traceback=True)["callbacks"]
+        assert entry["type"] == "timeout"
+        assert entry["age_s"] >= 0
+        assert entry.get("site") is None and entry.get("traceback") is None
+
+        await engine.stop()
+
     @pytest.mark.asyncio
     async def test_async_context_manager(self):
         """Test using engine as async context manager."""
@@ -192,3 +408,40 @@ class TestLuaEngine:
         assert "script2" in scripts
         
         await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_active_operations_tracked_incrementally(self):
+        """Keep-alive state follows timers, intervals and callbacks without table scans."""
+        engine = LuaEngine()
+        await engine.start()
+        assert not engine.has_active_operations()
+
+        await engine.run_script("""
+        _G.t = setTimeout(function() end, 10000)
+        _G.iv = setInterval(function() end, 10000)
+        _G.cb = _PY.registerCallback(function() end, true)
+        """)
+        assert engine.has_active_operations()
+        assert engine.get_pending_callback_count() == 2  # timeout, callback
+        assert engine.get_running_intervals_count() == 1
+
+        await engine.run_script("clearTimeout(t) clearInterval(iv) _PY.clearRegisteredCallback(cb)")
+        assert engine.get_pending_callback_count() == 0
+        assert engine.get_running_intervals_count() == 0
+        assert not engine.has_active_operations()
+
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_wait_until_idle_fires_when_last_timer_completes(self):
+        """The idle signal fires as soon as the last timer has run."""
+        engine = LuaEngine()
+        await engine.start()
+
+        await engine.run_script("setTimeout(function() end, 50)")
+        start = time.monotonic()
+        await asyncio.wait_for(engine.wait_until_idle(), 2.0)
+        assert 0.04 <= time.monotonic() - start < 0.5
+        assert not engine.has_active_operations()
+
+        await engine.stop()
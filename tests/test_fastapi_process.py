@@ -0,0 +1,193 @@
+"""
+Tests for IPC request/response routing between the FastAPI server app and the main process.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+from plua.fastapi_process import FastAPIProcessManager, create_fastapi_app
+from plua.ipc_channel import FramedChannel
+
+
+def _reply_in_reverse(request_queue: queue.Queue, response_queue: queue.Queue, n: int):
+    """Fake main process: collect n requests, then answer them newest first"""
+    messages = [request_queue.get(timeout=10) for _ in range(n)]
+    for message in reversed(messages):
+        response_queue.put({
+            "id": message["id"],
+            "type": "response",
+            "data": {"success": True, "data": {"path": message["data"]["path"]}, "status_code": 200},
+        })
+
+
+class TestIPCResponseRouting:
+    """Test cases for routing IPC responses to their waiting requests."""
+
+    def test_concurrent_requests_get_their_own_responses(self):
+        request_queue, response_queue = queue.Queue(), queue.Queue()
+        app = create_fastapi_app(request_queue, response_queue, queue.Queue(), {})
+        n = 20
+        responder = threading.Thread(target=_reply_in_reverse, args=(request_queue, response_queue, n), daemon=True)
+        responder.start()
+        with TestClient(app) as client, ThreadPoolExecutor(n) as pool:
+            responses = list(pool.map(lambda i: client.get(f"/api/devices/{i}"), range(n)))
+        responder.join(timeout=5)
+        assert [r.status_code for r in responses] == [200] * n
+        assert [r.json()["path"] for r in responses] == [f"/api/devices/{i}" for i in range(n)]
+
+    def test_socket_transport(self):
+        request_queue, response_queue = FramedChannel(), FramedChannel()
+        app = create_fastapi_app(request_queue, response_queue, FramedChannel(), {})
+        n = 10
+        responder = threading.Thread(target=_reply_in_reverse, args=(request_queue, response_queue, n), daemon=True)
+        responder.start()
+        with TestClient(app) as client, ThreadPoolExecutor(n) as pool:
+            responses = list(pool.map(lambda i: client.get(f"/api/devices/{i}"), range(n)))
+        assert [r.json()["path"] for r in responses] == [f"/api/devices/{i}" for i in range(n)]
+
+    def test_stray_response_is_ignored(self):
+        request_queue, response_queue = queue.Queue(), queue.Queue()
+        app = create_fastapi_app(request_queue, response_queue, queue.Queue(), {})
+        response_queue.put({"id": "not-a-request", "type": "response", "data": {"success": True}})
+        responder = threading.Thread(target=_reply_in_reverse, args=(request_queue, response_queue, 1), daemon=True)
+        responder.start()
+        with TestClient(app) as client:
+            response = client.get("/api/devices")
+        assert response.status_code == 200
+        assert response.json() == {"path": "/api/devices"}
+
+
+def _handler_manager(max_inflight: int, hook) -> FastAPIProcessManager:
+    """Manager with thread queues and a running IPC handler, but no server process"""
+    manager = FastAPIProcessManager(config={"api_max_inflight": max_inflight})
+    manager.request_queue, manager.response_queue = queue.Queue(), queue.Queue()
+    manager.set_fibaro_callback(hook)
+    manager.running = True
+    manager._workers = ThreadPoolExecutor(max_workers=max_inflight)
+    threading.Thread(target=manager._handle_ipc_messages, daemon=True).start()
+    return manager
+
+
+def _api_request(manager: FastAPIProcessManager, path: str):
+    manager.request_queue.put({
+        "id": path, "type": "fibaro_api", "timestamp": time.time(),
+        "data": {"method": "GET", "path": path, "data": None},
+    })
+
+
+class TestIPCHandlerPipelining:
+    """Test cases for concurrent request handling in FastAPIProcessManager."""
+
+    def test_slow_call_does_not_block_others(self):
+        release = threading.Event()
+
+        def hook(method, path, data):
+            if path == "/api/slow":
+                release.wait(5)
+            return {"path": path}, 200
+
+        manager = _handler_manager(4, hook)
+        try:
+            for path in ("/api/slow", "/api/a", "/api/b"):
+                _api_request(manager, path)
+            first = [manager.response_queue.get(timeout=5)["id"] for _ in range(2)]
+            release.set()
+            last = manager.response_queue.get(timeout=5)
+            assert sorted(first) == ["/api/a", "/api/b"]
+            assert last["id"] == "/api/slow" and last["data"]["data"] == {"path": "/api/slow"}
+        finally:
+            release.set()
+            manager.stop()
+
+    def test_inflight_cap(self):
+        lock = threading.Lock()
+        active, peak = 0, 0
+
+        def hook(method, path, data):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.02)
+            with lock:
+                active -= 1
+            return None, 200
+
+        manager = _handler_manager(2, hook)
+        try:
+            for i in range(8):
+                _api_request(manager, f"/api/{i}")
+            ids = {manager.response_queue.get(timeout=5)["id"] for _ in range(8)}
+            assert ids == {f"/api/{i}" for i in range(8)}
+            assert peak == 2
+        finally:
+            manager.stop()
+
+
+class TestRawPassthrough:
+    """Test cases for forwarding raw /api/* bodies and pre-encoded hook results."""
+
+    def test_raw_body_and_encoded_result(self):
+        seen = []
+
+        async def hook(method, path, data):
+            seen.append(data)
+            return '{"b":1,"a":[2.50]}', 200, True
+
+        manager = FastAPIProcessManager(config={"api_inprocess": True})
+        manager.set_fibaro_callback_async(hook)
+        app = create_fastapi_app(None, None, None, {}, request_handler=manager._handle_request_async)
+        with TestClient(app) as client:
+            response = client.post("/api/globalVariables", content=b'{"name": "x", "value": 1.50}')
+        assert seen == ['{"name": "x", "value": 1.50}']
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        assert response.content == b'{"b":1,"a":[2.50]}'
+
+    def test_encoded_error_result(self):
+        manager = _handler_manager(1, lambda method, path, data: ('{"error":"x"}', 404, True))
+        app = create_fastapi_app(manager.request_queue, manager.response_queue, queue.Queue(), {})
+        try:
+            with TestClient(app) as client:
+                response = client.get("/api/devices/99")
+        finally:
+            manager.stop()
+        assert response.status_code == 404
+        assert response.json() == {"detail": "Fibaro API error"}
+
+
+class TestInProcessMode:
+    """Test cases for --api-inprocess, where requests are awaited without IPC."""
+
+    def test_async_fibaro_callback(self):
+        async def hook(method, path, data):
+            return {"method": method, "path": path}, 200
+
+        manager = FastAPIProcessManager(config={"api_inprocess": True})
+        manager.set_fibaro_callback_async(hook)
+        app = create_fastapi_app(None, None, None, {}, request_handler=manager._handle_request_async)
+        with TestClient(app) as client:
+            assert client.get("/api/devices/3").json() == {"method": "GET", "path": "/api/devices/3"}
+            assert client.get("/health").json()["mode"] == "in-process"
+
+    def test_blocking_callbacks_run_on_workers(self):
+        threads = set()
+
+        def hook(method, path, data):
+            threads.add(threading.current_thread().name)
+            return None, 404
+
+        manager = FastAPIProcessManager(config={"api_inprocess": True})
+        manager.set_fibaro_callback(hook)
+        manager._workers = ThreadPoolExecutor(max_workers=2, thread_name_prefix="plua-api")
+        app = create_fastapi_app(None, None, None, {}, request_handler=manager._handle_request_async)
+        try:
+            with TestClient(app) as client:
+                assert client.get("/api/missing").status_code == 404
+        finally:
+            manager._workers.shutdown()
+        assert all(name.startswith("plua-api") for name in threads)
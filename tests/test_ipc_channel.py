@@ -0,0 +1,112 @@
+"""
+Tests for the framed Unix-socket IPC channel.
+"""
+
+import asyncio
+import multiprocessing
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+import pytest
+
+from plua.ipc_channel import FramedChannel
+
+
+def _echo(requests: FramedChannel, responses: FramedChannel):
+    responses.put({"echo": requests.get(timeout=10)})
+
+
+class TestFramedChannel:
+    """Test cases for FramedChannel's Queue-compatible put/get."""
+
+    def test_round_trip_keeps_builtin_types(self):
+        channel = FramedChannel()
+        message = {"id": "1", "data": {"list": [1, 2.5, None, True], 3: "int key", "text": "åäö"}}
+        channel.put(message)
+        channel.put({"id": "2"})
+        assert channel.get(timeout=1) == message
+        assert channel.get(timeout=1) == {"id": "2"}
+
+    def test_other_types_go_through_json(self):
+        channel = FramedChannel()
+        channel.put({"ordered": OrderedDict(a=1), "obj": object})
+        result = channel.get(timeout=1)
+        assert result["ordered"] == {"a": 1} and result["obj"] == str(object)
+
+    def test_empty_raises(self):
+        channel = FramedChannel()
+        with pytest.raises(queue.Empty):
+            channel.get_nowait()
+        with pytest.raises(queue.Empty):
+            channel.get(timeout=0.05)
+
+    def test_large_message_from_another_thread(self):
+        channel = FramedChannel()
+        big = {"data": "x" * 3_000_000}
+        threading.Thread(target=channel.put, args=(big,), daemon=True).start()
+        assert channel.get(timeout=5) == big
+
+    @pytest.mark.parametrize("method", ["fork", "spawn"])
+    def test_across_processes(self, method):
+        requests, responses = FramedChannel(), FramedChannel()
+        process = multiprocessing.get_context(method).Process(target=_echo, args=(requests, responses))
+        process.start()
+        requests.put({"path": "/api/devices"})
+        assert responses.get(timeout=20) == {"echo": {"path": "/api/devices"}}
+        process.join(timeout=5)
+
+    def test_put_times_out_when_reader_stops(self):
+        channel = FramedChannel()
+        message = {"data": "x" * 10_000}
+        with pytest.raises(queue.Full):
+            for _ in range(10_000):  # fills the socket buffer
+                channel.put(message, timeout=0.05)
+        # Everything accepted arrives intact, and the channel recovers
+        count = 0
+        while True:
+            try:
+                assert channel.get_nowait() == message
+            except queue.Empty:
+                break
+            count += 1
+        assert count > 0
+        channel.put({"after": True}, timeout=1)
+        assert channel.get(timeout=1) == {"after": True}
+
+    @pytest.mark.asyncio
+    async def test_put_async_does_not_block_the_loop(self):
+        channel = FramedChannel()
+        message = {"data": "x" * 10_000}
+        with pytest.raises(queue.Full):
+            for _ in range(10_000):
+                channel.put(message, timeout=0)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        task = asyncio.create_task(ticker())
+        start = time.monotonic()
+        with pytest.raises(queue.Full):
+            await channel.put_async(message, timeout=0.2)
+        assert time.monotonic() - start >= 0.2
+        assert ticks > 10
+
+        # A reader making room lets a pending put_async complete
+        received = []
+
+        def drain():
+            while not received or received[-1] != {"last": True}:
+                received.append(channel.get(timeout=2))
+
+        reader = threading.Thread(target=drain, daemon=True)
+        reader.start()
+        await channel.put_async({"last": True}, timeout=2)
+        task.cancel()
+        reader.join(timeout=2)
+        assert received[-1] == {"last": True}
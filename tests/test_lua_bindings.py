@@ -0,0 +1,146 @@
+"""
+Tests for the Python <-> Lua table converters and the Lua JSON codec.
+"""
+
+import json
+from collections import OrderedDict
+
+import lupa
+import pytest
+
+from plua import LuaEngine
+from plua.lua_bindings import lua_to_python_table, python_to_lua_table
+
+
+class TestPythonToLuaTable:
+    """Test cases for the single-pass python_to_lua_table converter."""
+
+    def test_nested_payload_round_trips(self):
+        engine = LuaEngine()
+        data = {
+            "id": 42,
+            "name": "Lamp",
+            "properties": {"value": True, "parameters": [{"id": 1, "value": 0}, {"id": 2, "value": [1, 2]}]},
+            "interfaces": ["light", "energy"],
+            "empty": {},
+            "pair": (1, "b"),
+            "ordered": OrderedDict(x={"y": 1}),
+        }
+        table = python_to_lua_table(data)
+        probe = engine.execute_lua("""
+        return function(t) return #t.interfaces, t.properties.parameters[2].value[2], type(t.ordered.x) end
+        """)
+        assert probe(table) == (2, 2, "table")
+        expected = dict(data, empty={}, pair=[1, "b"], ordered={"x": {"y": 1}})
+        assert lua_to_python_table(table) == expected
+
+    def test_shared_values_are_not_cycles(self):
+        LuaEngine()
+        shared = {"v": 1}
+        table = python_to_lua_table({"a": shared, "b": [shared, shared]})
+        assert lua_to_python_table(table) == {"a": {"v": 1}, "b": [{"v": 1}, {"v": 1}]}
+
+    def test_cycle_raises(self):
+        LuaEngine()
+        data = {"child": {"items": []}}
+        data["child"]["items"].append(data)
+        with pytest.raises(ValueError, match="cycle"):
+            python_to_lua_table(data)
+
+    def test_depth_limit_raises(self):
+        LuaEngine()
+        data = node = {}
+        for _ in range(200):
+            node["next"] = {"x": 1}
+            node = node["next"]
+        with pytest.raises(ValueError, match="depth limit"):
+            python_to_lua_table(data)
+
+
+class TestLuaToPythonTable:
+    """Test cases for the lua_type based lua_to_python_table converter."""
+
+    def test_sequences_become_lists(self):
+        engine = LuaEngine()
+        result = lua_to_python_table(engine.execute_lua("""
+        local long = {}
+        for i = 1, 100 do long[i] = i end
+        local reversed = {}
+        for i = 20, 1, -1 do reversed[i] = i end
+        return {short = {"a", "b"}, long = long, reversed = reversed, nested = {{1}, {x = 2}}}
+        """))
+        assert result["short"] == ["a", "b"]
+        assert result["long"] == list(range(1, 101))
+        assert result["reversed"] == list(range(1, 21))
+        assert result["nested"] == [[1], {"x": 2}]
+
+    def test_non_sequences_become_dicts(self):
+        engine = LuaEngine()
+        result = lua_to_python_table(engine.execute_lua("""
+        local holes = {}
+        for i = 1, 40 do if i ~= 7 then holes[i] = i end end
+        local mixed = {}
+        for i = 1, 40 do mixed[i] = i end
+        mixed.name = "x"
+        return {holes = holes, mixed = mixed, empty = {}, flag = {[true] = 1}}
+        """))
+        assert len(result["holes"]) == 39 and 7 not in result["holes"]
+        assert result["mixed"]["name"] == "x" and result["mixed"][40] == 40
+        assert result["empty"] == {}
+        assert result["flag"] == {True: 1}
+
+    def test_table_from_another_runtime(self):
+        LuaEngine()
+        other = lupa.LuaRuntime()
+        table = other.execute("local t = {} for i = 1, 40 do t[i] = {i} end return {seq = t, name = 'x'}")
+        assert lua_to_python_table(table) == {"seq": [[i] for i in range(1, 41)], "name": "x"}
+
+    def test_functions_become_descriptions(self):
+        engine = LuaEngine()
+        result = lua_to_python_table(engine.execute_lua("return {f = function() end, n = 1}"))
+        assert result["f"].startswith("<Lua function")
+        assert result["n"] == 1
+
+
+class TestJsonCodec:
+    """Test cases for the Lua-side json.encode/json.decode."""
+
+    def test_stable_key_order(self):
+        engine = LuaEngine()
+        result = engine.execute_lua("""
+        return json.encode({zeta = 1, alpha = {2, 3}, id = 7, type = "t", [5] = "five", only = {x = true}})
+        """)
+        assert result == '{"type":"t","id":7,"5":"five","alpha":[2,3],"only":{"x":true},"zeta":1}'
+
+    def test_empty_arrays_and_null(self):
+        engine = LuaEngine()
+        result = engine.execute_lua("""
+        return json.encode({a = json.initArray({}), b = {}, c = {1, json.null, 3}})
+        """)
+        assert result == '{"a":[],"b":{},"c":[1,null,3]}'
+
+    def test_strings_are_escaped(self):
+        engine = LuaEngine()
+        encoded = engine.execute_lua(r"""
+        return json.encode({['k"ey'] = 'q"uote\\back\nline\1ctl', plain = "ok", utf = "åäö"})
+        """)
+        assert json.loads(encoded) == {'k"ey': 'q"uote\\back\nline\x01ctl', "plain": "ok", "utf": "åäö"}
+
+    def test_round_trip(self):
+        engine = LuaEngine()
+        text = '{"type":"device","id":12,"properties":{"value":false,"power":1.5,"tags":["a","b"]},"name":"Lamp"}'
+        decode = engine.execute_lua("return function(s) local t, err = json.decode(s) return json.encode(t), err end")
+        assert decode(text) == ('{"type":"device","id":12,"name":"Lamp","properties":{"value":false,"power":1.5,"tags":["a","b"]}}', None)
+
+    def test_raw_values_are_spliced(self):
+        engine = LuaEngine()
+        result = engine.execute_lua("""
+        local cached = json.encode({1, 2})
+        return json.encode({a = json.raw(cached), b = {json.raw('"x"')}}), json.isRaw(json.raw("1")), json.isRaw({})
+        """)
+        assert result == ('{"a":[1,2],"b":["x"]}', True, False)
+
+    def test_functions_are_strings(self):
+        engine = LuaEngine()
+        encoded = engine.execute_lua("return json.encode({f = print})")
+        assert json.loads(encoded)["f"].startswith("function")
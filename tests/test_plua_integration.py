@@ -8,6 +8,7 @@ import asyncio
 import pytest
 import tempfile
 import os
+from datetime import datetime, timedelta
 from pathlib import Path
 from plua import LuaEngine
 
@@ -321,3 +322,69 @@ class TestPLuaIntegration:
             os.unlink(temp_file)
         
         await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_eventlib_cron_next_time(self):
+        """EventLib cron rules compute their next occurrence instead of being polled."""
+        import sys
+
+        config = {
+            "fibaro": True,
+            "platform": sys.platform,
+            "fileSeparator": "\\\\" if sys.platform == "win32" else "/",
+            "pathSeparator": ";" if sys.platform == "win32" else ":",
+            "isWindows": sys.platform == "win32",
+            "isMacOS": sys.platform == "darwin",
+            "isLinux": sys.platform.startswith("linux"),
+            "pythonVersion": f"{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}",
+            "offline": True,
+        }
+        engine = LuaEngine(config=config)
+        await engine.start()
+
+        await engine.run_script("""
+        fibaro.plua.lib.loadQAString([[
+--%%name:Cron
+--%%type:com.fibaro.genericDevice
+--%%offline:true
+--%%file:$fibaro.lib.eventlib,eventlib
+function QuickApp:onInit()
+  local get = api.get
+  function api.get(path, ...)  -- offline: no HC3 location for the sun calculation
+    if path == "/settings/location" then return {latitude = 59.33, longitude = 18.07} end
+    return get(path, ...)
+  end
+  local function at(s, y, m, d, h, mi)
+    local _, nextTime = fibaro.parseCron(s)
+    local t = nextTime(os.time({year=y, month=m, day=d, hour=h, min=mi, sec=30}))
+    return t and os.date("%Y-%m-%d %H:%M %a", t)
+  end
+  _PY.cronResults = {
+    at("*/15 * * * *", 2026, 1, 5, 10, 14),
+    at("0 8 * * mon-fri", 2026, 1, 9, 8, 0),    -- Friday 08:00:30 -> Monday
+    at("0 12 last * *", 2026, 2, 10, 0, 0),
+    at("30 6 29 2 *", 2026, 3, 1, 0, 0),         -- next leap day
+    at("sunset * * *", 2026, 1, 5, 10, 0),
+    at("sunset+10 * * *", 2026, 1, 5, 10, 0),
+  }
+end
+]])
+        """)
+        for _ in range(100):  # the QA starts on a timer
+            results = await engine.run_script("return _PY.cronResults and table.concat(_PY.cronResults, '|')")
+            if results:
+                break
+            await asyncio.sleep(0.02)
+        results = results.split("|")
+        assert results[:4] == [
+            "2026-01-05 10:15 Mon",
+            "2026-01-12 08:00 Mon",
+            "2026-02-28 12:00 Sat",
+            "2028-02-29 06:30 Tue",
+        ]
+        # Sunset depends on the local timezone; without an offset it must
+        # still parse, and "+10" is ten minutes later
+        sunset, sunset10 = (datetime.strptime(r, "%Y-%m-%d %H:%M %a") for r in results[4:])
+        assert sunset10 - sunset == timedelta(minutes=10)
+
+        await engine.stop()
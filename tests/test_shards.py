@@ -0,0 +1,150 @@
+"""
+Tests for splitting QuickApps over worker processes.
+"""
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from plua.cli import build_parser
+from plua.shards import (
+    ShardDirectory,
+    create_coordinator_app,
+    device_ids_in,
+    partition_scripts,
+    run_sharded,
+    shard_argv,
+    unshardable_options,
+)
+
+
+def _parse(*argv):
+    parser = build_parser()
+    return parser, parser.parse_args(list(argv))
+
+
+class TestShards:
+    """Test cases for shard planning."""
+
+    def test_partition_round_robin(self):
+        assert partition_scripts(["a", "b", "c"], 2) == [["a", "c"], ["b"]]
+        assert partition_scripts(["a", "b"], 8) == [["a"], ["b"]]
+
+    def test_shard_argv_offsets_ports(self):
+        parser, args = _parse("--fibaro", "--header", "x:1", "--run-for", "5", "--shards", "2", "a.lua", "b.lua")
+        argv = shard_argv(parser, args, ["b.lua"], 1)
+        # The coordinator keeps 8080; shard i serves 8081 + i on loopback
+        assert argv[argv.index("--api-port") + 1] == "8082"
+        assert argv[argv.index("--api-host") + 1] == "127.0.0.1"
+        assert argv[argv.index("--telnet-port") + 1] == "8024"
+        assert argv[argv.index("--shard-index") + 1] == "1"
+        assert argv[argv.index("--shard-coordinator") + 1] == "http://127.0.0.1:8080"
+        assert "--nodebugger" in argv
+        assert argv[argv.index("--run-for") + 1] == "5"
+        assert argv[argv.index("--header") + 1] == "x:1"
+        assert "--shards" not in argv and "a.lua" not in argv
+        assert argv[-1] == "b.lua"
+
+    def test_shard_argv_forwards_every_option(self):
+        """Options are forwarded from the parser, so new flags need no shard code."""
+        parser, args = _parse(
+            "-o", "--fibaro", "--desktop", "--watchdog-ms", "50", "--timer-slack-ms", "2.5",
+            "--callback-sites", "--api-transport", "socket", "--header", "a", "--header", "b",
+            "--shards", "2", "a.lua", "b.lua",
+        )
+        argv = shard_argv(parser, args, ["a.lua"], 0)
+        for flag in ("--offline", "--fibaro", "--callback-sites"):
+            assert flag in argv
+        assert argv[argv.index("--desktop") + 1] == "true"
+        assert argv[argv.index("--watchdog-ms") + 1] == "50"
+        assert argv[argv.index("--timer-slack-ms") + 1] == "2.5"
+        assert argv[argv.index("--api-transport") + 1] == "socket"
+        assert argv.count("--header") == 2
+        # The worker's own parser reads back the coordinator's options
+        worker = parser.parse_args(argv[3:])
+        for dest in ("offline", "fibaro", "desktop", "watchdog_ms", "timer_slack_ms",
+                     "callback_sites", "api_transport", "header"):
+            assert getattr(worker, dest) == getattr(args, dest)
+        assert worker.scripts == ["a.lua"]
+
+    def test_unshardable_options_are_rejected(self, capsys):
+        parser, args = _parse("-e", "print(1)", "-l", "x", "--no-api", "--shards", "2", "a.lua", "b.lua")
+        assert unshardable_options(args) == ["-e/--eval", "-l", "--no-api"]
+        with pytest.raises(SystemExit) as exc:
+            run_sharded(parser, args)
+        assert exc.value.code == 2
+        assert "--shards cannot be combined with -e/--eval, -l, --no-api" in capsys.readouterr().err
+
+    def test_device_ids_in_request(self):
+        assert device_ids_in("/devices/5556/action/turnOn") == [5556]
+        assert device_ids_in("/plua/quickApp/15555/info") == [15555]
+        assert device_ids_in("/devices?parentId=5555&type=x") == [5555]
+        assert device_ids_in("/plugins/callUIEvent", {"deviceID": "15555"}) == [15555]
+        assert device_ids_in("/plugins/updateProperty", {"deviceId": 7, "value": 1}) == [7]
+        assert device_ids_in("/globalVariables/x", {"value": "1"}) == []
+
+
+def _coordinator(devices=None):
+    """Coordinator app over two fake shards that answer with their index and the request path."""
+    requests = []
+
+    def handler(request):
+        shard = int(request.url.port) - 8081
+        requests.append((shard, request.method, request.url.path))
+        if request.url.path == "/api/devices":
+            return httpx.Response(200, json=[{"id": 5555 + shard * 10000}, {"id": 1}])
+        return httpx.Response(200, json={"shard": shard, "path": request.url.path})
+
+    directory = ShardDirectory(["http://127.0.0.1:8081", "http://127.0.0.1:8082"])
+    for shard, ids in (devices or {}).items():
+        directory.publish_devices(shard, ids)
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return TestClient(create_coordinator_app(directory, client)), requests
+
+
+class TestShardCoordinator:
+    """Test cases for the coordinator's API front."""
+
+    def test_api_requests_go_to_the_owning_shard(self):
+        app, requests = _coordinator({0: [5555], 1: [15555, 15556]})
+        with app as client:
+            assert client.get("/api/devices/15556").json()["shard"] == 1
+            assert client.get("/api/devices/5555").json()["shard"] == 0
+            assert client.post("/api/plugins/callUIEvent", json={"deviceID": 15555}).json()["shard"] == 1
+            assert client.get("/plua/quickApp/15555/info").json()["shard"] == 1
+            # Unknown devices and requests naming none go to shard 0, unless asked otherwise
+            assert client.get("/api/devices/42").json()["shard"] == 0
+            assert client.get("/api/globalVariables?shard=1").json()["shard"] == 1
+        assert (1, "POST", "/api/plugins/callUIEvent") in requests
+
+    def test_device_list_merges_shards(self):
+        app, _ = _coordinator()
+        with app as client:
+            assert client.get("/api/devices").json() == [{"id": 5555}, {"id": 1}, {"id": 15555}]
+
+    def test_republishing_replaces_a_shards_devices(self):
+        app, _ = _coordinator({1: [15555, 15556]})
+        with app as client:
+            client.post("/plua/shards/devices", json={"shard": 1, "ids": [15555]})
+            assert client.get("/plua/shards").json()["devices"] == {"15555": 1}
+            assert client.get("/api/devices/15556").json()["shard"] == 0
+
+    def test_events_reach_the_other_shards(self):
+        app, _ = _coordinator()
+        with app as client:
+            client.post("/plua/shards/events", json={"shard": 0, "events": [{"type": "A"}]})
+            client.post("/plua/shards/events", json={"shard": 1, "events": [{"type": "B"}]})
+            assert client.get("/plua/shards/events?shard=1&wait=0").json() == {"last": 2, "events": [{"type": "A"}]}
+            assert client.get("/plua/shards/events?shard=0&wait=0").json() == {"last": 2, "events": [{"type": "B"}]}
+            assert client.get("/plua/shards/events?shard=0&last=2&wait=0").json() == {"last": 2, "events": []}
+
+    def test_broadcast_reaches_websocket_clients(self):
+        app, _ = _coordinator()
+        update = {"qa_id": 15555, "element_id": "label", "property_name": "text", "value": "hi"}
+        with app as client:
+            # Sent before the browser connects: buffered, then delivered on connect
+            client.post("/plua/shards/broadcast", json=update)
+            with client.websocket_connect("/ws?qa_id=15555") as ws:
+                assert ws.receive_json() == {"type": "view_update", **update}
+                client.post("/plua/shards/broadcast", json={**update, "value": "again"})
+                assert ws.receive_json()["value"] == "again"
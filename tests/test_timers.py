@@ -3,6 +3,7 @@ Tests for the AsyncTimerManager class.
 """
 
 import asyncio
+import time
 import pytest
 from plua.timers import AsyncTimerManager
 
@@ -31,7 +32,7 @@ class TestAsyncTimerManager:
             
         timer_id = manager.set_timeout(50, callback)
         assert timer_id is not None
-        assert isinstance(timer_id, str)
+        assert isinstance(timer_id, int)
         
         # Timer shouldn't have fired yet
         assert len(fired) == 0
@@ -194,3 +195,157 @@ class TestAsyncTimerManager:
         assert manager.get_timer_count() == 0
         
         await manager.stop()
+
+    @pytest.mark.asyncio
+    async def test_timers_fire_in_due_order(self):
+        """Timers armed out of order fire by due time from one scheduler."""
+        manager = AsyncTimerManager()
+        await manager.start()
+
+        fired = []
+        for delay in (60, 20, 40, 20):
+            manager.set_timeout(delay, fired.append, delay)
+        ids = [manager.set_timeout(30, fired.append, "cleared") for _ in range(100)]
+        for timer_id in ids:
+            manager.clear_timer(timer_id)
+
+        await asyncio.sleep(0.1)
+        assert fired == [20, 20, 40, 60]
+        assert manager.get_timer_count() == 0
+
+        await manager.stop()
+
+    @pytest.mark.asyncio
+    async def test_timer_armed_from_callback(self):
+        """A zero-delay timer set from a callback runs on a later turn, earlier ones are not delayed."""
+        manager = AsyncTimerManager()
+        await manager.start()
+
+        fired = []
+
+        def first():
+            fired.append("first")
+            manager.set_timeout(0, fired.append, "chained")
+            manager.set_timeout(1000, fired.append, "late")
+
+        manager.set_timeout(10, first)
+        manager.set_timeout(30, fired.append, "second")
+
+        await asyncio.sleep(0.08)
+        assert fired == ["first", "chained", "second"]
+        assert manager.get_timer_count() == 1
+
+        await manager.stop()
+
+    @pytest.mark.asyncio
+    async def test_interval_is_fixed_rate(self):
+        """Slow callbacks do not push later ticks back; lateness is tracked."""
+        manager = AsyncTimerManager()
+        await manager.start()
+
+        ticks = []
+
+        def slow():
+            ticks.append(True)
+            time.sleep(0.008)
+
+        interval_id = manager.set_interval(20, slow)
+        await asyncio.sleep(0.25)
+        stats = manager.get_interval_stats(interval_id)
+        assert manager.clear_timer(interval_id) is True
+        assert manager.get_interval_stats(interval_id) is None
+
+        # Chained timeouts would manage 8 ticks (28 ms per round).
+        assert len(ticks) >= 10
+        assert stats["ticks"] == len(ticks)
+        assert stats["ticks"] + stats["skipped"] >= 11  # slots at 20, 40, ..., 240 ms
+        assert stats["policy"] == "skip"
+        assert 0 <= stats["drift_avg_ms"] <= stats["drift_max_ms"]
+        assert stats["jitter_ms"] >= 0
+
+        await manager.stop()
+
+    @pytest.mark.asyncio
+    async def test_interval_overrun_policies(self):
+        """A tick that overruns three periods is skipped, replayed or shifts the grid."""
+        manager = AsyncTimerManager()
+        await manager.start()
+
+        stats = {}
+        for policy in ("skip", "burst", "delay"):
+            blocked = []
+
+            def tick(blocked=blocked):
+                if not blocked:
+                    blocked.append(True)
+                    time.sleep(0.065)  # first tick ends past the 40, 60 and 80 ms slots
+
+            interval_id = manager.set_interval(20, tick, policy=policy)
+            await asyncio.sleep(0.15)
+            stats[policy] = manager.get_interval_stats(interval_id)
+            manager.clear_timer(interval_id)
+
+        assert stats["skip"]["skipped"] >= 2
+        assert stats["burst"]["skipped"] == 0
+        assert stats["delay"]["skipped"] == 0
+        assert stats["burst"]["ticks"] >= stats["skip"]["ticks"] + 2
+        assert stats["burst"]["drift_max_ms"] >= 20
+
+        with pytest.raises(ValueError):
+            manager.set_interval(20, print, policy="sometimes")
+        await manager.stop()
+
+    @pytest.mark.asyncio
+    async def test_slack_coalesces_wakeups_into_one_batch(self):
+        """Timers due within each other's slack fire together, batched per callback."""
+        manager = AsyncTimerManager(default_slack_ms=30)
+        await manager.start()
+
+        batches = []
+        plain = []
+
+        def expired(timer_id):
+            raise AssertionError("batched timers are not called one by one")
+
+        manager.set_batch_handler(expired, batches.append)
+        for delay in (10, 15, 20, 25):
+            manager.set_timeout(delay, expired, delay)
+        manager.set_timeout(30, plain.append, "exact", slack_ms=0)
+        manager.set_timeout(200, expired, "later")
+
+        await asyncio.sleep(0.1)
+        assert batches == [[(10,), (15,), (20,), (25,)]]
+        assert plain == ["exact"]
+        assert manager.get_timer_count() == 1
+
+        await manager.stop()
+
+    @pytest.mark.asyncio
+    async def test_simulate_runs_virtual_days_quickly(self):
+        """A virtual clock fires a month of minute ticks in order, then returns to real time."""
+        manager = AsyncTimerManager()
+        await manager.start()
+
+        start = 1_767_225_600.0  # 2026-01-01 00:00:00 UTC
+        seen = []
+        real = []
+        ended = asyncio.Event()
+        manager.simulate(30 * 86400, start_epoch=start, on_end=ended.set)
+        assert manager.is_simulating()
+        assert manager.wall_time() == pytest.approx(start)
+        manager.set_interval(60_000, lambda: seen.append(manager.wall_time()))
+        manager.set_timeout(90_000, seen.append, "once")
+        manager.set_timeout(20, real.append, "guard", realtime=True)
+
+        await asyncio.wait_for(ended.wait(), 30)
+        assert not manager.is_simulating()
+        assert len(seen) == 30 * 1440 + 1
+        assert seen[:3] == [pytest.approx(start + 60), "once", pytest.approx(start + 120)]
+        assert seen[-1] == pytest.approx(start + 30 * 86400)
+        assert manager.get_interval_stats(1)["drift_max_ms"] == pytest.approx(0, abs=1e-3)
+
+        await asyncio.sleep(0.05)
+        assert real == ["guard"]
+        assert abs(manager.wall_time() - time.time()) < 1
+
+        await manager.stop()
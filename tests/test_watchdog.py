@@ -0,0 +1,87 @@
+"""
+Tests for the opt-in Lua callback watchdog.
+"""
+
+import asyncio
+
+import pytest
+
+from plua import LuaEngine
+
+
+class TestWatchdog:
+    """Test cases for callback budgets and run-time histograms."""
+
+    @pytest.mark.asyncio
+    async def test_runaway_callback_is_aborted(self):
+        """A callback in a tight loop is aborted and later callbacks still run."""
+        engine = LuaEngine(config={"watchdog_ms": 20, "watchdog_abort": True})
+        await engine.start()
+
+        await engine.run_script("""
+        _G.done = false
+        _G.spin = _PY.registerCallback(function() while true do end end)
+        _G.ok = _PY.registerCallback(function() done = true end)
+        """)
+        engine.post_callback_from_thread(engine.get_lua_global("spin"))
+        engine.post_callback_from_thread(engine.get_lua_global("ok"))
+
+        await asyncio.sleep(0.2)
+        assert engine.get_lua_global("done") is True
+        stats = engine.get_callback_stats()["qas"]["system"]
+        assert stats["count"] == 2
+        assert stats["overruns"] == 1
+
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_budget_is_wall_clock_time(self):
+        """A callback that mostly waits in Python calls still overruns its budget."""
+        engine = LuaEngine(config={"watchdog_ms": 20, "watchdog_abort": True,
+                                   "watchdog_step": 10, "watchdog_sample": 1})
+        await engine.start()
+
+        await engine.run_script("""
+        _G.waits = 0
+        _G.cb = _PY.registerCallback(function()
+          while true do waits = waits + 1 _PY.sleep(0.002) end
+        end)
+        """)
+        engine.post_callback_from_thread(engine.get_lua_global("cb"))
+
+        await asyncio.sleep(0.2)
+        stats = engine.get_callback_stats()["qas"]["system"]
+        assert stats["overruns"] == 1
+        assert 5 <= engine.get_lua_global("waits") < 50
+
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_histogram_per_owner(self):
+        """Run times are bucketed per owning QA, including coroutine callbacks."""
+        engine = LuaEngine(config={"watchdog_ms": 1000})
+        await engine.start()
+
+        await engine.run_script("""
+        local prev = _PY.setCurrentOwner(77)
+        _G.cb = _PY.registerCallback(function()
+          coroutine.wrap(function() for i = 1, 1000 do end end)()
+        end)
+        _PY.setCurrentOwner(prev)
+        """)
+        engine.post_callback_from_thread(engine.get_lua_global("cb"))
+
+        await asyncio.sleep(0.05)
+        stats = engine.get_callback_stats()
+        assert len(stats["qas"][77]["buckets"]) == len(stats["bounds"]) + 1
+        assert sum(stats["qas"][77]["buckets"]) == 1
+        assert stats["qas"][77]["overruns"] == 0
+
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_disabled_by_default(self):
+        engine = LuaEngine()
+        await engine.start()
+        assert engine.get_callback_stats() == {}
+        await engine.stop()